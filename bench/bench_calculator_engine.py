@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "calculator"))
+from engine import (  # noqa: E402
+    BACKENDS, Parser, _run, compile_expression, evaluate, fold_constants, get_backend, sample_function, to_source, tokenize,
+)
+
+# 電卓の式の評価を「毎回パースして評価する」と「コンパイル済みの式を LRU から使う」で比べる
+# （calculator/main.py は読み込むとアプリが起動するので、エンジンだけを測る）
+#
+# あわせて、グラフ・表を作るときのように多くの x で評価する場合を「1点ずつ」と「配列でまとめて」で比べ、
+# 数の種類（float / decimal / fraction）ごとの評価の速さも測る
+#
+#   python bench/bench_calculator_engine.py
+
+EXPRESSIONS = [
+    "2+3*4",
+    "12.5*8-3/4",
+    "(1+2)*(3+4)/5",
+    "2^10+3²-4³",
+    "sin(30)+cos(60)*tan(45)",
+    "exp(1.5)-50%",
+    "-(2+3)^2*(-1.25)",
+    "1+2+3+4+5+6+7+8+9+10+11+12+13+14+15+16+17+18+19+20",
+]
+VARIABLE_EXPRESSIONS = ["x^2+2*x+1", "sin(x)*exp(-x/10)", "(x+1)*(x-1)/(x²+1)"]
+BACKEND_EXPRESSIONS = ["x*0.1+x/3", "x^10-2*x^3", "sqrt(x)+sin(x)"]
+
+
+# 変更前と同じく、式を毎回パースしてから評価する
+def evaluate_uncached(text, **variables):
+    tree = fold_constants(Parser(tokenize(text), tuple(variables)).parse())
+    return _run(to_source(tree), variables)
+
+
+def measure(function, min_time=1.0):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(100):
+            function()
+        count += 100
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def main():
+    for text in EXPRESSIONS:
+        assert abs(evaluate(text) - evaluate_uncached(text)) < 1e-9, text
+
+    print(f"{'式':<56} {'毎回パース':>12} {'コンパイル済み':>14}")
+    for text in EXPRESSIONS:
+        uncached = measure(lambda: evaluate_uncached(text), 0.3)
+        cached = measure(lambda: evaluate(text), 0.3)
+        print(f"{text:<56} {uncached:10.0f}/秒 {cached:12.0f}/秒  ({cached / uncached:5.1f}倍)")
+
+    print()
+    for text in VARIABLE_EXPRESSIONS:
+        compiled = compile_expression(text, ("x",))
+        values = [i / 10 for i in range(100)]
+        uncached = measure(lambda: [evaluate_uncached(text, x=x) for x in values], 0.3) * len(values)
+        cached = measure(lambda: [compiled(x=x) for x in values], 0.3) * len(values)
+        print(f"x = 0..9.9 で {text:<41} {uncached:10.0f}/秒 {cached:12.0f}/秒  ({cached / uncached:5.1f}倍)")
+
+    print(compile_expression.cache_info())
+
+    print()
+    xs = np.linspace(-10, 10, 1_000_000)
+    for text in ["sin(x)*x²", *VARIABLE_EXPRESSIONS]:
+        compiled = compile_expression(text, ("x",))
+        start = time.perf_counter()
+        scalar = [compiled(x=x) for x in xs[:100_000].tolist()]
+        scalar_rate = 100_000 / (time.perf_counter() - start)
+        start = time.perf_counter()
+        batch = compiled.over(x=xs)
+        batch_rate = len(xs) / (time.perf_counter() - start)
+        assert np.allclose(batch[:100_000], scalar), text
+        print(f"{text:<24} 1点ずつ {scalar_rate:12.0f}点/秒  配列 {batch_rate:14.0f}点/秒  ({batch_rate / scalar_rate:5.0f}倍)")
+
+    start = time.perf_counter()
+    sampled, _ = sample_function("tan(x)", -10, 10)
+    print(f"tan(x) のグラフ用の点: {len(sampled)} 点, {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print()
+    backends = [get_backend(name) for name in BACKENDS] + [get_backend("decimal", 100)]
+    print(f"{'数の種類':<14}" + "".join(f"{text[:18]:>20}" for text in BACKEND_EXPRESSIONS))
+    for backend in backends:
+        label = backend.name if backend.name != "decimal" else f"decimal({backend._context.prec}桁)"
+        rates = []
+        for text in BACKEND_EXPRESSIONS:
+            compiled = compile_expression(text, ("x",), backend)
+            x = backend.convert(1.5)
+            rates.append(measure(lambda: compiled(x=x), 0.3))
+        print(f"{label:<14}" + "".join(f"{rate:16.0f}/秒" for rate in rates))
+    for text in ["0.1+0.2", "1/3*3", "2^1000/2^999"]:
+        print(f"{text:<14}" + "".join(f"  {backend.format(evaluate(text, backend=backend))[:24]:<26}" for backend in backends[:3]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fixtures import load_his  # noqa: E402  （trip/ も sys.path に入る）
+from extractors import EXTRACTORS  # noqa: E402
+from his_local_server import load_pages  # noqa: E402
+
+# HIS の検索結果ページからの取り出しを、extractors.py の実装ごとに比べる
+# 1秒あたりに処理できるページ数を測る（結果が同じであることは tests/test_his_extractors.py で確かめている）
+#
+#   python bench/bench_his_extractors.py                 # bench/fixtures/his/ に記録したページで測る（なければ作ったページ）
+#   python bench/bench_his_extractors.py saved_pages     # ほかに保存したHTML（saved_pages/<地域>/<n>.html）で測る
+
+
+def measure(extract, pages, min_time=1.0):
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for html in pages:
+            extract(html)
+        count += len(pages)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return count / elapsed
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = list(load_pages(sys.argv[1]).values())
+        print(f"保存したページ {len(pages)} 件")
+    else:
+        his = load_his()
+        pages = list(his.pages.values())
+        kind = "記録したページ" if his.source == "recorded" else "作ったページ"
+        print(f"{kind} {len(pages)} 件（1ページ約 {sum(map(len, pages)) // len(pages) // 1024} KB）")
+
+    baseline = None
+    for name, extract in EXTRACTORS.items():
+        rate = measure(extract, pages)
+        baseline = baseline or rate
+        print(f"{name:>8}: {rate:8.1f} ページ/秒  ({rate / baseline:4.1f}倍)")
+
+
+if __name__ == "__main__":
+    main()
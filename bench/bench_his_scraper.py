@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urljoin
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # metrics.py, stand_in_server.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "trip"))
+from extractors import extract_soup  # noqa: E402
+from his_local_server import LocalHisServer, sample_pages  # noqa: E402
+from his_scraper import HISHotelsScraper  # noqa: E402
+
+# HIS のスクレイピングにかかる時間を、ローカルのスタンドインサーバで
+# 「1ページずつ sleep を挟んで取得する（変更前）」と「トークンバケット + 並行取得（変更後）」で比べる
+# どちらも同じレート（1秒あたりのリクエスト数）を守る
+#
+#   python bench/bench_his_scraper.py
+
+AREAS = ['福岡', '佐賀', '長崎', '熊本', '大分', '宮崎', '鹿児島']
+RATE = 10.0  # 本番は 0.5（2秒に1回）。計測時間を短くするために上げている
+LATENCY = 0.3
+
+
+# 変更前のやり方（1ページずつ、毎回 1/RATE 秒待ってから取得する）
+def scrape_serial(base_url, start_pages):
+    hotels = 0
+    with httpx.Client() as client:
+        for path, area in start_pages:
+            url = base_url + path
+            while url:
+                time.sleep(1 / RATE)
+                response = client.get(url)
+                response.raise_for_status()
+                page_hotels, next_href = extract_soup(response.text)
+                hotels += len(page_hotels)
+                url = urljoin(url, next_href) if next_href else None
+    return hotels
+
+
+def main():
+    pages, start_pages = sample_pages(AREAS, pages_per_area=3)
+    print(f"{len(AREAS)} 地域 x 3 ページ, レート {RATE}/秒, 応答の遅延 {LATENCY}秒")
+
+    with LocalHisServer(pages, latency=LATENCY) as server:
+        start = time.perf_counter()
+        hotels = scrape_serial(server.url, start_pages)
+        print(f"変更前: {time.perf_counter() - start:6.2f}秒  ホテル {hotels} 件")
+
+    with LocalHisServer(pages, latency=LATENCY) as server, tempfile.TemporaryDirectory() as tmp:
+        scraper = HISHotelsScraper(os.path.join(tmp, "hotels.db"))
+        start = time.perf_counter()
+        hotels = scraper.scrape_all([(server.url + path, area) for path, area in start_pages], rate=RATE)
+        elapsed = time.perf_counter() - start
+        peak = server.max_requests_in_window(1.0)
+        print(f"変更後: {elapsed:6.2f}秒  ホテル {hotels} 件  "
+              f"1秒あたり最大 {peak} リクエスト  接続 {server.connections_accepted}")
+    # サーバに届いた時刻で数えても、どの1秒間にも RATE 回を超えていない
+    assert peak <= RATE, f"1秒間に {peak} リクエスト届いています（上限 {RATE:g}）"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import sys
+
+from flet import Column, Container, ElevatedButton, Image, Page, Text
+from flet.core.connection import Connection
+from flet.core.protocol import CommandEncoder, PageCommandsBatchResponsePayload
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "jma"))
+from views import AreaButtonList, ForecastPanel  # noqa: E402
+
+# jma アプリの画面更新で、作られるコントロールの数とクライアントに送るバイト数を
+# 「毎回作り直す（変更前）」と「views の使い回し（変更後）」で比べる
+#
+#   python bench/bench_jma_views.py
+
+
+# クライアントに送るはずのコマンドを数えるだけの接続
+class RecordingConnection(Connection):
+    def __init__(self):
+        super().__init__()
+        self.bytes_sent = 0
+        self.controls_added = 0
+        self._next_id = 1
+
+    def send_commands(self, session_id, commands):
+        self.bytes_sent += len(json.dumps(commands, cls=CommandEncoder).encode("utf-8"))
+        results = []
+        for command in commands:
+            if command.name == "add":
+                ids = []
+                for _ in command.commands:
+                    ids.append(f"_{self._next_id}")
+                    self._next_id += 1
+                self.controls_added += len(ids)
+                results.append(" ".join(ids))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def send_command(self, session_id, command):
+        return self.send_commands(session_id, [command])
+
+
+def make_page():
+    conn = RecordingConnection()
+    page = Page(conn, "bench", loop=asyncio.new_event_loop())
+    return page, conn
+
+
+# 地方ごとの地域ボタンの文字（府県予報区 × 一次細分区域）
+def make_regions(region_count=11, offices=6, areas=3):
+    return [
+        {f"{r:02d}{o:02d}00": [f"県{r}-{o} - 地域{a}" for a in range(areas)] for o in range(offices)}
+        for r in range(region_count)
+    ]
+
+
+DAYS = [
+    [("2025-01-20", "100.svg", "晴れ"), ("2025-01-21", "200.svg", "くもり"), ("2025-01-22", "300.svg", "雨")],
+    [("2025-01-20", "100.svg", "晴れ"), ("2025-01-21", "201.svg", "くもり時々晴れ"), ("2025-01-22", "300.svg", "雨")],
+]
+
+
+# 変更前：地域を選ぶたびにボタンを全部作り直し、ページ全体を更新する
+def run_rebuild(regions, clicks):
+    page, conn = make_page()
+    area_buttons = Column()
+    weather_text = Column()
+    page.add(area_buttons, weather_text)
+    base = (conn.controls_added, conn.bytes_sent)
+
+    for region in regions:
+        area_buttons.controls.clear()
+        for names in region.values():
+            for name in names:
+                area_buttons.controls.append(ElevatedButton(text=name, width=400))
+            page.update()
+    for i in range(clicks):
+        weather_text.controls = [
+            Container(content=Column([Text(date, size=16), Image(src=icon, width=48, height=48), Text(weather, size=14)]), width=150, padding=10)
+            for date, icon, weather in DAYS[i % 2]
+        ]
+        page.update()
+    return conn.controls_added - base[0], conn.bytes_sent - base[1]
+
+
+# 変更後：views のボタンとカードを使い回し、変わった部分だけ更新する
+def run_views(regions, clicks):
+    page, conn = make_page()
+    area_buttons = AreaButtonList(on_select=lambda e, data: None, button_width=400)
+    weather_text = ForecastPanel()
+    page.add(area_buttons, weather_text)
+    base = (conn.controls_added, conn.bytes_sent)
+
+    for region in regions:
+        area_buttons.set_region(list(region))
+        for code, names in region.items():
+            area_buttons.set_areas(code, [(name, None) for name in names])
+    for i in range(clicks):
+        weather_text.show_days(DAYS[i % 2])
+    return conn.controls_added - base[0], conn.bytes_sent - base[1]
+
+
+def main():
+    regions = make_regions()
+    clicks = 50
+    interactions = len(regions) + clicks
+    results = {}
+    for name, run in (("rebuild", run_rebuild), ("views", run_views)):
+        controls, sent = run(regions, clicks)
+        results[name] = {
+            "controls_added": controls,
+            "bytes_sent": sent,
+            "controls_per_interaction": controls / interactions,
+            "bytes_per_interaction": sent / interactions,
+        }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from fixtures import FIXTURE_DIR, JST, ROOT, fixture_digest, load_his, load_jma, synthetic_jma
+from bench_calculator_engine import EXPRESSIONS, VARIABLE_EXPRESSIONS, measure
+
+sys.path.insert(0, os.path.join(ROOT, "jma"))
+sys.path.insert(0, os.path.join(ROOT, "trip"))
+from area_index import build_area_index  # noqa: E402
+from client import JmaClient  # noqa: E402
+from engine import compile_expression, evaluate  # noqa: E402
+from extractors import get_extractor  # noqa: E402
+from fetcher import fetch_all  # noqa: E402
+from forecast_columns import forecast_columns  # noqa: E402
+from forecast_archive import ForecastArchive  # noqa: E402
+from forecast_core import daily_weather, forecast_areas, format_date, normalize_forecast  # noqa: E402
+from his_scraper import HISHotelsScraper, area_price_stats, refresh_area_prices  # noqa: E402
+from weather_db import WeatherReportWriter, setup_database  # noqa: E402
+
+# よく通る処理をまとめて、ネットワークにつながずに測るベンチマーク
+# 気象庁・HIS の代わりに、記録したデータ（fixtures.py。なければ決まった乱数から作ったもの）を返すローカルのサーバを使う
+# 結果は JSON に書き出すので、コミットごとの結果を比べて遅くなったところを見つけられる
+#
+#   python bench/bench_suite.py                                   # bench/results/<コミット>.json に書き出す
+#   python bench/bench_suite.py --quick --output now.json
+#   python bench/bench_suite.py --compare bench/results/512cc0c.json              # 測ってから比べる
+#   python bench/bench_suite.py --compare bench/results/512cc0c.json now.json     # 測らずに2つを比べる
+#
+# 測るもの
+#   jma.region_fanout      地方を選んだときに、その地方の府県予報区の天気予報をすべて取得するまでの時間
+#   jma.forecast_parse     天気予報JSONの読み込みと整形（normalize_forecast）、列への変換（forecast_columns）
+#   jma.weather_reports    weather_reports への書き込み（WeatherReportWriter）
+#   jma.forecast_archive   全府県予報区の発表を毎日アーカイブに加え（snapshot と同じ）、予報の当たり具合を調べる
+#   trip.extract           HIS の検索結果ページからの取り出し
+#   trip.scrape            ローカルのサーバからの取得・取り出し・保存を通した速さ
+#   trip.hotels_insert     hotels への書き込みと地域ごとの集計の更新
+#   trip.average_prices    地域ごとの平均料金（trip.ipynb の calculate_average_prices_by_area が使う area_price_stats）
+#   calculator.evaluate    電卓の式の評価（1つずつ・配列でまとめて）
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# 比べたときに、この割合より悪くなっていたら遅くなったとみなす
+DEFAULT_THRESHOLD = 0.10
+# 本番の気象庁APIの応答時間の目安（秒）
+DEFAULT_LATENCY = 0.05
+FETCH_CONCURRENCY = 6  # jma/main.py と同じ
+
+
+# 結果を1つずつ登録する（better は "higher" か "lower"）
+class Results:
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, value, unit, better):
+        self.values[name] = {"value": round(float(value), 6), "unit": unit, "better": better}
+        print(f"  {name:<40} {value:14.4f} {unit}")
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def bench_region_fanout(results, jma, latency, rounds):
+    regions = build_area_index(jma.area)["regions"]
+
+    async def run(server):
+        client = JmaClient(base_url=server.url, retries=0)
+        timings = []
+        try:
+            for _ in range(rounds):
+                for office_codes in regions.values():
+                    start = time.perf_counter()
+                    await fetch_all(office_codes, client.get_weather_forecast, FETCH_CONCURRENCY)
+                    timings.append(time.perf_counter() - start)
+        finally:
+            await client.aclose()
+        return timings, client.connections_opened
+
+    with jma.server(latency=latency) as server:
+        timings, connections = asyncio.run(run(server))
+    results.add("jma.region_fanout.p50", percentile(timings, 50), "s", "lower")
+    results.add("jma.region_fanout.p95", percentile(timings, 95), "s", "lower")
+    results.add("jma.region_fanout.max", max(timings), "s", "lower")
+    results.add("jma.region_fanout.connections", connections, "connections", "lower")
+
+
+def bench_forecast_parse(results, jma, min_time):
+    payloads = list(jma.payloads().items())
+    size = sum(len(body) for _, body in payloads)
+
+    def parse_all():
+        for office_code, body in payloads:
+            normalize_forecast(office_code, json.loads(body))
+
+    passes = measure(parse_all, min_time)
+    results.add("jma.forecast_parse.offices_per_s", passes * len(payloads), "offices/s", "higher")
+    results.add("jma.forecast_parse.mb_per_s", passes * size / 1e6, "MB/s", "higher")
+
+    forecasts = list(jma.forecasts.items())
+    start = time.perf_counter()
+    count = 0
+    while time.perf_counter() - start < min_time:
+        forecast_columns(forecasts)
+        count += 1
+    results.add("jma.forecast_parse.columns_ms", (time.perf_counter() - start) / count * 1000, "ms", "lower")
+
+
+# 画面で地域を選んだときと同じ (地域名, 日付, 天気) の行を、発表 publications 回分作る
+# 回ごとに日付を3日ずつずらして、すべて新しい行として書き込まれるようにする
+def weather_rows(jma, publications):
+    base = []
+    for office_code, weather_data in jma.forecasts.items():
+        office_name = jma.area["offices"].get(office_code, {}).get("name", office_code)
+        for _, area_name, area_data in forecast_areas(weather_data):
+            base.append([
+                (f"{office_name} - {area_name}", datetime.strptime(format_date(date), "%Y-%m-%d"), weather)
+                for date, weather, _ in daily_weather(area_data)
+            ])
+    batches = []
+    for n in range(publications):
+        shift = timedelta(days=3 * n)
+        for area_rows in base:
+            batches.append([(location, f"{date + shift:%Y-%m-%d}", weather) for location, date, weather in area_rows])
+    return batches
+
+
+def bench_weather_reports(results, jma, publications):
+    batches = weather_rows(jma, publications)
+    count = sum(len(batch) for batch in batches)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "weather.db")
+        setup_database(database)
+        writer = WeatherReportWriter(database=database)
+        start = time.perf_counter()
+        for batch in batches:
+            writer.save_many(batch)
+        writer.close()
+        elapsed = time.perf_counter() - start
+    results.add("jma.weather_reports.rows_per_s", count / elapsed, "rows/s", "higher")
+
+
+# 全府県予報区の発表を1日1回 days 日分アーカイブに加え、1つの府県予報区の当たり具合を全期間で調べる
+# （90日で府県予報区あたり天気・気温それぞれ1000行ほど、全体で7万行ほど）
+def bench_forecast_archive(results, days, min_time):
+    first = datetime(2025, 1, 1, 11, tzinfo=JST)
+    publications = [synthetic_jma(seed=day, now=first + timedelta(days=day)).forecasts for day in range(days)]
+    count = sum(len(forecasts) for forecasts in publications)
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ForecastArchive(tmp)
+        start = time.perf_counter()
+        for forecasts in publications:
+            for office_code, weather_data in forecasts.items():
+                archive.add(office_code, weather_data)
+            archive.flush()
+        elapsed = time.perf_counter() - start
+        results.add("jma.forecast_archive.publications_per_s", count / elapsed, "publications/s", "higher")
+
+        office_code = archive.offices()[0]
+        since, until = first.isoformat(), (first + timedelta(days=days + 7)).isoformat()
+        calls = measure(lambda: ForecastArchive(tmp).accuracy(office_code, since, until), min_time)
+        results.add("jma.forecast_archive.accuracy_cold_ms", 1000 / calls, "ms", "lower")
+        calls = measure(lambda: archive.accuracy(office_code, since, until), min_time)
+        results.add("jma.forecast_archive.accuracy_ms", 1000 / calls, "ms", "lower")
+
+
+def bench_extract(results, his, min_time):
+    extract = get_extractor()
+    pages = list(his.pages.values())
+    passes = measure(lambda: [extract(html) for html in pages], min_time)
+    results.add("trip.extract.pages_per_s", passes * len(pages), "pages/s", "higher")
+
+
+def bench_scrape(results, his, latency):
+    with tempfile.TemporaryDirectory() as tmp, his.server(latency=latency) as server:
+        scraper = HISHotelsScraper(os.path.join(tmp, "hotels.db"))
+        urls_and_areas = [(server.url + path, area) for path, area in his.start_pages]
+        start = time.perf_counter()
+        scraper.scrape_all(urls_and_areas, rate=1000.0)
+        elapsed = time.perf_counter() - start
+        pages = len(server.request_log)
+    results.add("trip.scrape.pages_per_s", pages / elapsed, "pages/s", "higher")
+
+
+# 取り出したホテルを、チェックイン日を変えて dates 回分保存する（scrape_all と同じく1ページずつコミットする）
+def bench_hotels(results, his, dates, min_time):
+    extract = get_extractor()
+    pages = [(area, extract(html)[0]) for area, _, html in his.pages_by_area(extract)]
+    count = sum(len(hotels) for _, hotels in pages) * dates
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "hotels.db")
+        scraper = HISHotelsScraper(database)
+        conn = sqlite3.connect(database)
+        start = time.perf_counter()
+        for day in range(dates):
+            check_in = f"2025-{1 + day // 28:02d}-{1 + day % 28:02d}"
+            for area, hotels in pages:
+                with conn:
+                    scraper.save_hotels(conn, hotels, area, check_in)
+        with conn:
+            refresh_area_prices(conn)
+        elapsed = time.perf_counter() - start
+        conn.close()
+        results.add("trip.hotels_insert.rows_per_s", count / elapsed, "rows/s", "higher")
+
+        calls = measure(lambda: area_price_stats(database), min_time)
+        results.add("trip.average_prices.ms", 1000 / calls, "ms", "lower")
+        calls = measure(lambda: area_price_stats(database, "2025-01-01"), min_time)
+        results.add("trip.average_prices.by_date_ms", 1000 / calls, "ms", "lower")
+
+
+def bench_calculator(results, min_time):
+    rates = [measure(lambda: evaluate(text), min_time / len(EXPRESSIONS)) for text in EXPRESSIONS]
+    results.add("calculator.evaluate.per_s", statistics.geometric_mean(rates), "evals/s", "higher")
+    xs = np.linspace(-10, 10, 100_000)
+    rates = []
+    for text in VARIABLE_EXPRESSIONS:
+        compiled = compile_expression(text, ("x",))
+        rates.append(measure(lambda: compiled.over(x=xs), min_time / len(VARIABLE_EXPRESSIONS)) * len(xs))
+    results.add("calculator.evaluate.batch_points_per_s", statistics.geometric_mean(rates), "points/s", "higher")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def run(args):
+    jma, his = load_jma(args.fixtures), load_his(args.fixtures)
+    commit, dirty = git_commit()
+    quick = args.quick
+    min_time = 0.2 if quick else 1.0
+    digest = fixture_digest(jma, his)
+    print(f"コミット {commit}{' (変更あり)' if dirty else ''}, データ jma={jma.source} his={his.source} {digest}")
+
+    results = Results()
+    print("jma")
+    bench_region_fanout(results, jma, args.latency, rounds=1 if quick else 3)
+    bench_forecast_parse(results, jma, min_time)
+    bench_weather_reports(results, jma, publications=20 if quick else 100)
+    bench_forecast_archive(results, days=14 if quick else 90, min_time=min_time)
+    print("trip")
+    bench_extract(results, his, min_time)
+    bench_scrape(results, his, args.latency)
+    bench_hotels(results, his, dates=10 if quick else 60, min_time=min_time)
+    print("calculator")
+    bench_calculator(results, min_time)
+
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(JST).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "fixtures": {"jma": jma.source, "his": his.source, "digest": digest},
+        "settings": {"quick": quick, "latency": args.latency},
+        "results": results.values,
+    }
+
+
+# 2つの結果を比べて表にする。遅くなった項目の数を返す
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    if old.get("fixtures", {}).get("digest") != new.get("fixtures", {}).get("digest"):
+        print("注意: 測ったときのデータが違います（fixtures の digest が一致しません）")
+    if old.get("settings") != new.get("settings"):
+        print(f"注意: 設定が違います（{old.get('settings')} -> {new.get('settings')}）")
+    print(f"{'':<40} {old.get('commit', '?'):>14} {new.get('commit', '?'):>14}   変化")
+    regressions = 0
+    for name, after in new["results"].items():
+        before = old["results"].get(name)
+        if before is None or not before["value"]:
+            print(f"{name:<40} {'-':>14} {after['value']:14.4f}")
+            continue
+        change = after["value"] / before["value"] - 1
+        worse = change < -threshold if after["better"] == "higher" else change > threshold
+        regressions += worse
+        mark = "  遅くなった" if worse else ""
+        print(f"{name:<40} {before['value']:14.4f} {after['value']:14.4f} {change:+7.1%}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="オフラインのベンチマークを実行して結果を JSON に書き出す")
+    parser.add_argument("--output", help="結果の JSON（省略時は bench/results/<コミット>.json）")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="比べる結果（1つなら今回の結果と、2つならその2つを比べる）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="遅くなったとみなす変化の割合")
+    parser.add_argument("--quick", action="store_true", help="回数を減らして短時間で測る")
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="ローカルのサーバが応答を返すまでの遅延（秒）")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="記録したデータのディレクトリ")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
+
+    result = run(args)
+    path = args.output
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{result['commit']}{'-dirty' if result['dirty'] else ''}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"結果: {path}")
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            old = json.load(f)
+        sys.exit(1 if compare(old, result, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # metrics.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "trip"))
+from analytics import analyze  # noqa: E402
+from his_scraper import HISHotelsScraper  # noqa: E402
+
+# ホテルの料金と観光来訪者数の分析を、trip.ipynb の元のやり方（CSV を丸ごと pd.read_csv して
+# 1か月ずつ結合・相関）と analytics.py（都道府県の行だけを選んで必要な列だけを読み、プロセスプールで並行に読む）で比べる
+# 3年分（36か月）の CSV と、月に1回のチェックイン日ごとの料金を作って使う
+#
+#   python bench/bench_trip_analytics.py
+
+PREFECTURES = [
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県", "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県",
+    "東京都", "神奈川県", "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県", "静岡県", "愛知県", "三重県",
+    "滋賀県", "京都府", "大阪府", "兵庫県", "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県", "徳島県",
+    "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県", "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県",
+]
+DATA_KINDS = ["観光来訪者数", "宿泊者数", "日帰り客数", "県外来訪者数", "県内来訪者数", "外国人来訪者数"]
+MONTHS = [(year, month) for year in (2022, 2023, 2024) for month in range(1, 13)]
+MUNICIPALITIES = 1700
+
+
+# 観光来訪者数の CSV（都道府県の行と市区町村の行、使わない列も含む）を作る
+def make_tourism_csv(path, year, month, rng):
+    rows = []
+    for kind in DATA_KINDS:
+        for code, name in enumerate(PREFECTURES, 1):
+            rows.append((year, month, "都道府県", code * 1000, name, kind, rng.randint(100_000, 5_000_000), rng.uniform(80, 120), ""))
+        for i in range(MUNICIPALITIES):
+            rows.append((year, month, "市区町村", 100_000 + i, f"市町村{i}", kind, rng.randint(100, 200_000), rng.uniform(80, 120), ""))
+    columns = ["年", "月", "地域区分", "地域コード", "地域名称", "データ区分", "人数", "前年同月比", "備考"]
+    pd.DataFrame(rows, columns=columns).to_csv(path, index=False)
+
+
+# 県ごと・チェックイン日（毎月1日）ごとのホテルの料金を hotels.db に入れる
+def make_database(path, rng, hotels_per_area=30):
+    scraper = HISHotelsScraper(path)
+    conn = sqlite3.connect(path)
+    with conn:
+        for year, month in MONTHS:
+            for name in PREFECTURES:
+                area = name if name == "北海道" else name[:-1]
+                hotels = [(f"{area}ホテル{i}", f"{rng.randint(5000, 50000):,}") for i in range(hotels_per_area)]
+                scraper.save_hotels(conn, hotels, area, f"{year}-{month:02d}-01")
+    conn.close()
+
+
+# 元のやり方: 料金は手で書いた表の代わりに hotels から平均を取り、CSV は1つずつ丸ごと読む
+def analyze_original(database, csv_paths):
+    conn = sqlite3.connect(database)
+    hotels = pd.read_sql_query("SELECT area, check_in_date, price FROM hotels", conn)
+    conn.close()
+    averages = hotels.groupby(["area", "check_in_date"], as_index=False)["price"].mean()
+    averages["県名"] = averages["area"].map(lambda area: area if area == "北海道" else area + ("都" if area == "東京" else "府" if area in ("京都", "大阪") else "県"))
+    correlations = {}
+    for path, (year, month) in zip(csv_paths, MONTHS):
+        tourism_data = pd.read_csv(path)
+        tourism_data_filtered = tourism_data[(tourism_data["地域区分"] == "都道府県") & (tourism_data["データ区分"] == "観光来訪者数")]
+        prices = averages[averages["check_in_date"] == f"{year}-{month:02d}-01"]
+        merged_data = pd.merge(tourism_data_filtered, prices, left_on="地域名称", right_on="県名")
+        correlations[f"{year}-{month:02d}-01"] = merged_data["price"].corr(merged_data["人数"])
+    return correlations
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "hotels.db")
+        make_database(database, rng)
+        csv_paths = []
+        for year, month in MONTHS:
+            path = os.path.join(tmp, f"pref{year}{month:02d}.csv")
+            make_tourism_csv(path, year, month, rng)
+            csv_paths.append(path)
+        size = sum(os.path.getsize(path) for path in csv_paths)
+        print(f"CSV {len(csv_paths)} ファイル（合計 {size / 1e6:.0f} MB）, 県 {len(PREFECTURES)}, チェックイン日 {len(MONTHS)}")
+
+        start = time.perf_counter()
+        original = analyze_original(database, csv_paths)
+        print(f"変更前:               {time.perf_counter() - start:6.2f}秒")
+
+        for workers in (1, None):
+            start = time.perf_counter()
+            joined, stats = analyze(database, csv_paths, workers=workers)
+            label = "1プロセス" if workers == 1 else f"プロセスプール {os.cpu_count()}"
+            print(f"analytics.py ({label}): {time.perf_counter() - start:6.2f}秒  結合した行 {len(joined)}")
+
+        mismatches = sum(
+            abs(row.correlation - original[row.check_in_date]) > 1e-9 for row in stats.itertuples()
+        )
+        print(f"相関係数の一致: {'OK' if not mismatches and len(stats) == len(original) else f'{mismatches} 件の不一致'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)  # metrics.py, stand_in_server.py
+sys.path.insert(0, os.path.join(ROOT, "jma"))
+sys.path.insert(0, os.path.join(ROOT, "trip"))
+from client import JmaClient  # noqa: E402
+from extractors import get_extractor  # noqa: E402
+from his_local_server import LocalHisServer, sample_pages  # noqa: E402
+from his_scraper import DEFAULT_RATE, MAX_PAGES  # noqa: E402
+from jma_local_server import LocalJmaServer  # noqa: E402
+
+# ベンチマーク（bench_suite.py）で使う固定のデータ
+# 気象庁の area.json と全府県予報区の天気予報JSON、HIS の検索結果ページを記録して bench/fixtures/ にコミットしておき、
+# ローカルのスタンドインサーバ（jma/jma_local_server.py, trip/his_local_server.py）から返す
+# どのチェックアウトでも同じデータで測るので、コミットどうし・環境どうしで結果を比べられる
+# （データが変わると fixture_digest が変わり、前の結果と比べるときに注意が出る）
+#
+#   python bench/fixtures.py record                 # 本物のサーバから bench/fixtures/ に記録する（数分かかる）
+#   python bench/fixtures.py record --his-urls urls.tsv
+#   python bench/fixtures.py                        # 使うデータの種類・件数と digest を表示する
+#
+# 記録したものがなければ、同じ形のデータを決まった乱数から作って使う（source が "synthetic" になる）
+#
+#   bench/fixtures/manifest.json             記録した日時と HIS の最初のページの一覧
+#   bench/fixtures/jma/area.json
+#   bench/fixtures/jma/forecast/<府県予報区コード>.json
+#   bench/fixtures/his/<地域>/<n>.html
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+JST = timezone(timedelta(hours=9))
+HIS_ORIGIN = "https://hotel.his-j.com"
+# trip.ipynb に書いてある検索URLと地域（--his-urls を指定しないときに使う）
+NOTEBOOK_URL_RE = re.compile(r"\('(https://hotel\.his-j\.com/[^']+)',\s*'([^']+)'\)")
+
+
+class JmaFixtures:
+    def __init__(self, area, forecasts, source):
+        self.area = area
+        self.forecasts = forecasts  # 府県予報区コード -> 天気予報JSON
+        self.source = source  # "recorded" か "synthetic"
+
+    # 府県予報区ごとの JSON の本文（サーバが返すのと同じバイト列）
+    def payloads(self):
+        return {code: json.dumps(data, ensure_ascii=False).encode("utf-8") for code, data in self.forecasts.items()}
+
+    def server(self, latency=0.0):
+        return LocalJmaServer(forecasts=self.forecasts, area=self.area, latency=latency)
+
+
+class HisFixtures:
+    def __init__(self, pages, start_pages, source):
+        self.pages = pages  # "パス?クエリ" -> HTML
+        self.start_pages = start_pages  # [(最初のページのパス, 地域), ...]
+        self.source = source
+
+    # 地域ごとにページを順にたどった [(地域, チェックイン日, HTML), ...]
+    def pages_by_area(self, extract=None):
+        extract = extract or get_extractor()
+        result = []
+        for start, area in self.start_pages:
+            path, seen = start, set()
+            while path in self.pages and path not in seen and len(seen) < MAX_PAGES:
+                seen.add(path)
+                html = self.pages[path]
+                result.append((area, _check_in(start), html))
+                _, next_href = extract(html)
+                if next_href is None:
+                    break
+                path = _path(urljoin(start, next_href))
+        return result
+
+    def server(self, latency=0.0):
+        return LocalHisServer(self.pages, latency=latency)
+
+
+def _path(url):
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def _check_in(path):
+    match = re.search(r"checkInDate=(\d{4})(\d{2})(\d{2})", path)
+    return f"{match.group(1)}-{match.group(2)}-{match.group(3)}" if match else ""
+
+
+def load_jma(directory=FIXTURE_DIR):
+    area_path = os.path.join(directory, "jma", "area.json")
+    forecast_dir = os.path.join(directory, "jma", "forecast")
+    if not os.path.exists(area_path) or not os.path.isdir(forecast_dir):
+        return synthetic_jma()
+    with open(area_path, encoding="utf-8") as f:
+        area = json.load(f)
+    forecasts = {}
+    for name in sorted(os.listdir(forecast_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(forecast_dir, name), encoding="utf-8") as f:
+                forecasts[name[:-len(".json")]] = json.load(f)
+    return JmaFixtures(area, forecasts, "recorded")
+
+
+def load_his(directory=FIXTURE_DIR):
+    manifest = _read_manifest(directory)
+    if not manifest.get("his"):
+        return synthetic_his()
+    pages = {}
+    for path, file in manifest["his"]["pages"].items():
+        with open(os.path.join(directory, "his", file), encoding="utf-8") as f:
+            pages[path] = f.read()
+    return HisFixtures(pages, [tuple(item) for item in manifest["his"]["start_pages"]], "recorded")
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# 結果を比べるときに、同じデータで測ったかを確かめるためのハッシュ
+def fixture_digest(jma, his):
+    digest = hashlib.sha1()
+    for code, body in sorted(jma.payloads().items()):
+        digest.update(code.encode())
+        digest.update(body)
+    for path, html in sorted(his.pages.items()):
+        digest.update(path.encode())
+        digest.update(html.encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+# 本物に近い数の地方・府県予報区・細分区域を持つ area.json と天気予報JSONを作る
+SYNTHETIC_REGIONS = [
+    ("北海道地方", 8), ("東北地方", 6), ("関東甲信地方", 9), ("東海地方", 4), ("北陸地方", 4), ("近畿地方", 6),
+    ("中国地方（山口県を除く）", 4), ("四国地方", 4), ("九州北部地方（山口県を含む）", 7), ("九州南部・奄美地方", 4), ("沖縄地方", 4),
+]
+WEATHERS = [
+    ("100", "晴れ"), ("101", "晴れ　時々　くもり"), ("200", "くもり"), ("201", "くもり　時々　晴れ"),
+    ("202", "くもり　一時　雨"), ("300", "雨"), ("313", "雨　のち　くもり"), ("400", "雪"),
+]
+
+
+def synthetic_jma(seed=0, now=None):
+    rng = random.Random(seed)
+    now = now or datetime(2025, 2, 1, 11, tzinfo=JST)
+    area = {"centers": {}, "offices": {}, "class10s": {}, "class15s": {}, "class20s": {}}
+    forecasts = {}
+    office_number = 0
+    for center_number, (center_name, office_count) in enumerate(SYNTHETIC_REGIONS, 1):
+        center_code = f"{center_number:02d}0100"
+        center = area["centers"][center_code] = {"name": center_name, "enName": f"Region {center_number}", "children": []}
+        for _ in range(office_count):
+            office_number += 1
+            office_code = f"{office_number:02d}0000"
+            center["children"].append(office_code)
+            office = area["offices"][office_code] = {
+                "name": f"府県{office_number}", "enName": f"Office {office_number}", "parent": center_code,
+                "children": [], "officeName": f"府県{office_number}気象台",
+            }
+            for c10 in range(rng.randint(2, 4)):
+                class10_code = f"{office_number:02d}{c10:02d}10"
+                office["children"].append(class10_code)
+                class10 = area["class10s"][class10_code] = {
+                    "name": f"府県{office_number}{c10}地方", "enName": "", "parent": office_code, "children": [],
+                }
+                for c15 in range(2):
+                    class15_code = f"{office_number:02d}{c10:02d}{c15}5"
+                    class10["children"].append(class15_code)
+                    class15 = area["class15s"][class15_code] = {
+                        "name": f"府県{office_number}{c10}{c15}", "enName": "", "parent": class10_code, "children": [],
+                    }
+                    for c20 in range(5):
+                        class20_code = f"{office_number:02d}{c10:02d}{c15}{c20}0"
+                        class15["children"].append(class20_code)
+                        area["class20s"][class20_code] = {
+                            "name": f"市町村{office_number}-{c10}{c15}{c20}", "enName": "", "kana": "", "parent": class15_code,
+                        }
+            forecasts[office_code] = _synthetic_forecast(rng, office_code, office, area, now)
+    return JmaFixtures(area, forecasts, "synthetic")
+
+
+def _synthetic_forecast(rng, office_code, office, area, now):
+    report = now.replace(minute=0, second=0, microsecond=0).isoformat()
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = [(day + timedelta(days=i)).isoformat() for i in range(3)]
+    six_hours = [(day + timedelta(hours=12 + 6 * i)).isoformat() for i in range(6)]
+    temp_times = [(day + timedelta(days=i, hours=h)).isoformat() for i in (1, 1) for h in (0, 9)]
+    week = [(day + timedelta(days=1 + i)).isoformat() for i in range(7)]
+    class10s = [(code, area["class10s"][code]["name"]) for code in office["children"]]
+    stations = [(f"{office_code[:2]}{i:03d}", f"地点{office_code[:2]}-{i}") for i in range(rng.randint(1, 3))]
+
+    def weather_area(code, name):
+        picked = [rng.choice(WEATHERS) for _ in days]
+        return {
+            "area": {"name": name, "code": code},
+            "weatherCodes": [code for code, _ in picked],
+            "weathers": [text for _, text in picked],
+            "winds": ["北の風　やや強く" if rng.random() < 0.3 else "北の風" for _ in days],
+            "waves": ["１メートル" for _ in days],
+        }
+
+    short = {
+        "publishingOffice": office["officeName"],
+        "reportDatetime": report,
+        "timeSeries": [
+            {"timeDefines": days, "areas": [weather_area(code, name) for code, name in class10s]},
+            {
+                "timeDefines": six_hours,
+                "areas": [
+                    {"area": {"name": name, "code": code}, "pops": [str(rng.randrange(0, 101, 10)) for _ in six_hours]}
+                    for code, name in class10s
+                ],
+            },
+            {
+                "timeDefines": temp_times,
+                "areas": [
+                    {"area": {"name": name, "code": code}, "temps": [str(rng.randint(-5, 20)) for _ in temp_times]}
+                    for code, name in stations
+                ],
+            },
+        ],
+    }
+    weekly = {
+        "publishingOffice": office["officeName"],
+        "reportDatetime": report,
+        "timeSeries": [
+            {
+                "timeDefines": week,
+                "areas": [{
+                    "area": {"name": office["name"], "code": class10s[0][0]},
+                    "weatherCodes": [rng.choice(WEATHERS)[0] for _ in week],
+                    "pops": ["", *(str(rng.randrange(0, 101, 10)) for _ in week[1:])],
+                    "reliabilities": ["", "", *(rng.choice("ABC") for _ in week[2:])],
+                }],
+            },
+            {
+                "timeDefines": week,
+                "areas": [
+                    {
+                        "area": {"name": name, "code": code},
+                        "tempsMin": ["", *(str(rng.randint(-5, 10)) for _ in week[1:])],
+                        "tempsMinUpper": ["", *(str(rng.randint(0, 12)) for _ in week[1:])],
+                        "tempsMinLower": ["", *(str(rng.randint(-8, 5)) for _ in week[1:])],
+                        "tempsMax": ["", *(str(rng.randint(5, 25)) for _ in week[1:])],
+                        "tempsMaxUpper": ["", *(str(rng.randint(8, 28)) for _ in week[1:])],
+                        "tempsMaxLower": ["", *(str(rng.randint(0, 20)) for _ in week[1:])],
+                    }
+                    for code, name in stations
+                ],
+            },
+        ],
+        "tempAverage": {"areas": [{"area": {"name": name, "code": code}, "min": "2.0", "max": "10.5"} for code, name in stations]},
+        "precipAverage": {"areas": [{"area": {"name": name, "code": code}, "min": "5", "max": "15"} for code, name in stations]},
+    }
+    return [short, weekly]
+
+
+SYNTHETIC_AREAS = ["福岡", "佐賀", "長崎", "熊本", "大分", "宮崎", "鹿児島", "沖縄"]
+
+
+# 本物と同じくホテル以外の部分が大きいページにする（his_local_server.search_page の realistic）
+def synthetic_his():
+    pages, start_pages = sample_pages(SYNTHETIC_AREAS, pages_per_area=5, hotels_per_page=30, realistic=True)
+    return HisFixtures(pages, start_pages, "synthetic")
+
+
+# 気象庁から area.json と全府県予報区の天気予報を記録する
+async def record_jma(directory):
+    client = JmaClient()
+    try:
+        area = await client.get_area_list()
+        forecast_dir = os.path.join(directory, "jma", "forecast")
+        os.makedirs(forecast_dir, exist_ok=True)
+        with open(os.path.join(directory, "jma", "area.json"), "w", encoding="utf-8") as f:
+            json.dump(area, f, ensure_ascii=False)
+        count = 0
+        for office_code in area["offices"]:
+            try:
+                data = await client.get_weather_forecast(office_code)
+            except httpx.HTTPError as e:
+                print(f"{office_code}: 取得できませんでした ({e})", file=sys.stderr)
+                continue
+            with open(os.path.join(forecast_dir, f"{office_code}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            count += 1
+        print(f"jma: area.json と府県予報区 {count} 件を記録しました")
+    finally:
+        await client.aclose()
+
+
+# HIS の検索結果を次のページまでたどって記録する（間隔は his_scraper と同じ DEFAULT_RATE を守る）
+# ページャのリンクはローカルのサーバでたどれるように、ホスト名を取り除いて保存する
+def record_his(directory, urls_and_areas):
+    extract = get_extractor()
+    pages, files, start_pages = {}, {}, []
+    counts = {}
+    with httpx.Client(follow_redirects=True, timeout=30.0) as client:
+        for start_url, area in urls_and_areas:
+            url = start_url
+            start_pages.append((_path(start_url), area))
+            for _ in range(MAX_PAGES):
+                path = _path(url)
+                if path in pages:
+                    break
+                time.sleep(1 / DEFAULT_RATE)
+                response = client.get(url)
+                response.raise_for_status()
+                html = response.text.replace(HIS_ORIGIN, "")
+                counts[area] = counts.get(area, 0) + 1
+                pages[path] = html
+                files[path] = f"{area}/{counts[area]}.html"
+                _, next_href = extract(html)
+                if next_href is None:
+                    break
+                url = urljoin(url, next_href)
+    for path, file in files.items():
+        os.makedirs(os.path.join(directory, "his", os.path.dirname(file)), exist_ok=True)
+        with open(os.path.join(directory, "his", file), "w", encoding="utf-8") as f:
+            f.write(pages[path])
+    print(f"his: 地域 {len(counts)}, ページ {len(pages)} を記録しました")
+    return {"pages": files, "start_pages": start_pages}
+
+
+def read_his_urls(path=None):
+    if path is None:
+        with open(os.path.join(ROOT, "trip", "trip.ipynb"), encoding="utf-8") as f:
+            source = "".join("".join(cell["source"]) for cell in json.load(f)["cells"])
+        return list(dict.fromkeys(NOTEBOOK_URL_RE.findall(source)))
+    with open(path, encoding="utf-8") as f:
+        return [tuple(line.rstrip("\n").split("\t")[:2]) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用のデータを記録する")
+    parser.add_argument("command", nargs="?", choices=["record", "info"], default="info")
+    parser.add_argument("--dir", default=FIXTURE_DIR)
+    parser.add_argument("--his-urls", help="HIS の検索URLと地域をタブ区切りで書いたファイル（省略時は trip.ipynb から読む）")
+    parser.add_argument("--skip-jma", action="store_true")
+    parser.add_argument("--skip-his", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        manifest = _read_manifest(args.dir)
+        if not args.skip_jma:
+            asyncio.run(record_jma(args.dir))
+            manifest["jma_recorded_at"] = datetime.now(JST).isoformat(timespec="seconds")
+        if not args.skip_his:
+            manifest["his"] = record_his(args.dir, read_his_urls(args.his_urls))
+            manifest["his_recorded_at"] = datetime.now(JST).isoformat(timespec="seconds")
+        os.makedirs(args.dir, exist_ok=True)
+        with open(os.path.join(args.dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    jma, his = load_jma(args.dir), load_his(args.dir)
+    print(f"jma: {jma.source}, 府県予報区 {len(jma.forecasts)}, 細分区域 {len(jma.area['class20s'])}")
+    print(f"his: {his.source}, ページ {len(his.pages)}, 地域 {len({area for _, area in his.start_pages})}")
+    print(f"digest: {fixture_digest(jma, his)}")
+
+
+if __name__ == "__main__":
+    main()
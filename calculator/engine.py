@@ -0,0 +1,678 @@
+import decimal
+import math
+import re
+from contextlib import nullcontext
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+# 電卓の式を評価するエンジン
+# 式の文字列を字句に分けて構文木にし、定数の部分は先に計算しておき（定数畳み込み）、
+# 残りを Python のバイトコードにコンパイルする。コンパイルした式は LRU に覚えておくので、
+# 同じ式を何度評価してもパースし直さない
+#
+#   evaluate("2+3*4")              # 14.0
+#   evaluate("sin(pi/2)+2^10")     # 1025.0
+#   f = compile_expression("x^2+1", variables=("x",))
+#   f(x=3)                         # 10.0
+#   f.over(x=np.linspace(0, 1, 5)) # NumPy の配列でまとめて評価する
+#   xs, ys = sample_function("sin(x)*x²", -10, 10)   # グラフ用に点を取る
+#   evaluate("0.1+0.2", backend=get_backend("decimal", 50))   # Decimal('0.3')
+#   evaluate("1/3+1/6", backend=FRACTION)                      # Fraction(1, 2)
+#
+# 使える演算子（優先順位の低い順）
+#   + -        足し算・引き算
+#   * / × ÷    掛け算・割り算
+#   - +        符号（前置）
+#   ^ **       べき乗（右結合。-2^2 は -(2^2)）
+#   % ² ³      百分率・2乗・3乗（後置）
+# 関数は sin cos tan（ラジアン）, exp, sqrt, ln, log、定数は pi, e
+#
+# 数の種類（バックエンド）は float（ふつうの浮動小数点数）・decimal（桁数を指定できる10進数）・
+# fraction（分数で正確に計算する）から選べる。fraction では sin や sqrt(2) のように分数で表せない
+# 値が出たところから先は float で計算する
+
+# コンパイルした式を覚えておく数
+CACHE_SIZE = 256
+# 受け付ける式の長さ（これより長い式はエラー）
+MAX_LENGTH = 1000
+# decimal で指定できる桁数の上限
+MAX_PRECISION = 500
+# fraction で扱う数の大きさの上限（分子・分母のビット数）
+MAX_FRACTION_BITS = 100_000
+# fraction の値を分数のまま表示する大きさの上限（分子・分母のビット数。約 480 桁。表示した値を続けて式に使えるように）
+FRACTION_DISPLAY_BITS = 1600
+
+
+class CalcError(Exception):
+    pass
+
+
+TOKEN_RE = re.compile(r'''
+    \s*(?:
+        (?P<number>(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op>\*\*|[-+*/^%()²³×÷])
+    )''', re.VERBOSE)
+
+# 同じ意味の記号をそろえる
+OP_ALIASES = {'×': '*', '÷': '/', '**': '^'}
+
+
+# 式を (種類, 値) の並びに分ける。種類は 'number' / 'name' / 'op'
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None:
+            raise CalcError(f'読めない文字があります: {text[pos:].strip()[:10]!r}')
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'op':
+            value = OP_ALIASES.get(value, value)
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def _pow(base, exponent):
+    try:
+        return math.pow(base, exponent)
+    except ValueError:
+        raise CalcError('べき乗を計算できません') from None
+
+
+def _sqrt(value):
+    try:
+        return math.sqrt(value)
+    except ValueError:
+        raise CalcError('負の数の平方根は計算できません') from None
+
+
+def _log(value):
+    try:
+        return math.log10(value)
+    except ValueError:
+        raise CalcError('0 以下の対数は計算できません') from None
+
+
+def _ln(value):
+    try:
+        return math.log(value)
+    except ValueError:
+        raise CalcError('0 以下の対数は計算できません') from None
+
+
+# 関数・定数・演算に使う実装（コンパイルした式の中からは名前で呼ばれる）
+FUNCTIONS = {
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'exp': math.exp,
+    'sqrt': _sqrt,
+    'ln': _ln,
+    'log': _log,
+}
+CONSTANTS = {'pi': math.pi, 'e': math.e}
+NAMESPACE = {'_pow': _pow, **{f'_{name}': function for name, function in FUNCTIONS.items()}}
+
+# 配列でまとめて評価するときの実装。計算できない点はエラーにせず nan になる
+ARRAY_FUNCTIONS = {
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'exp': np.exp,
+    'sqrt': np.sqrt,
+    'ln': np.log,
+    'log': np.log10,
+}
+ARRAY_NAMESPACE = {'_pow': np.power, **{f'_{name}': function for name, function in ARRAY_FUNCTIONS.items()}}
+
+
+# 数の種類ごとの、数字の読み方・関数の実装・定数・値の表示のしかた
+class Backend:
+    def __init__(self, name, type, number, namespace, constants, is_finite, format, context=None):
+        self.name = name
+        self.type = type
+        self.number = number  # 数字の文字列 -> 値
+        self.namespace = namespace
+        self.constants = constants
+        self.is_finite = is_finite
+        self.format = format  # 値 -> 表示する文字列（そのまま式に書いても読める形）
+        self._context = context
+
+    # 計算するときの decimal のコンテキスト（桁数）
+    def context(self):
+        return decimal.localcontext(self._context) if self._context is not None else nullcontext()
+
+    # 変数に渡された値をこの数の種類にする
+    def convert(self, value):
+        return value if isinstance(value, self.type) else self.number(str(value))
+
+    def __repr__(self):
+        return f'Backend({self.name!r})'
+
+
+def _format_float(value):
+    return str(int(value)) if value % 1 == 0 else str(value)
+
+
+FLOAT = Backend('float', float, float, NAMESPACE, CONSTANTS, math.isfinite, _format_float)
+
+
+# Decimal の実装。計算はそのときのコンテキストの桁数で行う
+def _decimal_pow(base, exponent):
+    if not exponent:
+        return decimal.Decimal(1)
+    try:
+        return base ** exponent
+    except decimal.InvalidOperation:
+        raise CalcError('べき乗を計算できません') from None
+
+
+def _decimal_sqrt(value):
+    if value < 0:
+        raise CalcError('負の数の平方根は計算できません')
+    return value.sqrt()
+
+
+def _decimal_log(value):
+    if value <= 0:
+        raise CalcError('0 以下の対数は計算できません')
+    return value.log10()
+
+
+def _decimal_ln(value):
+    if value <= 0:
+        raise CalcError('0 以下の対数は計算できません')
+    return value.ln()
+
+
+# 円周率を precision 桁で求める（decimal モジュールのドキュメントのレシピ）
+@lru_cache(maxsize=16)
+def _decimal_pi(precision):
+    with decimal.localcontext() as context:
+        context.prec = precision + 2
+        three = decimal.Decimal(3)
+        last, t, total, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+        while total != last:
+            last = total
+            n, na = n + na, na + 8
+            d, da = d + da, da + 32
+            t = (t * n) / d
+            total += t
+        context.prec = precision
+        return +total
+
+
+# sin・cos の級数がすぐ収束するように x を -π〜π に寄せる
+def _decimal_reduce(x):
+    if x.adjusted() > MAX_PRECISION:
+        raise CalcError('値が大きすぎます')
+    with decimal.localcontext() as context:
+        context.prec += max(x.adjusted(), 0) + 5
+        pi = _decimal_pi(context.prec)
+        x = x % (2 * pi)
+        if x > pi:
+            x -= 2 * pi
+        elif x < -pi:
+            x += 2 * pi
+        return x
+
+
+# sin・cos はテイラー級数で求める（decimal モジュールのドキュメントのレシピ）
+def _decimal_series(x, i, total, power):
+    with decimal.localcontext() as context:
+        context.prec += 2
+        last, factorial, sign = 0, 1, 1
+        while total != last:
+            last = total
+            i += 2
+            factorial *= i * (i - 1)
+            power *= x * x
+            sign = -sign
+            total += power / factorial * sign
+    return +total
+
+
+def _decimal_sin(x):
+    x = _decimal_reduce(x)
+    return _decimal_series(x, 1, x, x)
+
+
+def _decimal_cos(x):
+    x = _decimal_reduce(x)
+    return _decimal_series(x, 0, decimal.Decimal(1), decimal.Decimal(1))
+
+
+def _decimal_tan(x):
+    return _decimal_sin(x) / _decimal_cos(x)
+
+
+def _decimal_exp(value):
+    return value.exp()
+
+
+DECIMAL_FUNCTIONS = {
+    'sin': _decimal_sin,
+    'cos': _decimal_cos,
+    'tan': _decimal_tan,
+    'exp': _decimal_exp,
+    'sqrt': _decimal_sqrt,
+    'ln': _decimal_ln,
+    'log': _decimal_log,
+}
+DECIMAL_NAMESPACE = {'_pow': _decimal_pow, **{f'_{name}': function for name, function in DECIMAL_FUNCTIONS.items()}}
+
+
+# precision 桁の decimal のバックエンド（桁数ごとに1つ作って使い回す）
+@lru_cache(maxsize=16)
+def decimal_backend(precision=28):
+    if not 1 <= precision <= MAX_PRECISION:
+        raise CalcError(f'桁数は 1〜{MAX_PRECISION} にしてください')
+    context = decimal.Context(
+        prec=precision,
+        rounding=decimal.ROUND_HALF_EVEN,
+        traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow],
+    )
+
+    def format_decimal(value):
+        if not value:
+            return '0'
+        value = value.normalize(context)
+        if -6 <= value.adjusted() < precision:
+            return format(value, 'f')
+        return str(value)
+
+    constants = {'pi': _decimal_pi(precision), 'e': decimal.Decimal(1).exp(context)}
+    return Backend(
+        'decimal', decimal.Decimal, decimal.Decimal, DECIMAL_NAMESPACE, constants,
+        decimal.Decimal.is_finite, format_decimal, context,
+    )
+
+
+# Fraction の実装。分数で表せない値は float で返す
+def _fraction_number(text):
+    _, _, exponent = text.lower().partition('e')
+    if exponent and abs(int(exponent)) * 4 > MAX_FRACTION_BITS:
+        raise CalcError('値が大きすぎます')
+    return Fraction(text)
+
+
+def _fraction_pow(base, exponent):
+    if isinstance(base, Fraction) and isinstance(exponent, Fraction) and exponent.denominator == 1:
+        bits = max(abs(base.numerator).bit_length(), base.denominator.bit_length()) - 1
+        if bits * abs(exponent.numerator) > MAX_FRACTION_BITS:
+            raise CalcError('値が大きすぎます')
+        return base ** exponent
+    return _pow(float(base), float(exponent))
+
+
+def _fraction_sqrt(value):
+    if isinstance(value, Fraction) and value >= 0:
+        numerator, denominator = math.isqrt(value.numerator), math.isqrt(value.denominator)
+        if numerator ** 2 == value.numerator and denominator ** 2 == value.denominator:
+            return Fraction(numerator, denominator)
+    return _sqrt(value)
+
+
+def _fraction_is_finite(value):
+    return isinstance(value, Fraction) or math.isfinite(value)
+
+
+# 分数で表示する。長すぎるときは 30 桁の小数にする
+def _format_fraction(value):
+    if not isinstance(value, Fraction):
+        return _format_float(value)
+    if max(abs(value.numerator).bit_length(), value.denominator.bit_length()) > FRACTION_DISPLAY_BITS:
+        context = decimal.Context(prec=30)
+        return str(context.divide(decimal.Decimal(value.numerator), decimal.Decimal(value.denominator)))
+    return str(value)
+
+
+FRACTION_NAMESPACE = {**NAMESPACE, '_pow': _fraction_pow, '_sqrt': _fraction_sqrt}
+FRACTION = Backend(
+    'fraction', Fraction, _fraction_number, FRACTION_NAMESPACE, CONSTANTS, _fraction_is_finite, _format_fraction,
+)
+
+BACKENDS = ('float', 'decimal', 'fraction')
+
+
+# 名前から数の種類を選ぶ（precision は decimal の桁数）
+def get_backend(name='float', precision=28):
+    if name == 'float':
+        return FLOAT
+    if name == 'decimal':
+        return decimal_backend(precision)
+    if name == 'fraction':
+        return FRACTION
+    raise CalcError(f'知らない数の種類です: {name}')
+
+
+# 構文木のノード
+#   ('num', 値)  ('var', 名前)  ('neg', x)  ('bin', 演算子, a, b)  ('call', 関数名, x)
+class Parser:
+    def __init__(self, tokens, variables=(), backend=FLOAT):
+        self.tokens = tokens
+        self.variables = variables
+        self.backend = backend
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, value):
+        if self.peek() != ('op', value):
+            raise CalcError(f'{value!r} がありません')
+        self.pos += 1
+
+    def parse(self):
+        if not self.tokens:
+            raise CalcError('式が空です')
+        node = self.expression()
+        if self.pos < len(self.tokens):
+            raise CalcError(f'余分な {self.peek()[1]!r} があります')
+        return node
+
+    def expression(self):
+        node = self.term()
+        while self.peek() in (('op', '+'), ('op', '-')):
+            node = ('bin', self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (('op', '*'), ('op', '/')):
+            node = ('bin', self.take()[1], node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ('op', '-'):
+            self.take()
+            return ('neg', self.unary())
+        if self.peek() == ('op', '+'):
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        node = self.postfix()
+        if self.peek() == ('op', '^'):
+            self.take()
+            node = ('bin', '^', node, self.unary())
+        return node
+
+    def postfix(self):
+        node = self.primary()
+        while True:
+            token = self.peek()
+            if token == ('op', '%'):
+                node = ('bin', '/', node, ('num', self.backend.number('100')))
+            elif token == ('op', '²'):
+                node = ('bin', '^', node, ('num', self.backend.number('2')))
+            elif token == ('op', '³'):
+                node = ('bin', '^', node, ('num', self.backend.number('3')))
+            else:
+                return node
+            self.take()
+
+    def primary(self):
+        kind, value = self.take()
+        if kind == 'number':
+            number = self.backend.number(value)
+            if not self.backend.is_finite(number):
+                raise CalcError('値が大きすぎます')
+            return ('num', number)
+        if kind == 'name':
+            if value in FUNCTIONS:
+                self.expect('(')
+                node = ('call', value, self.expression())
+                self.expect(')')
+                return node
+            if value in self.backend.constants:
+                return ('num', self.backend.constants[value])
+            if value in self.variables:
+                return ('var', value)
+            raise CalcError(f'知らない名前です: {value}')
+        if (kind, value) == ('op', '('):
+            node = self.expression()
+            self.expect(')')
+            return node
+        raise CalcError('式が途中で終わっています' if kind is None else f'{value!r} の位置がおかしいです')
+
+
+# 子がすべて定数のノードを先に計算して定数にする（計算できないものはそのまま残し、評価時にエラーにする）
+def fold_constants(node, backend=FLOAT):
+    kind = node[0]
+    if kind in ('num', 'var'):
+        return node
+    if kind == 'neg':
+        child = fold_constants(node[1], backend)
+        return ('num', -child[1]) if child[0] == 'num' else ('neg', child)
+    if kind == 'call':
+        child = fold_constants(node[2], backend)
+        node = ('call', node[1], child)
+    else:
+        node = ('bin', node[1], fold_constants(node[2], backend), fold_constants(node[3], backend))
+    if all(child[0] == 'num' for child in node[2:]):
+        literals = None if backend is FLOAT else {}
+        try:
+            value = _run(to_source(node, 0, literals), literals or {}, backend)
+        except CalcError:
+            return node
+        if backend.is_finite(value):
+            return ('num', value)
+    return node
+
+
+# 演算子の優先順位（Python の式に直すときに必要な括弧だけを付けるのに使う）
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, 'neg': 3}
+
+
+# 構文木を Python の式の文字列にする
+# float 以外の数は式に直接書けないので、literals を渡すと _k0, _k1, ... という名前で参照してそこに入れる
+def to_source(node, parent=0, literals=None):
+    kind = node[0]
+    if kind == 'num':
+        if literals is not None:
+            name = f'_k{len(literals)}'
+            literals[name] = node[1]
+            return name
+        return f'({node[1]!r})' if node[1] < 0 else repr(node[1])
+    if kind == 'var':
+        return node[1]
+    if kind == 'call':
+        return f'_{node[1]}({to_source(node[2], 0, literals)})'
+    if kind == 'neg':
+        source = f'-{to_source(node[1], PRECEDENCE["neg"], literals)}'
+        return f'({source})' if parent >= PRECEDENCE['neg'] else source
+    op, a, b = node[1:]
+    if op == '^':
+        return f'_pow({to_source(a, 0, literals)}, {to_source(b, 0, literals)})'
+    precedence = PRECEDENCE[op]
+    # 左結合なので、右側に同じ優先順位の式が来たときだけ括弧が要る
+    source = f'{to_source(a, precedence, literals)} {op} {to_source(b, precedence + 1, literals)}'
+    return f'({source})' if precedence < parent else source
+
+
+def _run(source, variables, backend=FLOAT):
+    try:
+        with backend.context():
+            return eval(source, {'__builtins__': {}, **backend.namespace}, variables)
+    except ZeroDivisionError:
+        raise CalcError('0 で割ることはできません') from None
+    except (OverflowError, decimal.Overflow):
+        raise CalcError('値が大きすぎます') from None
+    except (ValueError, decimal.InvalidOperation):
+        raise CalcError('計算できない値です') from None
+
+
+# コンパイル済みの式。呼び出すと値を返す（変数はキーワード引数で渡す）
+class CompiledExpression:
+    def __init__(self, text, tree, variables, backend=FLOAT):
+        self.text = text
+        self.tree = tree
+        self.variables = variables
+        self.backend = backend
+        self.is_finite = backend.is_finite
+        self.literals = None if backend is FLOAT else {}
+        self.source = to_source(tree, 0, self.literals)
+        self.constant = tree[1] if tree[0] == 'num' else None
+        self.function = self._compile(backend.namespace)
+        self._array_function = None
+
+    def _compile(self, namespace):
+        try:
+            return eval(
+                compile(f'lambda {", ".join(self.variables)}: {self.source}', '<calc>', 'eval'),
+                {'__builtins__': {}, **namespace, **(self.literals or {})},
+            )
+        except (SyntaxError, RecursionError, MemoryError):
+            raise CalcError('式が複雑すぎます') from None
+
+    def __call__(self, **values):
+        if self.constant is not None:
+            return self.constant
+        try:
+            value = self.function(**values)
+        except ZeroDivisionError:
+            raise CalcError('0 で割ることはできません') from None
+        except (OverflowError, decimal.Overflow):
+            raise CalcError('値が大きすぎます') from None
+        except (ValueError, decimal.InvalidOperation):
+            raise CalcError('計算できない値です') from None
+        except TypeError:
+            raise CalcError(f'変数の値が足りません: {", ".join(self.variables)}') from None
+        if not self.is_finite(value):
+            raise CalcError('値が大きすぎます')
+        return value
+
+    # 変数に配列を渡してまとめて評価する（配列どうしは NumPy の規則でブロードキャストする）
+    # 0 で割る・負の数の平方根など計算できない点や、大きすぎる点は nan になる
+    def over(self, **arrays):
+        missing = set(self.variables) - set(arrays)
+        if missing:
+            raise CalcError(f'変数の値が足りません: {", ".join(sorted(missing))}')
+        arrays = {name: np.asarray(arrays[name], dtype=np.float64) for name in self.variables}
+        shape = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+        if self.constant is not None:
+            return np.full(shape, self.constant)
+        if self._array_function is None:
+            self._array_function = self._compile(ARRAY_NAMESPACE)
+        with np.errstate(all='ignore'):
+            values = np.broadcast_to(self._array_function(**arrays), shape).astype(np.float64)
+        values[~np.isfinite(values)] = np.nan
+        return values
+
+    def __repr__(self):
+        return f'CompiledExpression({self.text!r} -> {self.source})'
+
+
+# float 以外の数の種類でコンパイルした式。decimal の桁数などのコンテキストの中で評価する
+class BackendExpression(CompiledExpression):
+    def __call__(self, **values):
+        values = {name: self.backend.convert(value) for name, value in values.items()}
+        with self.backend.context():
+            return CompiledExpression.__call__(self, **values)
+
+    def over(self, **arrays):
+        raise CalcError('配列でまとめて評価できるのは float のときだけです')
+
+    def __repr__(self):
+        return f'BackendExpression({self.text!r} -> {self.source}, {self.backend.name})'
+
+
+# 式をコンパイルする（同じ式・変数・数の種類の組み合わせは LRU に覚えておいたものを返す）
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_expression(text, variables=(), backend=FLOAT):
+    if len(text) > MAX_LENGTH:
+        raise CalcError('式が長すぎます')
+    try:
+        tree = fold_constants(Parser(tokenize(text), variables, backend).parse(), backend)
+    except RecursionError:
+        raise CalcError('式が複雑すぎます') from None
+    if backend is FLOAT:
+        return CompiledExpression(text, tree, variables)
+    return BackendExpression(text, tree, variables, backend)
+
+
+# 式を評価して値を返す
+def evaluate(text, backend=FLOAT, **variables):
+    return compile_expression(text, tuple(sorted(variables)), backend)(**variables)
+
+
+# 式を配列でまとめて評価する（evaluate の配列版）
+def evaluate_array(text, **arrays):
+    return compile_expression(text, tuple(sorted(arrays))).over(**arrays)
+
+
+# グラフを描くために、変数 variable を start から stop まで動かしたときの値を取る
+# はじめに等間隔で points 点を取り、折れ線で近似できていない区間（中点での値が両端を結んだ直線から
+# 縦の幅の tolerance 倍より離れている・片側だけ nan）にだけ中点を足していく。全体で max_points 点まで
+def sample_function(text, start, stop, variable='x', points=129, max_points=4000, tolerance=0.002, max_depth=12):
+    if not start < stop:
+        raise CalcError('範囲の始まりは終わりより小さくしてください')
+    compiled = compile_expression(text, (variable,))
+    xs = np.linspace(start, stop, points)
+    ys = compiled.over(**{variable: xs})
+    for _ in range(max_depth):
+        finite = ys[np.isfinite(ys)]
+        height = finite.max() - finite.min() if finite.size else 0.0
+        mid_xs = (xs[:-1] + xs[1:]) / 2
+        mid_ys = compiled.over(**{variable: mid_xs})
+        with np.errstate(invalid='ignore'):
+            bent = np.abs(mid_ys - (ys[:-1] + ys[1:]) / 2) > tolerance * max(height, 1e-12)
+        broken = np.isnan(ys[:-1]) != np.isnan(ys[1:])
+        refine = np.flatnonzero(bent | broken)
+        if refine.size == 0:
+            break
+        # 足せる点が足りなければ、ずれの大きい区間から足す
+        room = max_points - xs.size
+        if room <= 0:
+            break
+        if refine.size > room:
+            error = np.nan_to_num(np.abs(mid_ys - (ys[:-1] + ys[1:]) / 2), nan=np.inf)[refine]
+            refine = np.sort(refine[np.argsort(-error, kind='stable')[:room]])
+        xs = np.insert(xs, refine + 1, mid_xs[refine])
+        ys = np.insert(ys, refine + 1, mid_ys[refine])
+    return xs, ys
+
+
+# 式の最後の項（数・括弧でくくった式・関数の呼び出しと、それに付いた後置演算子）が始まる位置
+# 電卓のボタンで「いま入力している数」に sin や x² をかけるときに使う。項がなければ None
+def last_operand_start(text):
+    tokens = []
+    for match in TOKEN_RE.finditer(text):
+        tokens.append((match.lastgroup, match.group(match.lastgroup), match.start(match.lastgroup)))
+    i = len(tokens) - 1
+    # 後置演算子は項に含める
+    while i >= 0 and tokens[i][:2] in (('op', '%'), ('op', '²'), ('op', '³')):
+        i -= 1
+    if i < 0:
+        return None
+    kind, value, start = tokens[i]
+    if kind in ('number', 'name'):
+        return start
+    if (kind, value) != ('op', ')'):
+        return None
+    depth = 0
+    while i >= 0:
+        if tokens[i][:2] == ('op', ')'):
+            depth += 1
+        elif tokens[i][:2] == ('op', '('):
+            depth -= 1
+            if depth == 0:
+                # 関数の呼び出しなら関数名から
+                if i > 0 and tokens[i - 1][0] == 'name':
+                    return tokens[i - 1][2]
+                return tokens[i][2]
+        i -= 1
+    return None
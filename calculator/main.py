@@ -1,5 +1,12 @@
+import re
 import flet as ft
-import math
+import numpy as np
+import repo_path  # noqa: F401
+from engine import BACKENDS, FLOAT, CalcError, evaluate, get_backend, last_operand_start, sample_function
+from metrics import UI_UPDATE_SECONDS, sampled_logger, start_from_env
+
+# ボタンを押すたびに通るログは間引いて出す（LOG_LEVEL=DEBUG のときだけ出る）
+log = sampled_logger("calculator")
 
 class CalcButton(ft.ElevatedButton):
     def __init__(self, text, button_clicked, expand=1):
@@ -44,14 +51,27 @@ class CalculatorApp(ft.Container):
     def __init__(self):
         super().__init__()
         self.reset()
+        self.backend = FLOAT
 
         self.result = ft.Text(value="0", color=ft.colors.WHITE, size=20)
+        # 数の種類（float / decimal / fraction）と decimal の桁数
+        self.mode = ft.Dropdown(
+            value="float",
+            options=[ft.dropdown.Option(name) for name in BACKENDS],
+            width=150,
+            color=ft.colors.WHITE,
+            on_change=self.change_backend,
+        )
+        self.precision = ft.TextField(
+            label="桁数", value="28", width=100, color=ft.colors.WHITE, visible=False, on_change=self.change_backend
+        )
         self.width = 700
         self.bgcolor = ft.colors.BLACK
         self.border_radius = ft.border_radius.all(20)
         self.padding = 20
         self.content = ft.Column(
             controls=[
+                ft.Row(controls=[self.mode, self.precision]),
                 ft.Row(controls=[self.result], alignment="end"),
                 ft.Row(
                     controls=[
@@ -117,98 +137,203 @@ class CalculatorApp(ft.Container):
             ]
         )
 
+    @UI_UPDATE_SECONDS.timed(app="calculator", event="button")
     def button_clicked(self, e):
         data = e.control.data
-        print(f"Button clicked with data = {data}")
+        log.debug("Button clicked with data = %s", data)
         if self.result.value == "Error" or data == "AC":
-            self.result.value = "0"
             self.reset()
+            return self.show()
+        self.answer = None
 
-        elif data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
-            if self.result.value == "0" or self.new_operand == True:
-                self.result.value = data
+        if data in ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "."):
+            if self.new_operand:
+                self.expression = ""
                 self.new_operand = False
-            else:
-                self.result.value += data
+            self.type_digit(data)
 
-        elif data in ("+", "-", "*", "/"):
-            self.operand1 = float(self.result.value)
-            self.operator = data
-            self.new_operand = True
+        elif data in ("+", "-", "*", "/", "xʸ"):
+            # 計算結果の続きから式を書ける。演算子が続いたときは後から押した方にする
+            self.new_operand = False
+            operator = "^" if data == "xʸ" else data
+            if self.expression and self.expression[-1] in "+-*/^":
+                self.expression = self.expression[:-1]
+            self.expression = (self.expression or "0") + operator
 
         elif data == "=":
-            self.result.value = self.calculate(
-                self.operand1, float(self.result.value), self.operator
-            )
-            self.reset()
+            self.calculate()
 
-        elif data == "%":
-            self.result.value = self.format_number(float(self.result.value) / 100)
-            self.reset()
+        elif data in ("%", "x²", "x³"):
+            self.apply_to_operand(lambda operand: operand + {"%": "%", "x²": "²", "x³": "³"}[data])
 
         elif data == "+/-":
-            if float(self.result.value) > 0:
-                self.result.value = "-" + str(self.result.value)
-            elif float(self.result.value) < 0:
-                self.result.value = str(
-                    self.format_number(abs(float(self.result.value)))
-                )
+            # 演算子の直後なら負の数を書き始める（2^ なら 2^(-0) にして、続けて押した数字が中に入る）
+            if self.expression and self.expression[-1] in "+-*/^":
+                self.new_operand = False
+                self.expression += "(-0)"
+            else:
+                self.apply_to_operand(negate)
 
+        elif data == "eˣ":
+            self.apply_to_operand(lambda operand: f"exp({operand})")
 
+        elif data in ("sin", "cos", "tan"):
+            self.apply_to_operand(lambda operand: f"{data}({operand})")
 
-        elif data == "x²":
-            self.result.value = self.format_number(float(self.result.value) ** 2)
-            self.reset()
+        self.show()
 
-        elif data == "x³":
-            self.result.value = self.format_number(float(self.result.value) ** 3)
-            self.reset()
+    # 計算した直後は結果をそのまま（括弧でくくらずに）、それ以外は入力中の式を表示する
+    def show(self):
+        self.result.value = self.answer if self.answer is not None else (self.expression or "0")
+        if self.page:
+            self.update()
 
-        elif data == "xʸ":
-            self.operand1 = float(self.result.value)
-            self.operator = "xʸ"
-            self.new_operand = True
+    # 数字を1つ入力する
+    #   +/- でくくった数 (-1) の中には続けて入力する（(-1) のあとに 2 で (-12)）
+    #   x² や sin(...) のように閉じた項のあとは * を入れて新しい数にする（5² のあとに 2 で 5²*2）
+    #   いま入力している数が 0 だけなら置き換える（0 0 5 で 5）
+    def type_digit(self, digit):
+        expression, suffix = self.expression, ""
+        if re.search(r"\(-[0-9.]*\)$", expression):
+            expression, suffix = expression[:-1], ")"
+        elif expression and expression[-1] in ")²³%":
+            expression += "*"
+        start = last_operand_start(expression)
+        if digit != "." and start is not None and expression[start:] == "0":
+            expression = expression[:start]
+        self.expression = expression + digit + suffix
 
-        elif data == "eˣ":
-            self.result.value = self.format_number(math.exp(float(self.result.value)))
-            self.reset()
+    # 式の最後の項（いま入力している数など）を書き換える
+    def apply_to_operand(self, change):
+        self.new_operand = False
+        if not self.expression:
+            self.expression = "0"
+        start = last_operand_start(self.expression)
+        # 演算子の直後など、書き換える項がないときは何もしない
+        if start is not None:
+            self.expression = self.expression[:start] + change(self.expression[start:])
 
-        elif data in ("sin", "cos", "tan"):
-            self.result.value = self.calculate_trig_function(data, float(self.result.value))
-            self.reset()
-        
-        self.update()
+    # 式をエンジンで評価して、結果を次の式の始まりにする
+    def calculate(self):
+        expression = self.expression or "0"
+        # 「1+」のように演算子で終わっていたら、その演算子は無かったことにする
+        if expression[-1] in "+-*/^":
+            expression = expression[:-1] or "0"
+        try:
+            text = self.format_number(evaluate(expression, backend=self.backend))
+            # 分数と負の数は続けて計算するときに1つの項になるように括弧でくくる（-3 の x² が -9 にならないように）
+            self.expression = f"({text})" if "/" in text or text.startswith("-") else text
+            self.answer = text
+        except CalcError as ex:
+            log.info("Calculation error: %s", ex)
+            self.expression = "Error"
+        self.new_operand = True
 
     def format_number(self, num):
-        if num % 1 == 0:
-            return int(num)
-        else:
-            return num
-
-    def calculate(self, operand1, operand2, operator):
-        if operator == "+":
-            return self.format_number(operand1 + operand2)
-        elif operator == "-":
-            return self.format_number(operand1 - operand2)
-        elif operator == "*":
-            return self.format_number(operand1 * operand2)
-        elif operator == "/":
-            if operand2 == 0:
-                return "Error"
-            else:
-                return self.format_number(operand1 / operand2)
-        elif operator == "xʸ":
-            return self.format_number(operand1 ** operand2)
+        return self.backend.format(num)
+
+    def change_backend(self, e):
+        self.precision.visible = self.mode.value == "decimal"
+        try:
+            self.backend = get_backend(self.mode.value, int(self.precision.value))
+            self.precision.error_text = None
+        except (CalcError, ValueError):
+            self.precision.error_text = "1〜500"
+        if self.page:
+            self.update()
 
     def reset(self):
-        self.operator = "+"
-        self.operand1 = 0
+        self.expression = ""
+        self.answer = None
         self.new_operand = True
 
 
+# 項の符号を反転する。(-3) は 3 に戻す（(-3/4) は 3/4 にすると1つの項でなくなるので (3/4) にする）
+def negate(operand):
+    if operand.startswith("(-") and operand.endswith(")"):
+        inner = operand[2:-1]
+        return inner if last_operand_start(inner) == 0 else f"({inner})"
+    return f"(-{operand})"
+
+
+# 関数のグラフを描くパネル。式を配列でまとめて評価し、曲がっているところほど細かく点を取る
+class PlotPanel(ft.Container):
+    def __init__(self):
+        super().__init__()
+        self.expression = ft.TextField(label="f(x)", value="sin(x)*x²", expand=2, on_submit=self.plot)
+        self.start = ft.TextField(label="xの最小", value="-10", expand=1, on_submit=self.plot)
+        self.stop = ft.TextField(label="xの最大", value="10", expand=1, on_submit=self.plot)
+        self.message = ft.Text(value="", color=ft.colors.WHITE)
+        self.chart = ft.LineChart(
+            height=300,
+            border=ft.border.all(1, ft.colors.WHITE24),
+            horizontal_grid_lines=ft.ChartGridLines(color=ft.colors.WHITE10),
+            vertical_grid_lines=ft.ChartGridLines(color=ft.colors.WHITE10),
+            left_axis=ft.ChartAxis(labels_size=50),
+            bottom_axis=ft.ChartAxis(labels_size=30),
+        )
+        self.width = 700
+        self.bgcolor = ft.colors.BLACK
+        self.border_radius = ft.border_radius.all(20)
+        self.padding = 20
+        self.content = ft.Column(
+            controls=[
+                ft.Row(
+                    controls=[
+                        self.expression,
+                        self.start,
+                        self.stop,
+                        ActionButton(text="Plot", button_clicked=self.plot),
+                    ]
+                ),
+                self.chart,
+                self.message,
+            ]
+        )
+
+    @UI_UPDATE_SECONDS.timed(app="calculator", event="plot")
+    def plot(self, e):
+        try:
+            xs, ys = sample_function(self.expression.value, float(self.start.value), float(self.stop.value))
+        except (CalcError, ValueError) as ex:
+            self.message.value = f"Error: {ex}"
+        else:
+            self.show(xs, ys)
+            self.message.value = f"{len(xs)} 点"
+        if self.page:
+            self.update()
+
+    def show(self, xs, ys):
+        # nan のところで線を切る
+        series = []
+        for segment in np.split(np.arange(len(xs)), np.flatnonzero(np.diff(np.isnan(ys))) + 1):
+            if np.isnan(ys[segment[0]]):
+                continue
+            series.append(
+                ft.LineChartData(
+                    data_points=[ft.LineChartDataPoint(float(x), float(y)) for x, y in zip(xs[segment], ys[segment])],
+                    stroke_width=2,
+                    color=ft.colors.ORANGE,
+                )
+            )
+        self.chart.data_series = series
+        self.chart.min_x = float(xs[0])
+        self.chart.max_x = float(xs[-1])
+        # tan(x) の漸近線のような飛び抜けた値で全体がつぶれないように、縦の範囲は 1〜99% の値から決める
+        finite = ys[np.isfinite(ys)]
+        if finite.size:
+            low, high = np.percentile(finite, [1, 99])
+            margin = (high - low) * 0.05 or 1.0
+            self.chart.min_y = float(low - margin)
+            self.chart.max_y = float(high + margin)
+
+
 def main(page: ft.Page):
+    start_from_env()
     page.title = "Calc App"
+    page.scroll = "auto"
     calc = CalculatorApp()
-    page.add(calc)
+    plot = PlotPanel()
+    page.add(calc, plot)
 
 ft.app(target=main)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 3つのアプリで共通に使うモジュール（metrics.py など）はリポジトリ直下にある
+# アプリを起動するスクリプトの最初で import repo_path しておくと、どのモジュールからもそのまま import できる
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
@@ -0,0 +1,155 @@
+import logging
+import os
+import pickle
+import sys
+
+import repo_path  # noqa: F401
+from cache import DEFAULT_CACHE_DIR
+
+log = logging.getLogger(__name__)
+
+# area.json から作った地域の索引
+# 地方 → 府県予報区(offices) → 一次細分区域(class10s) → 市町村等をまとめた区域(class15s) → 市町村(class20s)
+# の階層と名前を、起動時にそのまま読み込める pickle にしておく（応答キャッシュと同じディレクトリに置く）
+#
+#   python area_index.py build [area.json のパス]   # 索引を作り直す（省略時は気象庁から取得）
+
+# キャッシュのディレクトリに置く索引のファイル
+def index_file(cache_dir=DEFAULT_CACHE_DIR):
+    return os.path.join(cache_dir, "area_index.pickle")
+
+
+INDEX_FILE = index_file()
+INDEX_VERSION = 1
+
+# area.json のキー（上の階層から順に並べる）
+LEVELS = ("centers", "offices", "class10s", "class15s", "class20s")
+# 同じコードが複数の階層にあるときに lookup で優先する順番
+LOOKUP_ORDER = ("offices", "centers", "class10s", "class15s", "class20s")
+
+
+# area.json の内容から索引を作る
+# 各区域は (名前, 英語名, 親コード, 子コードのタプル) で持つ
+def build_area_index(area_data):
+    tables = {}
+    for level in LEVELS:
+        tables[level] = {
+            code: (info.get("name"), info.get("enName"), info.get("parent"), tuple(info.get("children", ())))
+            for code, info in area_data.get(level, {}).items()
+        }
+
+    # どのコードからでも1回の辞書引きで階層を引けるようにする
+    by_code = {}
+    for level in reversed(LOOKUP_ORDER):
+        for code in tables[level]:
+            by_code[code] = level
+
+    # 各区域が属する府県予報区（天気予報を取得するときのコード）
+    office_of = {}
+    for office_code, (_, _, _, class10_codes) in tables["offices"].items():
+        office_of[office_code] = office_code
+        for class10_code in class10_codes:
+            office_of.setdefault(class10_code, office_code)
+            for class15_code in tables["class10s"].get(class10_code, (None, None, None, ()))[3]:
+                office_of.setdefault(class15_code, office_code)
+                for class20_code in tables["class15s"].get(class15_code, (None, None, None, ()))[3]:
+                    office_of.setdefault(class20_code, office_code)
+
+    regions = {name: list(children) for name, _, _, children in tables["centers"].values()}
+    office_names = {code: record[0] for code, record in tables["offices"].items()}
+
+    return {
+        "version": INDEX_VERSION,
+        "tables": tables,
+        "by_code": by_code,
+        "office_of": office_of,
+        "regions": regions,
+        "office_names": office_names,
+    }
+
+
+class AreaIndex:
+    def __init__(self, data):
+        self.tables = data["tables"]
+        self.by_code = data["by_code"]
+        self.office_of = data["office_of"]
+        # 地方名 -> 府県予報区コードのリスト（ドロップダウンの選択肢）
+        self.regions = data["regions"]
+        # 府県予報区コード -> 都道府県名など
+        self.office_names = data["office_names"]
+
+    # コードから (階層, (名前, 英語名, 親コード, 子コード)) を返す（なければ None）
+    def lookup(self, code):
+        level = self.by_code.get(code)
+        if level is None:
+            return None
+        return level, self.tables[level][code]
+
+    def name(self, code, default=None):
+        found = self.lookup(code)
+        return found[1][0] if found else default
+
+    # 府県予報区に含まれる一次細分区域のコードと名前
+    def class10_areas(self, office_code):
+        return [(code, self.name(code)) for code in self._children("offices", office_code)]
+
+    # 府県予報区に含まれる市町村のコードと名前
+    def class20_areas(self, office_code):
+        areas = []
+        for class10_code in self._children("offices", office_code):
+            for class15_code in self._children("class10s", class10_code):
+                for class20_code in self._children("class15s", class15_code):
+                    areas.append((class20_code, self.tables["class20s"].get(class20_code, (None,))[0]))
+        return areas
+
+    def _children(self, level, code):
+        record = self.tables[level].get(code)
+        return record[3] if record else ()
+
+
+def save_area_index(data, path=INDEX_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+# 索引を読み込む
+# ファイルがない・形式が古いときは fetch_area_list（area.json を返す関数）で作り直して保存する
+def load_area_index(fetch_area_list=None, path=INDEX_FILE):
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") == INDEX_VERSION:
+            return AreaIndex(data)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    if fetch_area_list is None:
+        raise FileNotFoundError(f"地域の索引がありません: {path}")
+    data = build_area_index(fetch_area_list())
+    try:
+        save_area_index(data, path)
+    except OSError as e:
+        log.error("Error saving area index: %s", e)
+    return AreaIndex(data)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        import json
+
+        if len(sys.argv) >= 3:
+            with open(sys.argv[2], encoding="utf-8") as f:
+                area_data = json.load(f)
+        else:
+            import httpx
+            from client import AREA_PATH, JMA_BASE_URL
+
+            response = httpx.get(JMA_BASE_URL + AREA_PATH)
+            response.raise_for_status()
+            area_data = response.json()
+        save_area_index(build_area_index(area_data))
+        print(f"地域の索引を作成しました: {INDEX_FILE}")
+    else:
+        print("usage: python area_index.py build [area.json]")
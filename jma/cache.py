@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from client import AREA_PATH, FORECAST_PATH
+from metrics import PARSE_SECONDS
+
+log = logging.getLogger(__name__)
+
+# 気象庁が天気予報を発表する時刻（日本時間）
+PUBLISH_HOURS = (5, 11, 17)
+# 発表時刻からデータが差し替わるまでの猶予
+PUBLISH_GRACE = timedelta(minutes=10)
+# 次の発表時刻を過ぎても更新されていないときに再確認する間隔（秒）
+MIN_TTL = 5 * 60
+# area.json はほとんど変わらないので1日おきに再確認する
+AREA_TTL = 24 * 60 * 60
+# 取得に失敗して古い内容を返したときに、次に取りに行くまでの間隔（秒）
+STALE_RETRY = 60
+
+DEFAULT_CACHE_DIR = "./jma_cache"
+
+
+# 発表時刻 reportDatetime の次の発表予定時刻を求める
+def next_publication(report_datetime):
+    reported = datetime.fromisoformat(report_datetime)
+    for days in (0, 1):
+        day = reported + timedelta(days=days)
+        for hour in PUBLISH_HOURS:
+            candidate = day.replace(hour=hour, minute=0, second=0, microsecond=0)
+            if candidate > reported:
+                return candidate
+    return reported + timedelta(hours=6)
+
+
+# 天気予報データの有効期限（UNIX時刻）を求める
+def forecast_expires_at(weather_data, now=None):
+    now = time.time() if now is None else now
+    try:
+        report_datetime = weather_data[0]["reportDatetime"]
+        expires_at = (next_publication(report_datetime) + PUBLISH_GRACE).timestamp()
+    except (LookupError, TypeError, ValueError):
+        return now + MIN_TTL
+    return max(expires_at, now + MIN_TTL)
+
+
+# 気象庁APIの応答をキャッシュする
+# 有効期限内ならネットワークに出ず、期限切れなら ETag / Last-Modified を付けて再確認する
+# 内容は cache_dir にも保存するので、再起動後もキャッシュが温まった状態で始まる
+# 再確認に失敗したとき（気象庁が落ちている・遅いなど）は、手元の古い内容を返す
+class ForecastCache:
+    def __init__(self, client, cache_dir=DEFAULT_CACHE_DIR, persist=True):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.persist = persist
+        self._entries = {}
+        self._inflight = {}
+
+        # ヒット率の確認用カウンタ
+        self.hits = 0  # 有効期限内で通信なし
+        self.misses = 0  # キャッシュになく全体を取得
+        self.stale = 0  # 期限切れで再確認した
+        self.not_modified = 0  # 再確認の結果 304 で中身を使い回せた
+        self.stale_served = 0  # 再確認に失敗して古い内容を返した
+
+        if persist:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # 日本気象庁のAPIから地域リストを取得する
+    async def get_area_list(self):
+        return await self.get("area", AREA_PATH, lambda data, now: now + AREA_TTL)
+
+    # 地域ごとの天気情報を取得する
+    async def get_weather_forecast(self, region_code):
+        path = FORECAST_PATH.format(region_code=region_code)
+        return await self.get(f"forecast_{region_code}", path, forecast_expires_at)
+
+    # キーに対応するデータを返す（同じキーへの同時リクエストは1本にまとめる）
+    async def get(self, key, path, expires_fn):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            self.hits += 1
+            return entry["data"]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(key, path, entry, expires_fn))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key, path, entry, expires_fn):
+        headers = {}
+        if entry is None:
+            self.misses += 1
+        else:
+            self.stale += 1
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = await self.client.get(path, headers=headers or None)
+            if response.status_code != 304 or entry is None:
+                response.raise_for_status()
+                with PARSE_SECONDS.time(app="jma", kind="json"):
+                    data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            if entry is None:
+                raise
+            # 古い内容で返し、少し間をおいてから取り直す（ディスクには書かない）
+            log.warning("取得に失敗したため古いデータを使います (%s): %s", key, e)
+            self.stale_served += 1
+            entry["expires_at"] = time.time() + STALE_RETRY
+            return entry["data"]
+
+        now = time.time()
+        if response.status_code == 304 and entry is not None:
+            self.not_modified += 1
+            entry["expires_at"] = expires_fn(entry["data"], now)
+        else:
+            entry = {
+                "data": data,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "expires_at": expires_fn(data, now),
+            }
+        self._entries[key] = entry
+        if self.persist:
+            await asyncio.to_thread(self._save, key, entry)
+        return entry["data"]
+
+    def _file_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # ディスクに保存されたキャッシュを読み込む
+    def _load(self, key):
+        if not self.persist:
+            return None
+        try:
+            with open(self._file_path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._entries[key] = entry
+        return entry
+
+    # 書きかけのファイルが残らないよう、一時ファイルに書いてから置き換える
+    def _save(self, key, entry):
+        file_path = self._file_path(key)
+        tmp_path = f"{file_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, file_path)
+        except OSError as e:
+            log.error("Error saving cache: %s", e)
+
+    def stats(self):
+        total = self.hits + self.misses + self.stale
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "not_modified": self.not_modified,
+            "stale_served": self.stale_served,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import time
+import weakref
+
+import httpx
+
+from metrics import FETCH_SECONDS, PARSE_SECONDS
+from resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+
+# 気象庁APIのベースURL（環境変数でローカルのスタンドインサーバに向け替えられる）
+JMA_BASE_URL = os.environ.get("JMA_BASE_URL", "https://www.jma.go.jp")
+
+AREA_PATH = "/bosai/common/const/area.json"
+FORECAST_PATH = "/bosai/forecast/data/forecast/{region_code}.json"
+
+
+# 気象庁APIへの接続をまとめて管理するクライアント
+# 1つの httpx.AsyncClient を使い回すので、TCP/TLS 接続がプールされ keep-alive で再利用される
+# 1回の通信は timeout 秒で打ち切り、接続エラー・5xx・429 は retries 回まで揺らぎ付きでやり直す
+# やり直しを含めても deadline 秒を超えたら httpx.TimeoutException にする
+# 同じホストで失敗が続いたらサーキットブレーカーを開き、しばらくは通信せずに CircuitOpenError にする
+class JmaClient:
+    def __init__(self, base_url=JMA_BASE_URL, max_connections=10, keepalive_expiry=30.0, timeout=5.0, transport=None,
+                 retries=2, backoff=0.2, max_backoff=2.0, deadline=15.0, failure_threshold=5, reset_timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self.transport = transport
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}  # ホスト -> CircuitBreaker
+        self._client = None
+
+        # 計測用の値
+        self.request_count = 0
+        self.connections_opened = 0
+        self.latencies = []  # 1リクエストごとの所要時間（秒）
+        self.retry_count = 0  # やり直した回数
+        self.rejected_count = 0  # 回路が開いていて通信しなかった回数
+        self._seen_streams = weakref.WeakSet()
+
+    # httpx.AsyncClient は最初に使うイベントループの中で作る
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self.transport,
+                headers={"Accept-Encoding": "gzip, deflate"},
+            )
+        return self._client
+
+    # 指定パスのJSONを取得する（ステータスコードが200番台以外なら httpx.HTTPStatusError）
+    async def get_json(self, path, headers=None):
+        response = await self.get(path, headers=headers)
+        response.raise_for_status()
+        with PARSE_SECONDS.time(app="jma", kind="json"):
+            return response.json()
+
+    # 指定パスを取得して応答を返す（やり直しても 5xx のままなら最後の応答を返す）
+    async def get(self, path, headers=None):
+        try:
+            return await asyncio.wait_for(self._get_with_retry(path, headers), self.deadline)
+        except asyncio.TimeoutError:
+            raise httpx.TimeoutException(f"{self.deadline}秒以内に取得できませんでした: {path}") from None
+
+    async def _get_with_retry(self, path, headers):
+        host = httpx.URL(path).host or httpx.URL(self.base_url).host
+        breaker = self._breaker(host)
+        for attempt in range(self.retries + 1):
+            if not breaker.allow():
+                self.rejected_count += 1
+                raise CircuitOpenError(f"{host} への通信を一時的に止めています")
+            try:
+                response = await self._send(host, path, headers)
+            except httpx.TransportError:
+                breaker.record_failure()
+                if attempt == self.retries:
+                    raise
+            except BaseException:
+                # deadline やタスクの取り消し（CancelledError）で中断されたときも失敗として数える
+                # （数えないと half_open の試しが終わらないままになり、回路が開いたままになる）
+                breaker.record_failure()
+                raise
+            else:
+                if response.status_code < 500 and response.status_code != 429:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if attempt == self.retries:
+                    return response
+            self.retry_count += 1
+            await asyncio.sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+
+    async def _send(self, host, path, headers):
+        start = time.perf_counter()
+        try:
+            response = await self._get_client().get(path, headers=headers)
+        finally:
+            elapsed = time.perf_counter() - start
+            FETCH_SECONDS.observe(elapsed, app="jma", host=host)
+        self.latencies.append(elapsed)
+        self.request_count += 1
+        self._count_connection(response)
+        return response
+
+    def _breaker(self, host):
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    # 応答に使われた接続が初めて見るものなら新規接続として数える
+    def _count_connection(self, response):
+        stream = response.extensions.get("network_stream")
+        if stream is None:
+            return
+        try:
+            if stream not in self._seen_streams:
+                self._seen_streams.add(stream)
+                self.connections_opened += 1
+        except TypeError:
+            pass
+
+    # 日本気象庁のAPIから地域リストを取得する
+    async def get_area_list(self):
+        return await self.get_json(AREA_PATH)
+
+    # 地域ごとの天気情報を取得する
+    async def get_weather_forecast(self, region_code):
+        return await self.get_json(FORECAST_PATH.format(region_code=region_code))
+
+    # 接続の再利用状況と所要時間をまとめて返す
+    def stats(self):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "requests": self.request_count,
+            "connections_opened": self.connections_opened,
+            "latency_mean": sum(latencies) / count if count else 0.0,
+            "latency_p50": latencies[count // 2] if count else 0.0,
+            "latency_max": latencies[-1] if count else 0.0,
+            "retries": self.retry_count,
+            "rejected": self.rejected_count,
+            "circuits": {host: breaker.state for host, breaker in self.breakers.items()},
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 同期コードからイベントループ上でコルーチンを実行して結果を受け取る
+# ループがまだ動いていなければその場で回し、別スレッドで動いていればそちらに投げて待つ
+def run_in_loop(loop, coro):
+    if loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    return loop.run_until_complete(coro)
@@ -0,0 +1,31 @@
+import asyncio
+
+# 同時に投げるリクエスト数の既定値
+DEFAULT_CONCURRENCY = 6
+
+
+# 複数の地域コードの天気情報を並行して取得し、届いた順に (地域コード, データ) を返す非同期ジェネレータ
+# fetch には地域コードを受け取るコルーチン関数を渡す（テストではローカルサーバ向けの関数に差し替えられる）
+async def fetch_concurrently(region_codes, fetch, concurrency=DEFAULT_CONCURRENCY):
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch_one(region_code):
+        async with semaphore:
+            return region_code, await fetch(region_code)
+
+    tasks = [asyncio.create_task(fetch_one(region_code)) for region_code in region_codes]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 途中で打ち切られた場合は残りのリクエストを取り消す
+        for task in tasks:
+            task.cancel()
+
+
+# すべての地域コードをまとめて取得し、地域コードの順番どおりのリストで返す
+async def fetch_all(region_codes, fetch, concurrency=DEFAULT_CONCURRENCY):
+    results = {}
+    async for region_code, data in fetch_concurrently(region_codes, fetch, concurrency):
+        results[region_code] = data
+    return [(region_code, results[region_code]) for region_code in region_codes]
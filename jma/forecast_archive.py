@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import glob
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# 天気予報の発表ごとのスナップショットを、府県予報区ごとに列ごとの配列で保存するアーカイブ
+# weather_reports（クリックごとの文字列）では傾向を調べられないので、発表された予報をそのまま
+# 整数の列（発表時刻・対象日・地域コード・天気コード・降水確率・気温）で持っておく
+#
+#   archive/<府県予報区コード>/<最初の発表時刻>.npz   （1ファイルが1チャンク、発表時刻順）
+#
+# 読み込んだ配列は発表時刻順に並んでいるので、期間の絞り込みは searchsorted で行える
+#
+#   python forecast_archive.py snapshot                      # 全府県予報区の最新の予報を追記する
+#   python forecast_archive.py accuracy 130000 --days 90     # 直近90日の予報の当たり具合
+
+DEFAULT_ARCHIVE_DIR = "./jma_archive"
+# チャンクがこの数を超えたら1つにまとめ直す
+MAX_CHUNKS = 16
+
+JST = timezone(timedelta(hours=9))
+DAY = 24 * 60 * 60
+# 欠けている値（降水確率・気温）
+MISSING = -128
+
+WEATHER_COLUMNS = {"issued": np.int64, "target": np.int32, "area": np.int32, "code": np.int16, "pop": np.int8}
+TEMP_COLUMNS = {"issued": np.int64, "target": np.int32, "station": np.int32, "temp_min": np.int8, "temp_max": np.int8}
+
+
+# ISO形式の日時をUNIX時刻（秒）にする
+def to_timestamp(date_str):
+    return int(datetime.fromisoformat(date_str).timestamp())
+
+
+# UNIX時刻を日本時間の日付の通し番号（1970-01-01 からの日数）にする
+def to_day(timestamp):
+    return (timestamp + 9 * 60 * 60) // DAY
+
+
+def _int(value, default=MISSING):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def _empty(columns):
+    return {name: np.empty(0, dtype=dtype) for name, dtype in columns.items()}
+
+
+# 天気予報JSON（1回の発表）を、天気の行と気温の行に分ける
+# 天気は短期予報を優先し、短期予報にない日（4日目以降）を週間予報で補う
+def publication_rows(weather_data):
+    issued = to_timestamp(weather_data[0]['reportDatetime'])
+    weather = {name: [] for name in WEATHER_COLUMNS}
+    temps = {name: [] for name in TEMP_COLUMNS}
+    covered = set()
+
+    def add_weather(area_code, target, code, pop=MISSING):
+        key = (area_code, target)
+        if key in covered:
+            return
+        covered.add(key)
+        for name, value in zip(WEATHER_COLUMNS, (issued, target, area_code, code, pop)):
+            weather[name].append(value)
+
+    short = weather_data[0]['timeSeries'][0]
+    targets = [to_day(to_timestamp(t)) for t in short['timeDefines']]
+    for area in short['areas']:
+        for target, code in zip(targets, area.get('weatherCodes', [])):
+            add_weather(_int(area['area']['code']), target, _int(code))
+
+    if len(weather_data) > 1:
+        weekly = weather_data[1]['timeSeries']
+        targets = [to_day(to_timestamp(t)) for t in weekly[0]['timeDefines']]
+        for area in weekly[0]['areas']:
+            pops = area.get('pops') or [""] * len(targets)
+            for target, code, pop in zip(targets, area.get('weatherCodes', []), pops):
+                add_weather(_int(area['area']['code']), target, _int(code), _int(pop))
+        if len(weekly) > 1:
+            targets = [to_day(to_timestamp(t)) for t in weekly[1]['timeDefines']]
+            for area in weekly[1]['areas']:
+                for target, temp_min, temp_max in zip(targets, area.get('tempsMin', []), area.get('tempsMax', [])):
+                    if temp_min in ("", None) and temp_max in ("", None):
+                        continue
+                    for name, value in zip(TEMP_COLUMNS, (issued, target, _int(area['area']['code']), _int(temp_min), _int(temp_max))):
+                        temps[name].append(value)
+
+    return (
+        {name: np.asarray(values, dtype=WEATHER_COLUMNS[name]) for name, values in weather.items()},
+        {name: np.asarray(values, dtype=TEMP_COLUMNS[name]) for name, values in temps.items()},
+    )
+
+
+def _concat(tables, columns):
+    tables = [table for table in tables if len(table["issued"])]
+    if not tables:
+        return _empty(columns)
+    merged = {name: np.concatenate([table[name] for table in tables]) for name in columns}
+    # 発表時刻順に並べておく（同じ時刻の中の順番は保つ）
+    order = np.argsort(merged["issued"], kind="stable")
+    if np.any(order[1:] < order[:-1]):
+        merged = {name: values[order] for name, values in merged.items()}
+    return merged
+
+
+# 発表時刻が [start, end) の行だけを取り出す（issued は昇順に並んでいる）
+def _slice(table, start=None, end=None):
+    issued = table["issued"]
+    lo = 0 if start is None else np.searchsorted(issued, start, side="left")
+    hi = len(issued) if end is None else np.searchsorted(issued, end, side="left")
+    return {name: values[lo:hi] for name, values in table.items()}
+
+
+class ForecastArchive:
+    def __init__(self, archive_dir=DEFAULT_ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self._pending = {}  # 府県予報区コード -> [(weather, temps), ...]（まだ書き出していない発表）
+        self._loaded = {}  # 府県予報区コード -> (チャンクファイルの一覧, weather, temps)
+        self._known = {}  # 府県予報区コード -> アーカイブ済み・書き出し待ちの発表時刻
+        self._lock = threading.Lock()
+
+    def _office_dir(self, office_code):
+        return os.path.join(self.archive_dir, str(office_code))
+
+    def _chunks(self, office_code):
+        return sorted(glob.glob(os.path.join(self._office_dir(office_code), "*.npz")))
+
+    def offices(self):
+        if not os.path.isdir(self.archive_dir):
+            return []
+        return sorted(name for name in os.listdir(self.archive_dir) if self._chunks(name))
+
+    # 保存済みの配列を読み込む（チャンクが変わっていなければ読み込んだものを使い回す）
+    def _load(self, office_code):
+        chunks = self._chunks(office_code)
+        loaded = self._loaded.get(office_code)
+        if loaded is not None and loaded[0] == chunks:
+            return loaded[1], loaded[2]
+        weather_tables, temp_tables = [], []
+        for chunk in chunks:
+            with np.load(chunk) as data:
+                weather_tables.append({name: data[f"weather_{name}"] for name in WEATHER_COLUMNS})
+                temp_tables.append({name: data[f"temps_{name}"] for name in TEMP_COLUMNS})
+        weather = _concat(weather_tables, WEATHER_COLUMNS)
+        temps = _concat(temp_tables, TEMP_COLUMNS)
+        self._loaded[office_code] = (chunks, weather, temps)
+        return weather, temps
+
+    # 保存済み・書き出し待ちの発表時刻（最初の1回だけ配列から作る）
+    def _issued(self, office_code):
+        known = self._known.get(office_code)
+        if known is None:
+            known = self._known[office_code] = set(np.unique(self._load(office_code)[0]["issued"]).tolist())
+        return known
+
+    # 1回の発表を書き出し待ちに加える。すでにアーカイブにある発表なら何もせず False を返す
+    def add(self, office_code, weather_data):
+        try:
+            weather, temps = publication_rows(weather_data)
+        except (LookupError, TypeError, ValueError) as e:
+            log.warning("アーカイブできない天気予報です (%s): %r", office_code, e)
+            return False
+        if not len(weather["issued"]):
+            return False
+        with self._lock:
+            known = self._issued(office_code)
+            if int(weather["issued"][0]) in known:
+                return False
+            known.add(int(weather["issued"][0]))
+            self._pending.setdefault(office_code, []).append((weather, temps))
+        return True
+
+    # 書き出し待ちの発表を府県予報区ごとに1チャンクとして保存する
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for office_code, publications in pending.items():
+                weather = _concat([rows[0] for rows in publications], WEATHER_COLUMNS)
+                temps = _concat([rows[1] for rows in publications], TEMP_COLUMNS)
+                self._write_chunk(office_code, weather, temps)
+                if len(self._chunks(office_code)) > MAX_CHUNKS:
+                    self._compact(office_code)
+
+    def _write_chunk(self, office_code, weather, temps):
+        office_dir = self._office_dir(office_code)
+        os.makedirs(office_dir, exist_ok=True)
+        path = os.path.join(office_dir, f"{int(weather['issued'][0])}.npz")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                **{f"weather_{name}": values for name, values in weather.items()},
+                **{f"temps_{name}": values for name, values in temps.items()},
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    # 府県予報区のチャンクを1つにまとめ直す
+    def compact(self, office_code):
+        with self._lock:
+            self._compact(office_code)
+
+    def _compact(self, office_code):
+        chunks = self._chunks(office_code)
+        if len(chunks) <= 1:
+            return
+        weather, temps = self._load(office_code)
+        path = self._write_chunk(office_code, weather, temps)
+        for chunk in chunks:
+            if chunk != path:
+                os.remove(chunk)
+
+    # 発表時刻が [start, end) の行を返す（start / end はUNIX時刻、None なら制限なし）
+    def weather(self, office_code, start=None, end=None):
+        with self._lock:
+            return _slice(self._load(office_code)[0], start, end)
+
+    def temperatures(self, office_code, start=None, end=None):
+        with self._lock:
+            return _slice(self._load(office_code)[1], start, end)
+
+    # 対象日が [since, until) の予報について、何日前の予報がどれだけ当たっていたかを返す
+    # 実況は保存していないので、その日の最後の発表（当日の予報）を正解として比べる
+    # 戻り値は予報日数（0 = 当日）ごとの {"lead", "count", "weather_hit_rate", "temp_min_mae", "temp_max_mae"}
+    def accuracy(self, office_code, since, until):
+        since_day, until_day = to_day(to_timestamp(since)), to_day(to_timestamp(until))
+        # 対象日より後の発表はないので、発表時刻は週間予報の期間ぶん前から見れば足りる
+        start = (since_day - 8) * DAY - 9 * 60 * 60
+        end = until_day * DAY - 9 * 60 * 60
+
+        weather = self.weather(office_code, start, end)
+        mask = (weather["target"] >= since_day) & (weather["target"] < until_day)
+        lead, hit, weather_counts = _compare(
+            weather["area"][mask], weather["target"][mask], weather["issued"][mask],
+            weather["code"][mask] // 100,  # 百の位（晴・曇・雨・雪）で比べる
+        )
+
+        temps = self.temperatures(office_code, start, end)
+        mask = (temps["target"] >= since_day) & (temps["target"] < until_day)
+        errors = {}
+        for column in ("temp_min", "temp_max"):
+            values = temps[column][mask]
+            valid = values != MISSING
+            temp_lead, diff, counts = _compare(
+                temps["station"][mask][valid], temps["target"][mask][valid], temps["issued"][mask][valid],
+                values[valid].astype(np.int16), difference=True,
+            )
+            sums = np.bincount(temp_lead, weights=diff, minlength=len(counts))
+            errors[column] = (sums, counts)
+
+        size = max(len(weather_counts), *(len(counts) for _, counts in errors.values()))
+        result = []
+        for day in range(size):
+            count = int(weather_counts[day]) if day < len(weather_counts) else 0
+            row = {"lead": day, "count": count,
+                   "weather_hit_rate": float(hit[day] / count) if count else None}
+            for column, (sums, counts) in errors.items():
+                n = counts[day] if day < len(counts) else 0
+                row[f"{column}_mae"] = float(sums[day] / n) if n else None
+            result.append(row)
+        return [row for row in result if row["count"] or row["temp_min_mae"] is not None or row["temp_max_mae"] is not None]
+
+
+# 同じ地点・対象日の予報を、その中で最後に発表されたもの（正解とみなす）と比べる
+# 予報日数ごとに、一致した数（difference=True なら誤差の絶対値の合計）と比べた数を返す
+# 正解そのものは比べる数に含めない
+def _compare(place, target, issued, values, difference=False):
+    lead_all = target.astype(np.int64) - to_day(issued)
+    if not len(place):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, (empty.astype(float) if difference else empty), empty
+    order = np.lexsort((issued, target, place))
+    place, target, lead_all, values = place[order], target[order], lead_all[order], values[order]
+    # (地点, 対象日) のまとまりごとの最後の行が正解
+    last = np.r_[(place[1:] != place[:-1]) | (target[1:] != target[:-1]), True]
+    group = np.cumsum(np.r_[True, last[:-1]]) - 1
+    reference = values[np.flatnonzero(last)][group]
+
+    compared = ~last & (lead_all >= 0)
+    lead = lead_all[compared]
+    if difference:
+        diff = np.abs(values[compared].astype(np.int64) - reference[compared]).astype(float)
+        return lead, diff, np.bincount(lead)
+    hit = np.bincount(lead, weights=(values[compared] == reference[compared]), minlength=lead.max(initial=-1) + 1)
+    return lead, hit, np.bincount(lead)
+
+
+# 全府県予報区の最新の天気予報を取得してアーカイブに加える（定期実行を想定）
+async def snapshot(archive, source, office_codes, concurrency):
+    from fetcher import fetch_concurrently
+
+    added = 0
+
+    async def fetch_or_none(office_code):
+        try:
+            return await source.get_weather_forecast(office_code)
+        except Exception as e:
+            print(f"天気予報を取得できませんでした ({office_code}): {e}", file=sys.stderr)
+            return None
+
+    async for office_code, weather_data in fetch_concurrently(office_codes, fetch_or_none, concurrency):
+        if weather_data and archive.add(office_code, weather_data):
+            added += 1
+    archive.flush()
+    return added
+
+
+def main(argv=None):
+    from cache import DEFAULT_CACHE_DIR
+    from client import JMA_BASE_URL
+    from fetcher import DEFAULT_CONCURRENCY
+
+    parser = argparse.ArgumentParser(description="天気予報の発表ごとのアーカイブ")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR, help="アーカイブの保存先")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = commands.add_parser("snapshot", help="最新の天気予報をアーカイブに加える")
+    snapshot_parser.add_argument("--offices", nargs="*", help="府県予報区コード（省略時はすべて）")
+    snapshot_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時に取得する数")
+    snapshot_parser.add_argument("--base-url", default=JMA_BASE_URL, help="気象庁APIのベースURL")
+    snapshot_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="応答キャッシュの保存先")
+    snapshot_parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずに毎回取得する")
+
+    accuracy_parser = commands.add_parser("accuracy", help="予報の当たり具合を調べる")
+    accuracy_parser.add_argument("office", help="府県予報区コード")
+    accuracy_parser.add_argument("--days", type=int, default=90, help="直近何日分を調べるか")
+
+    commands.add_parser("compact", help="チャンクを府県予報区ごとに1つにまとめ直す")
+    args = parser.parse_args(argv)
+
+    archive = ForecastArchive(args.archive_dir)
+
+    if args.command == "snapshot":
+        from area_index import index_file
+        from forecast_cli import load_index, make_source
+
+        async def run():
+            client, source = make_source(args)
+            try:
+                office_codes = args.offices
+                if not office_codes:
+                    index = await load_index(source, index_file(args.cache_dir))
+                    office_codes = [code for codes in index.regions.values() for code in codes]
+                return await snapshot(archive, source, office_codes, args.concurrency)
+            finally:
+                await client.aclose()
+
+        print(f"{asyncio.run(run())} 件の発表をアーカイブに加えました", file=sys.stderr)
+
+    elif args.command == "accuracy":
+        today = datetime.now(JST).replace(hour=0, minute=0, second=0, microsecond=0)
+        until = today + timedelta(days=1)
+        since = until - timedelta(days=args.days)
+        print("予報日数  件数  天気の一致率  最低気温の誤差  最高気温の誤差")
+        for row in archive.accuracy(args.office, since.isoformat(), until.isoformat()):
+            rate = "-" if row["weather_hit_rate"] is None else f"{row['weather_hit_rate']:.1%}"
+            temp_min = "-" if row["temp_min_mae"] is None else f"{row['temp_min_mae']:.2f}℃"
+            temp_max = "-" if row["temp_max_mae"] is None else f"{row['temp_max_mae']:.2f}℃"
+            print(f"{row['lead']:>6}日 {row['count']:>6} {rate:>12} {temp_min:>14} {temp_max:>14}")
+
+    elif args.command == "compact":
+        for office_code in archive.offices():
+            archive.compact(office_code)
+
+
+if __name__ == "__main__":
+    import repo_path  # noqa: F401
+
+    main()
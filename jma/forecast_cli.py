@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import repo_path  # noqa: F401
+from area_index import INDEX_FILE, index_file, load_area_index
+from cache import DEFAULT_CACHE_DIR, ForecastCache
+from client import JmaClient, JMA_BASE_URL
+from fetcher import DEFAULT_CONCURRENCY
+from forecast_core import collect_forecasts
+
+# 全府県予報区の天気予報を画面なしでまとめて取得し、JSON Lines（1行1府県予報区）で出力する
+#
+#   python forecast_cli.py > forecasts.jsonl
+#   python forecast_cli.py --offices 130000 140000
+#   python forecast_cli.py --serve 8765        # http://127.0.0.1:8765/forecasts.jsonl
+
+
+# 地域の索引を読み込む（なければ area.json を取得して作る）
+async def load_index(source, path=INDEX_FILE):
+    try:
+        return load_area_index(path=path)
+    except FileNotFoundError:
+        area_data = await source.get_area_list()
+        return load_area_index(lambda: area_data, path)
+
+
+# 天気予報を取得して、整形したものを1行ずつ write に渡す（コルーチン関数でもよい）。書き出した件数を返す
+# 地域の索引は index_path に読み書きする
+async def dump_forecasts(source, write, office_codes=None, concurrency=DEFAULT_CONCURRENCY, index_path=INDEX_FILE):
+    index = await load_index(source, index_path)
+    if not office_codes:
+        office_codes = [code for codes in index.regions.values() for code in codes]
+    count = 0
+    async for record in collect_forecasts(source.get_weather_forecast, office_codes, index.office_names, concurrency):
+        result = write(json.dumps(record, ensure_ascii=False) + "\n")
+        if inspect.isawaitable(result):
+            await result
+        count += 1
+    return count
+
+
+# (クライアント, 天気予報の取得元) を返す。使い終わったらクライアントを aclose() する
+def make_source(args):
+    client = JmaClient(base_url=args.base_url, max_connections=max(args.concurrency, 1))
+    if args.no_cache:
+        return client, client
+    return client, ForecastCache(client, cache_dir=args.cache_dir)
+
+
+# GET /forecasts.jsonl で全府県予報区の天気予報を返すローカルのHTTPエンドポイント
+def serve(args):
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    client, source = make_source(args)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path, _, query = self.path.partition("?")
+            if path != "/forecasts.jsonl":
+                self.send_error(404)
+                return
+            offices = [code for code in query.replace("offices=", "").split(",") if code] if query.startswith("offices=") else None
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.end_headers()
+
+            # 送信はブロックするので、イベントループのスレッドではなく別のスレッドで行う
+            async def write(line):
+                await asyncio.to_thread(self.wfile.write, line.encode("utf-8"))
+
+            future = asyncio.run_coroutine_threadsafe(
+                dump_forecasts(source, write, offices, args.concurrency, index_file(args.cache_dir)), loop
+            )
+            future.result()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.serve), Handler)
+    print(f"http://127.0.0.1:{args.serve}/forecasts.jsonl", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="気象庁の天気予報をまとめて JSON Lines で出力する")
+    parser.add_argument("--offices", nargs="*", help="府県予報区コード（省略時はすべて）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時に取得する数")
+    parser.add_argument("--output", help="出力先のファイル（省略時は標準出力）")
+    parser.add_argument("--base-url", default=JMA_BASE_URL, help="気象庁APIのベースURL")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="応答キャッシュと地域の索引の保存先")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずに毎回取得する")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="ローカルのHTTPエンドポイントとして動かす")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return
+
+    async def run():
+        client, source = make_source(args)
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            count = await dump_forecasts(source, out.write, args.offices, args.concurrency, index_file(args.cache_dir))
+        finally:
+            await client.aclose()
+            if args.output:
+                out.close()
+        print(f"{count} 件の府県予報区を出力しました", file=sys.stderr)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+# 複数の府県予報区の天気予報JSONを、列ごとの配列（pandas の DataFrame）にまとめる
+# JSON をたどるのは1回だけで、値はリストにまとめて extend し、日時や数値への変換は列ごとに一括で行う
+# 全国の最高・最低気温や降水確率の一覧などは、地域ごとのループではなく列の演算で求められる
+#
+#   tables = forecast_columns([(office_code, weather_data), ...])
+#   national_temperature_extremes(tables)
+
+
+# JSON から列ごとの値を集める
+def _collect(forecasts):
+    weather = {"office_code": [], "area_code": [], "time": [], "weather_code": []}
+    pops = {"office_code": [], "area_code": [], "time": [], "pop": []}
+    weekly = {"office_code": [], "area_code": [], "date": [], "weather_code": [], "pop": []}
+    temps = {"office_code": [], "station_code": [], "date": [], "temp_min": [], "temp_max": []}
+
+    for office_code, weather_data in forecasts:
+        series = weather_data[0]['timeSeries']
+
+        times = series[0]['timeDefines']
+        for area in series[0]['areas']:
+            codes = area.get('weatherCodes', [])
+            n = len(codes)
+            weather["office_code"].extend([office_code] * n)
+            weather["area_code"].extend([area['area']['code']] * n)
+            weather["time"].extend(times[:n])
+            weather["weather_code"].extend(codes)
+
+        if len(series) > 1:
+            times = series[1]['timeDefines']
+            for area in series[1]['areas']:
+                values = area.get('pops', [])
+                n = len(values)
+                pops["office_code"].extend([office_code] * n)
+                pops["area_code"].extend([area['area']['code']] * n)
+                pops["time"].extend(times[:n])
+                pops["pop"].extend(values)
+
+        if len(weather_data) < 2:
+            continue
+        weekly_series = weather_data[1]['timeSeries']
+
+        times = weekly_series[0]['timeDefines']
+        for area in weekly_series[0]['areas']:
+            codes = area.get('weatherCodes', [])
+            n = len(codes)
+            weekly["office_code"].extend([office_code] * n)
+            weekly["area_code"].extend([area['area']['code']] * n)
+            weekly["date"].extend(times[:n])
+            weekly["weather_code"].extend(codes)
+            weekly["pop"].extend((area.get('pops') or [""] * n)[:n])
+
+        if len(weekly_series) > 1:
+            times = weekly_series[1]['timeDefines']
+            for area in weekly_series[1]['areas']:
+                temps_min = area.get('tempsMin', [])
+                n = len(temps_min)
+                temps["office_code"].extend([office_code] * n)
+                temps["station_code"].extend([area['area']['code']] * n)
+                temps["date"].extend(times[:n])
+                temps["temp_min"].extend(temps_min)
+                temps["temp_max"].extend((area.get('tempsMax') or [""] * n)[:n])
+
+    return weather, pops, weekly, temps
+
+
+# 文字列の列を数値に一括変換する（"" は NaN）
+def _numbers(values, dtype="float32"):
+    return pd.to_numeric(pd.Series(values, dtype="string"), errors="coerce").to_numpy(dtype=dtype, na_value=np.nan)
+
+
+# 天気コードの列（欠けていれば <NA>）
+def _codes(values):
+    return pd.to_numeric(pd.Series(values, dtype="string"), errors="coerce").astype("Int16")
+
+
+def _times(values):
+    return pd.to_datetime(pd.Series(values, dtype="string"), utc=True, format="ISO8601")
+
+
+# 天気予報JSONの並び [(府県予報区コード, JSON), ...] を4つの DataFrame にする
+#   weather: 短期予報の天気コード（office_code, area_code, time, weather_code）
+#   pops:    6時間ごとの降水確率（office_code, area_code, time, pop）
+#   weekly:  週間予報の天気コードと降水確率（office_code, area_code, date, weather_code, pop）
+#   temps:   週間予報の最低・最高気温（office_code, station_code, date, temp_min, temp_max）
+def forecast_columns(forecasts):
+    weather, pops, weekly, temps = _collect(forecasts)
+    return {
+        "weather": pd.DataFrame({
+            "office_code": pd.Categorical(weather["office_code"]),
+            "area_code": pd.Categorical(weather["area_code"]),
+            "time": _times(weather["time"]),
+            "weather_code": _codes(weather["weather_code"]),
+        }),
+        "pops": pd.DataFrame({
+            "office_code": pd.Categorical(pops["office_code"]),
+            "area_code": pd.Categorical(pops["area_code"]),
+            "time": _times(pops["time"]),
+            "pop": _numbers(pops["pop"]),
+        }),
+        "weekly": pd.DataFrame({
+            "office_code": pd.Categorical(weekly["office_code"]),
+            "area_code": pd.Categorical(weekly["area_code"]),
+            "date": _times(weekly["date"]),
+            "weather_code": _codes(weekly["weather_code"]),
+            "pop": _numbers(weekly["pop"]),
+        }),
+        "temps": pd.DataFrame({
+            "office_code": pd.Categorical(temps["office_code"]),
+            "station_code": pd.Categorical(temps["station_code"]),
+            "date": _times(temps["date"]),
+            "temp_min": _numbers(temps["temp_min"]),
+            "temp_max": _numbers(temps["temp_max"]),
+        }),
+    }
+
+
+# 日付ごとの全国の最低気温・最高気温と、その地点
+def national_temperature_extremes(tables):
+    temps = tables["temps"]
+    if temps.empty:
+        return pd.DataFrame(columns=["date", "temp_min", "min_station", "temp_max", "max_station"])
+    with_min = temps.dropna(subset=["temp_min"])
+    with_max = temps.dropna(subset=["temp_max"])
+    lowest = with_min.loc[with_min.groupby("date")["temp_min"].idxmin()]
+    highest = with_max.loc[with_max.groupby("date")["temp_max"].idxmax()]
+    return (
+        lowest[["date", "temp_min", "station_code"]].rename(columns={"station_code": "min_station"})
+        .merge(highest[["date", "temp_max", "station_code"]].rename(columns={"station_code": "max_station"}), on="date", how="outer")
+        .sort_values("date", ignore_index=True)
+    )
+
+
+# 期間の端の日時（タイムゾーンがなければ日本時間とみなす）
+def _bound(value):
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("Asia/Tokyo") if timestamp.tzinfo is None else timestamp
+
+
+# 一次細分区域ごとの降水確率（期間内の最大値）。since / until で期間を絞れる
+def rain_probability_map(tables, since=None, until=None):
+    pops = tables["pops"]
+    mask = np.ones(len(pops), dtype=bool)
+    if since is not None:
+        mask &= (pops["time"] >= _bound(since)).to_numpy()
+    if until is not None:
+        mask &= (pops["time"] < _bound(until)).to_numpy()
+    return pops.loc[mask].groupby("area_code", observed=True)["pop"].max()
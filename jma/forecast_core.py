@@ -0,0 +1,195 @@
+import logging
+from datetime import datetime
+
+from fetcher import fetch_concurrently, DEFAULT_CONCURRENCY
+
+log = logging.getLogger(__name__)
+
+# 天気予報JSONの取り出しと整形（UIを持たない共通部分）
+# jma アプリの画面、コマンドライン（forecast_cli.py）のどちらからも使う
+
+
+# 日付フォーマットを変換する関数
+def format_date(date_str, fmt="%Y-%m-%d"):
+    try:
+        date = datetime.fromisoformat(date_str)
+        return date.strftime(fmt)
+    except (TypeError, ValueError) as e:
+        log.warning("Error formatting date: %s", e)
+        return date_str
+
+
+# "12" や "" のような文字列の数値を数値（空なら None）にする
+def to_number(value):
+    if value in (None, ""):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+
+# 天気予報JSONから、天気の載っている地域を (地域コード, 地域名, 地域のデータ) で返す
+# 地域のデータには表示に使う timeDefines を付けておく（元のJSONは書き換えない）
+def forecast_areas(weather_data):
+    series = weather_data[0]['timeSeries'][0]
+    areas = []
+    for area in series['areas']:
+        if "weathers" in area:
+            area_data = dict(area, timeDefines=series['timeDefines'])
+            areas.append((area['area']['code'], area['area']['name'], area_data))
+    return areas
+
+
+# 地域のデータから、日ごとの (日付, 天気, 天気コード) を最大 days 日分返す
+def daily_weather(area_data, days=3):
+    weathers = area_data.get("weathers", [])
+    weather_codes = area_data.get("weatherCodes", [])
+    time_defines = area_data.get("timeDefines", [])
+    result = []
+    for date, weather, weather_code in zip(time_defines[:days], weathers[:days], weather_codes[:days]):
+        weather = weather.replace('　', '')  # 全角スペースを削除する
+        result.append((date, weather, weather_code))
+    return result
+
+
+# 週間予報の最高・最低気温を地域ごとに {地域コード: {"2025-02-01": (最高, 最低), ...}} で返す
+# 週間予報の気温はアメダス地点ごとなので、短期予報の気温（timeSeries[2]）で地域と同じ順に並ぶ地点を
+# その地域の地点とする（数が合わないときは対応が分からないので、その府県予報区は空にする）
+def weekly_temperatures(weather_data):
+    if len(weather_data) < 2 or len(weather_data[1]['timeSeries']) < 2:
+        return {}
+    series = weather_data[0]['timeSeries']
+    if len(series) < 3 or len(series[0]['areas']) != len(series[2]['areas']):
+        return {}
+    weekly = weather_data[1]['timeSeries'][1]
+    stations = {}
+    for area in weekly.get('areas', []):
+        stations[area['area']['code']] = {
+            date[:10]: (temp_max, temp_min)
+            for date, temp_min, temp_max in zip(weekly['timeDefines'], area.get('tempsMin', []), area.get('tempsMax', []))
+        }
+    result = {}
+    for area, station in zip(series[0]['areas'], series[2]['areas']):
+        temps = stations.get(station['area']['code'])
+        if temps is not None:
+            result[area['area']['code']] = temps
+    return result
+
+
+# 天気予報JSONを1つの府県予報区ぶんの辞書に整形する
+def normalize_forecast(office_code, weather_data, office_name=None):
+    short = weather_data[0]
+    series = short['timeSeries']
+    record = {
+        "office_code": office_code,
+        "office_name": office_name,
+        "publishing_office": short.get('publishingOffice'),
+        "report_datetime": short.get('reportDatetime'),
+        "areas": [],
+        "temperatures": [],
+        "weekly": {"areas": [], "temperatures": []},
+    }
+
+    # 天気・風（一次細分区域ごと）
+    weather_series = series[0]
+    areas = {}
+    for area in weather_series['areas']:
+        code = area['area']['code']
+        areas[code] = {
+            "area_code": code,
+            "area_name": area['area']['name'],
+            "weather": [
+                {"time": time, "weather": weather.replace('　', ''), "weather_code": weather_code, "wind": wind}
+                for time, weather, weather_code, wind in zip(
+                    weather_series['timeDefines'],
+                    area.get('weathers', []),
+                    area.get('weatherCodes', []),
+                    area.get('winds', []) or [None] * len(weather_series['timeDefines']),
+                )
+            ],
+            "pops": [],
+        }
+        record["areas"].append(areas[code])
+
+    # 降水確率（6時間ごと）
+    if len(series) > 1:
+        for area in series[1]['areas']:
+            target = areas.get(area['area']['code'])
+            if target is not None:
+                target["pops"] = [
+                    {"time": time, "pop": to_number(pop)}
+                    for time, pop in zip(series[1]['timeDefines'], area.get('pops', []))
+                ]
+
+    # 気温（アメダス地点ごと）
+    if len(series) > 2:
+        for area in series[2]['areas']:
+            for time, temp in zip(series[2]['timeDefines'], area.get('temps', [])):
+                record["temperatures"].append({
+                    "station_code": area['area']['code'],
+                    "station_name": area['area']['name'],
+                    "time": time,
+                    "temp": to_number(temp),
+                })
+
+    # 週間予報
+    if len(weather_data) > 1:
+        weekly = weather_data[1]['timeSeries']
+        for area in weekly[0]['areas']:
+            reliabilities = area.get('reliabilities', [])
+            record["weekly"]["areas"].append({
+                "area_code": area['area']['code'],
+                "area_name": area['area']['name'],
+                "days": [
+                    {
+                        "date": time,
+                        "weather_code": weather_code,
+                        "pop": to_number(pop),
+                        "reliability": reliabilities[i] if i < len(reliabilities) and reliabilities[i] else None,
+                    }
+                    for i, (time, weather_code, pop) in enumerate(zip(
+                        weekly[0]['timeDefines'], area.get('weatherCodes', []), area.get('pops', [])
+                    ))
+                ],
+            })
+        if len(weekly) > 1:
+            for area in weekly[1]['areas']:
+                record["weekly"]["temperatures"].append({
+                    "station_code": area['area']['code'],
+                    "station_name": area['area']['name'],
+                    "days": [
+                        {"date": time, "min": to_number(temp_min), "max": to_number(temp_max)}
+                        for time, temp_min, temp_max in zip(
+                            weekly[1]['timeDefines'], area.get('tempsMin', []), area.get('tempsMax', [])
+                        )
+                    ],
+                })
+
+    return record
+
+
+# 複数の府県予報区の天気予報を並行して取得し、整形したものを届いた順に返す非同期ジェネレータ
+# 取得や整形に失敗した府県予報区は {"office_code": ..., "error": ...} を返す
+async def collect_forecasts(fetch, office_codes, office_names=None, concurrency=DEFAULT_CONCURRENCY):
+    office_names = office_names or {}
+
+    async def fetch_or_error(office_code):
+        try:
+            return await fetch(office_code)
+        except Exception as e:
+            return e
+
+    async for office_code, weather_data in fetch_concurrently(office_codes, fetch_or_error, concurrency):
+        if isinstance(weather_data, Exception):
+            # 例外によってはメッセージが空なので、そのときは型の名前を出す
+            yield {"office_code": office_code, "error": str(weather_data) or repr(weather_data)}
+            continue
+        if not weather_data:
+            yield {"office_code": office_code, "error": "no data"}
+            continue
+        try:
+            yield normalize_forecast(office_code, weather_data, office_names.get(office_code))
+        except (LookupError, TypeError, AttributeError) as e:
+            yield {"office_code": office_code, "error": f"parse error: {e!r}"}
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+
+import flet as ft
+
+from weather_db import fetch_weather_page
+
+
+# 保存済みの天気データを新しい順に表示するリスト
+# 最初は1ページ分だけ読み込み、末尾近くまでスクロールされたら次のページを読み足す
+class HistoryView(ft.ListView):
+    def __init__(self, page_size=50, item_extent=28, **kwargs):
+        super().__init__(item_extent=item_extent, on_scroll_interval=100, **kwargs)
+        self.on_scroll = self.handle_scroll
+        self.page_size = page_size
+        self.location = None
+        self.cursor = None
+        self.exhausted = True
+        self._lock = threading.Lock()
+
+    # 地域を切り替えて1ページ目から表示し直す（イベントループから呼ぶ）
+    # SQLite の読み込みは別のスレッドで行い、画面の更新だけをループの上で行う
+    async def show_async(self, location):
+        rows = await asyncio.to_thread(self._first_page, location)
+        self._show_rows(rows, replace=True)
+
+    # 次のページを読み足す（読み込み中や最後まで読んだ後は何もしない）
+    def load_more(self):
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self.exhausted:
+                return
+            rows = self._read_page()
+        finally:
+            self._lock.release()
+        self._show_rows(rows)
+
+    def _first_page(self, location):
+        with self._lock:
+            self.location = location
+            self.cursor = None
+            self.exhausted = False
+            return self._read_page()
+
+    # 次の1ページを読み込む（_lock を持って呼ぶ）
+    def _read_page(self):
+        rows, self.cursor = fetch_weather_page(
+            after=self.cursor, limit=self.page_size, location=self.location, descending=True
+        )
+        self.exhausted = self.cursor is None
+        return rows
+
+    def _show_rows(self, rows, replace=False):
+        items = [ft.Text(f"{date} の天気: {weather}", size=14) for _, _, date, weather in rows]
+        if replace:
+            self.controls = items
+        else:
+            self.controls.extend(items)
+        self.update()
+
+    def handle_scroll(self, e):
+        if e.max_scroll_extent is not None and e.pixels >= e.max_scroll_extent - self.item_extent * 5:
+            self.load_more()
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+# 天気アイコンをローカルに置いて使う
+# 気象庁の天気コード（weatherCode）ごとのアイコンは一度だけ取得して assets/icons/jma に
+# 内容のハッシュ名で保存し、以降はネットワークに出ない
+# まだ取得していないアイコンや、ネットワークがないときは同梱の簡易アイコンを使う
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+ICONS_DIR = os.path.join(ASSETS_DIR, "icons")
+# 気象庁から取得したアイコンの保存先
+CACHE_DIR = os.path.join(ICONS_DIR, "jma")
+# flet の Image に渡すパス（assets_dir からの相対パス）
+ICONS_SRC = "/icons"
+CACHE_SRC = "/icons/jma"
+
+JMA_ICON_PATH = "/bosai/forecast/img/{image}"
+
+# 天気コード -> (気象庁のアイコン画像, 天気)
+TELOPS = {
+    "100": ("100.svg", "晴"), "101": ("101.svg", "晴時々曇"), "102": ("102.svg", "晴一時雨"),
+    "103": ("102.svg", "晴時々雨"), "104": ("104.svg", "晴一時雪"), "105": ("104.svg", "晴時々雪"),
+    "106": ("102.svg", "晴一時雨か雪"), "107": ("102.svg", "晴時々雨か雪"), "108": ("102.svg", "晴一時雨か雷雨"),
+    "110": ("110.svg", "晴後時々曇"), "111": ("110.svg", "晴後曇"), "112": ("112.svg", "晴後一時雨"),
+    "113": ("112.svg", "晴後時々雨"), "114": ("112.svg", "晴後雨"), "115": ("115.svg", "晴後一時雪"),
+    "116": ("115.svg", "晴後時々雪"), "117": ("115.svg", "晴後雪"), "118": ("112.svg", "晴後雨か雪"),
+    "119": ("112.svg", "晴後雨か雷雨"), "120": ("102.svg", "晴朝夕一時雨"), "121": ("102.svg", "晴朝の内一時雨"),
+    "122": ("112.svg", "晴夕方一時雨"), "123": ("100.svg", "晴山沿い雷雨"), "124": ("100.svg", "晴山沿い雪"),
+    "125": ("112.svg", "晴午後は雷雨"), "126": ("112.svg", "晴昼頃から雨"), "127": ("112.svg", "晴夕方から雨"),
+    "128": ("112.svg", "晴夜は雨"), "130": ("100.svg", "朝の内霧後晴"), "131": ("100.svg", "晴明け方霧"),
+    "132": ("101.svg", "晴朝夕曇"), "140": ("102.svg", "晴時々雨で雷を伴う"), "160": ("104.svg", "晴一時雪か雨"),
+    "170": ("104.svg", "晴時々雪か雨"), "181": ("115.svg", "晴後雪か雨"),
+    "200": ("200.svg", "曇"), "201": ("201.svg", "曇時々晴"), "202": ("202.svg", "曇一時雨"),
+    "203": ("202.svg", "曇時々雨"), "204": ("204.svg", "曇一時雪"), "205": ("204.svg", "曇時々雪"),
+    "206": ("202.svg", "曇一時雨か雪"), "207": ("202.svg", "曇時々雨か雪"), "208": ("202.svg", "曇一時雨か雷雨"),
+    "209": ("200.svg", "霧"), "210": ("210.svg", "曇後時々晴"), "211": ("210.svg", "曇後晴"),
+    "212": ("212.svg", "曇後一時雨"), "213": ("212.svg", "曇後時々雨"), "214": ("212.svg", "曇後雨"),
+    "215": ("215.svg", "曇後一時雪"), "216": ("215.svg", "曇後時々雪"), "217": ("215.svg", "曇後雪"),
+    "218": ("212.svg", "曇後雨か雪"), "219": ("212.svg", "曇後雨か雷雨"), "220": ("202.svg", "曇朝夕一時雨"),
+    "221": ("202.svg", "曇朝の内一時雨"), "222": ("212.svg", "曇夕方一時雨"), "223": ("201.svg", "曇日中時々晴"),
+    "224": ("212.svg", "曇昼頃から雨"), "225": ("212.svg", "曇夕方から雨"), "226": ("212.svg", "曇夜は雨"),
+    "228": ("215.svg", "曇昼頃から雪"), "229": ("215.svg", "曇夕方から雪"), "230": ("215.svg", "曇夜は雪"),
+    "231": ("200.svg", "曇海上海岸は霧か霧雨"), "240": ("202.svg", "曇時々雨で雷を伴う"),
+    "250": ("204.svg", "曇時々雪で雷を伴う"), "260": ("204.svg", "曇一時雪か雨"), "270": ("204.svg", "曇時々雪か雨"),
+    "281": ("215.svg", "曇後雪か雨"),
+    "300": ("300.svg", "雨"), "301": ("301.svg", "雨時々晴"), "302": ("302.svg", "雨時々止む"),
+    "303": ("303.svg", "雨時々雪"), "304": ("300.svg", "雨か雪"), "306": ("300.svg", "大雨"),
+    "308": ("308.svg", "雨で暴風を伴う"), "309": ("303.svg", "雨一時雪"), "311": ("311.svg", "雨後晴"),
+    "313": ("313.svg", "雨後曇"), "314": ("314.svg", "雨後時々雪"), "315": ("314.svg", "雨後雪"),
+    "316": ("311.svg", "雨か雪後晴"), "317": ("313.svg", "雨か雪後曇"), "320": ("311.svg", "朝の内雨後晴"),
+    "321": ("313.svg", "朝の内雨後曇"), "322": ("303.svg", "雨朝晩一時雪"), "323": ("311.svg", "雨昼頃から晴"),
+    "324": ("311.svg", "雨夕方から晴"), "325": ("311.svg", "雨夜は晴"), "326": ("314.svg", "雨夕方から雪"),
+    "327": ("314.svg", "雨夜は雪"), "328": ("300.svg", "雨一時強く降る"), "329": ("300.svg", "雨一時みぞれ"),
+    "340": ("400.svg", "雪か雨"), "350": ("300.svg", "雨で雷を伴う"), "361": ("411.svg", "雪か雨後晴"),
+    "371": ("413.svg", "雪か雨後曇"),
+    "400": ("400.svg", "雪"), "401": ("401.svg", "雪時々晴"), "402": ("402.svg", "雪時々止む"),
+    "403": ("403.svg", "雪時々雨"), "405": ("400.svg", "大雪"), "406": ("406.svg", "風雪強い"),
+    "407": ("406.svg", "暴風雪"), "409": ("403.svg", "雪一時雨"), "411": ("411.svg", "雪後晴"),
+    "413": ("413.svg", "雪後曇"), "414": ("414.svg", "雪後雨"), "420": ("411.svg", "朝の内雪後晴"),
+    "421": ("413.svg", "朝の内雪後曇"), "422": ("414.svg", "雪昼頃から雨"), "423": ("414.svg", "雪夕方から雨"),
+    "425": ("400.svg", "雪一時強く降る"), "426": ("400.svg", "雪後みぞれ"), "427": ("400.svg", "雪一時みぞれ"),
+    "430": ("400.svg", "みぞれ"), "450": ("400.svg", "雪で雷を伴う"),
+}
+
+# 同梱の簡易アイコン（天気コードの百の位ごと）
+BUNDLED_ICONS = {1: "sunny.svg", 2: "cloudy.svg", 3: "rainy.svg", 4: "snowy.svg"}
+UNKNOWN_ICON = "unknown.svg"
+
+
+# 天気コードに対応する同梱アイコンのファイル名
+def bundled_icon(weather_code):
+    try:
+        category = int(weather_code) // 100  # 百の位を取得
+    except (TypeError, ValueError):
+        return UNKNOWN_ICON
+    return BUNDLED_ICONS.get(category, UNKNOWN_ICON)
+
+
+class IconCache:
+    def __init__(self, client=None, loop=None, cache_dir=CACHE_DIR):
+        self.client = client  # JmaClient（None ならアイコンを取りに行かない）
+        self.loop = loop
+        self.cache_dir = cache_dir
+        self.manifest_file = os.path.join(cache_dir, "manifest.json")
+        self.manifest = self._load_manifest()  # 気象庁の画像名 -> 保存したファイル名
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_file, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # ファイルが消えているものは取り直す
+        return {image: name for image, name in manifest.items() if os.path.exists(os.path.join(self.cache_dir, name))}
+
+    # 天気コードに対応するアイコンの src を返す（通信はしない）
+    # 気象庁のアイコンがまだ手元になければ同梱アイコンを返し、裏で取得しておく
+    def get(self, weather_code):
+        telop = TELOPS.get(str(weather_code))
+        if telop is not None:
+            name = self.manifest.get(telop[0])
+            if name is not None:
+                return f"{CACHE_SRC}/{name}"
+            self._schedule_fetch(telop[0])
+        return f"{ICONS_SRC}/{bundled_icon(weather_code)}"
+
+    def _schedule_fetch(self, image):
+        if self.client is None or self.loop is None or image in self._pending:
+            return
+        self._pending.add(image)
+        asyncio.run_coroutine_threadsafe(self.fetch(image), self.loop)
+
+    # 気象庁のアイコンを取得して、内容のハッシュ名で保存する
+    async def fetch(self, image):
+        try:
+            if image in self.manifest:
+                return self.manifest[image]
+            response = await self.client.get(JMA_ICON_PATH.format(image=image))
+            response.raise_for_status()
+            content = response.content
+            name = hashlib.sha256(content).hexdigest()[:16] + os.path.splitext(image)[1]
+            await asyncio.to_thread(self._store, image, name, content)
+            return name
+        except Exception as e:
+            log.warning("アイコンを取得できませんでした (%s): %s", image, e)
+            return None
+        finally:
+            self._pending.discard(image)
+
+    # 全天気コードのアイコンをまとめて取得しておく（すでにあるものは飛ばす）
+    async def fetch_all(self):
+        for image in sorted({image for image, _ in TELOPS.values()}):
+            if image not in self.manifest and image not in self._pending:
+                self._pending.add(image)
+                # 取得できなければネットワークがないとみなして打ち切る（同梱アイコンで表示は続けられる）
+                if await self.fetch(image) is None:
+                    break
+
+    def _store(self, image, name, content):
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.exists(path):
+                with open(f"{path}.tmp", "wb") as f:
+                    f.write(content)
+                os.replace(f"{path}.tmp", path)
+            self.manifest[image] = name
+            tmp_manifest = f"{self.manifest_file}.tmp"
+            with open(tmp_manifest, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_manifest, self.manifest_file)
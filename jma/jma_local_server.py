@@ -0,0 +1,83 @@
+import hashlib
+import json
+import random
+import socket
+import struct
+import time
+
+from stand_in_server import StandInServer
+
+# 気象庁APIの代わりに使うローカルのスタンドインサーバ
+# 用意しておいたJSONを、指定した遅延を入れて返す（動作確認・計測用）
+#
+#   server = LocalJmaServer(forecasts={"130000": [...]}, latency=0.2)
+#   server.start()
+#   ... server.url + "/bosai/forecast/data/forecast/130000.json" ...
+#   server.stop()
+#
+# 不安定なサーバの真似もできる（それぞれの確率で、503 を返す・接続を切る・hang_time 秒応答しない）
+#
+#   LocalJmaServer(forecasts, error_rate=0.2, reset_rate=0.1, hang_rate=0.05, hang_time=30, seed=1)
+
+AREA_PATH = "/bosai/common/const/area.json"
+FORECAST_PREFIX = "/bosai/forecast/data/forecast/"
+
+
+class LocalJmaServer(StandInServer):
+    def __init__(self, forecasts=None, area=None, latency=0.0, host="127.0.0.1", port=0,
+                 error_rate=0.0, reset_rate=0.0, hang_rate=0.0, hang_time=30.0, seed=None):
+        super().__init__(latency, host, port)
+        self.forecasts = forecasts or {}
+        self.area = area
+        self.error_rate = error_rate
+        self.reset_rate = reset_rate
+        self.hang_rate = hang_rate
+        self.hang_time = hang_time
+        self.faults = {"error": 0, "reset": 0, "hang": 0}  # 起こした障害の回数
+        self._random = random.Random(seed)
+
+    def handle_get(self, handler):
+        fault = self._pick_fault()
+        if fault == "reset":
+            # RST で接続を切る（クライアントには接続リセットに見える）
+            handler.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            handler.close_connection = True
+            return
+        if fault == "hang":
+            time.sleep(self.hang_time)
+        if fault == "error":
+            handler.reply(503)
+            return
+        payload = self.lookup(handler.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if payload is None:
+            handler.reply(404)
+            return
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if handler.headers.get("If-None-Match") == etag:
+            handler.reply(304, headers=[("ETag", etag)])
+            return
+        handler.reply(200, body, "application/json; charset=utf-8", [("ETag", etag)])
+
+    # このリクエストで起こす障害を決める（なければ None）
+    def _pick_fault(self):
+        with self._lock:
+            r = self._random.random()
+            for fault, rate in (("error", self.error_rate), ("reset", self.reset_rate), ("hang", self.hang_rate)):
+                if r < rate:
+                    self.faults[fault] += 1
+                    return fault
+                r -= rate
+        return None
+
+    # パスに対応するJSONを探す（見つからなければNone）
+    def lookup(self, path):
+        path = path.split("?", 1)[0]
+        if path == AREA_PATH:
+            return self.area
+        if path.startswith(FORECAST_PREFIX) and path.endswith(".json"):
+            region_code = path[len(FORECAST_PREFIX):-len(".json")]
+            return self.forecasts.get(region_code)
+        return None
@@ -1,74 +1,85 @@
 import asyncio
-import requests
+import httpx
 import flet as ft
-from flet import Dropdown, dropdown, ElevatedButton, Column, ListView, Text
-from datetime import datetime
+from flet import Dropdown, dropdown, ListView, Text
+
+import repo_path  # noqa: F401
+from fetcher import fetch_concurrently
+from forecast_core import format_date, forecast_areas, daily_weather, weekly_temperatures
+from client import JmaClient, run_in_loop
+from cache import ForecastCache
+from prefetch import ForecastPrefetcher
+from area_index import load_area_index
+from views import AreaButtonList
+from metrics import UI_UPDATE_SECONDS, sampled_logger, start_from_env
+
+# 地域ごと・区域ごとに通るログは間引いて出す（LOG_LEVEL=DEBUG のときだけ出る）
+log = sampled_logger("jma.main")
 
 # グローバルイベントループの設定
 loop = asyncio.new_event_loop()
 asyncio.set_event_loop(loop)
 
+# 地域ごとの天気情報を同時に取得する最大数
+FETCH_CONCURRENCY = 6
+
+# 気象庁APIへの共有クライアント（接続をプールして使い回す。計測時はローカルサーバ向けに差し替える）
+client = JmaClient()
+# 気象庁の発表時刻に合わせて期限切れにする応答キャッシュ（ディスクにも保存して再起動後も使う）
+forecast_cache = ForecastCache(client)
+
+# 全地域の天気情報を先読みするレート（1秒あたりのリクエスト数）と周期（秒）
+PREFETCH_RATE = 1.0
+PREFETCH_INTERVAL = 10 * 60
+prefetcher = None
+
 # 日本気象庁のAPIから地域リストを取得する関数
 def get_area_list():
-    url = "https://www.jma.go.jp/bosai/common/const/area.json"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return run_in_loop(loop, forecast_cache.get_area_list())
 
 # 地域ごとの天気情報を取得する非同期関数
 async def get_weather_forecast(region_code):
-    url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{region_code}.json"
-    response = await asyncio.to_thread(requests.get, url)
-    response.raise_for_status()
-    return response.json()
-
-# 日付フォーマットを変換する関数
-def format_date(date_str):
-    date = datetime.fromisoformat(date_str)
-    return date.strftime("%m月%d日")
+    return await forecast_cache.get_weather_forecast(region_code)
 
 # 特定のエリアの天気情報を表示
+@UI_UPDATE_SECONDS.timed(app="jma", event="show_weather")
 def show_area_weather(e, area_data, temperature_data):
     if area_data:
-        weathers = area_data.get("weathers", [])
-        timeDefines = area_data.get("timeDefines", [])
-        max_temps = temperature_data.get("tempsMax", []) if temperature_data else []
-        min_temps = temperature_data.get("tempsMin", []) if temperature_data else []
-        if weathers and timeDefines:
+        days = daily_weather(area_data)
+        temperature_data = temperature_data or {}
+        if days:
             weather_messages = []
-            for i, (date, weather) in enumerate(zip(timeDefines[:3], weathers[:3])):
-                formatted_date = format_date(date)
-                weather = weather.replace('　', '')  # 全角スペースを削除する
-                max_temp = f"{max_temps[i]}℃" if i < len(max_temps) and max_temps[i] else "-℃"
-                min_temp = f"{min_temps[i]}℃" if i < len(min_temps) and min_temps[i] else "-℃"
+            for date, weather, _ in days:
+                formatted_date = format_date(date, "%m月%d日")
+                # 週間予報の気温は日付で合わせる（週間予報は翌日から）
+                max_temp, min_temp = temperature_data.get(date[:10], ("", ""))
+                max_temp = f"{max_temp}℃" if max_temp else "-℃"
+                min_temp = f"{min_temp}℃" if min_temp else "-℃"
                 weather_messages.append(f"{formatted_date} の天気: {weather}\n最高気温: {max_temp}, 最低気温: {min_temp}")
             weather_text.value = "\n\n".join(weather_messages)
         else:
             weather_text.value = "天気情報が取得できませんでした。"
     else:
         weather_text.value = "天気情報が取得できませんでした。"
-    page.update()
+    weather_text.update()
 
 # 地域選択後の処理（非同期関数）
+@UI_UPDATE_SECONDS.timed(app="jma", event="select_region")
 async def on_dropdown_change_async(selected_region_name):
     region_codes = regions[selected_region_name]
-    area_buttons.controls.clear()
+    # ボタンは使い回し、応答が届いた地域コードの分から順に埋めていく
+    area_buttons.set_region(region_codes)
 
-    for region_code in region_codes:
-        weather_data = await load_forecast(region_code)
+    async for region_code, weather_data in fetch_concurrently(region_codes, load_forecast, FETCH_CONCURRENCY):
         if weather_data:
-            for area in weather_data[0]['timeSeries'][0]['areas']:
-                if "weathers" in area:
-                    area_name = area['area']['name']
-                    # 都道府県名を追加
-                    area_full_name = f"{area_names.get(region_code, '未知の地域')} - {area_name}"
-                    print(f"ボタンが追加される予定の地域: {area_full_name}")
-                    area_button = ElevatedButton(text=area_full_name, on_click=lambda e, area=area, temp_data=weather_data[1]['timeSeries'][1] if len(weather_data[1]['timeSeries']) > 1 else None: show_area_weather(e, area, temp_data))
-                    area_buttons.controls.append(area_button)
-                # 時間定義を保存しておく
-                area["timeDefines"] = weather_data[0]['timeSeries'][0]['timeDefines']
-
-    page.update()
+            temp_data = weekly_temperatures(weather_data)
+            areas = []
+            for area_code, area_name, area in forecast_areas(weather_data):
+                # 都道府県名を追加
+                area_full_name = f"{area_names.get(region_code, '未知の地域')} - {area_name}"
+                log.debug("ボタンが追加される予定の地域: %s", area_full_name)
+                areas.append((area_full_name, (area, temp_data.get(area_code))))
+            area_buttons.set_areas(region_code, areas)
 
 # 地域選択後の同期ラッパー関数
 def on_dropdown_change(e):
@@ -77,43 +88,43 @@ def on_dropdown_change(e):
 
 # 地域ごとの天気情報をロードする非同期関数
 async def load_forecast(region_code):
+    # 先読み済みならメモリから返す
+    if prefetcher is not None:
+        weather_data = prefetcher.get(region_code)
+        if weather_data:
+            return weather_data
     try:
         weather_data = await get_weather_forecast(region_code)
-        print(f"地域コード {region_code} の天気情報: {weather_data[0]['timeSeries'][0]['areas']}")
+        log.debug("地域コード %s の天気情報: %s", region_code, weather_data[0]['timeSeries'][0]['areas'])
         return weather_data
-    except requests.exceptions.HTTPError as ex:
-        print(f"HTTPエラーが発生しました: {ex}")
+    except httpx.HTTPStatusError as ex:
+        log.warning("HTTPエラーが発生しました: %s", ex)
+        return None
+    except (httpx.HTTPError, ValueError) as ex:
+        # 接続エラー・タイムアウト・壊れた応答などでも、その地域だけ諦めて他の地域の表示は続ける
+        log.warning("天気情報を取得できませんでした (%s): %s", region_code, ex)
         return None
 
 # メイン関数
 def main(pg):
-    global area_buttons, weather_text, regions, page, area_names
+    global prefetcher, area_buttons, weather_text, regions, page, area_names
     page = pg
+    start_from_env()
     page.title = "天気予報アプリケーション - 地域ごとの天気"
 
-    area_data = get_area_list()
+    # 地域の索引を読み込む（初回だけ area.json から作ってファイルに保存する）
+    area_index = load_area_index(get_area_list)
 
     # 都道府県名のマッピング
-    area_names = {code: info["name"] for code, info in area_data["offices"].items()}
-
-    regions = {
-        "北海道地方": ["011000", "012000", "013000", "014030", "014100", "015000", "016000", "017000"],
-        "東北地方": ["020000", "030000", "040000", "050000", "060000", "070000"],
-        "関東甲信地方": ["080000", "090000", "100000", "110000", "120000", "130000", "140000", "190000", "200000"],
-        "東海地方": ["210000", "220000", "230000", "240000"],
-        "北陸地方": ["150000", "160000", "170000", "180000"],
-        "近畿地方": ["250000", "260000", "270000", "280000", "290000", "300000"],
-        "中国地方（山口県を除く）": ["310000", "320000", "330000", "340000"],
-        "四国地方": ["360000", "370000", "380000", "390000"],
-        "九州北部地方（山口県を含む）": ["400000", "410000", "420000", "430000", "440000", "350000"],
-        "九州南部・奄美地方": ["450000", "460100", "460040"],
-        "沖縄地方": ["471000", "472000", "473000", "474000"]
-    }
+    area_names = area_index.office_names
+
+    # 地方名と府県予報区コードの対応
+    regions = area_index.regions
 
     dropdown_items = [dropdown.Option(region) for region in regions.keys()]
 
     dropdown_list = Dropdown(options=dropdown_items, on_change=on_dropdown_change, width=400)
-    area_buttons = Column()
+    area_buttons = AreaButtonList(on_select=lambda e, data: show_area_weather(e, *data))
     weather_text = Text(value="天気予報がここに表示されます", expand=True)
 
     # スクロール可能なListViewにラップ
@@ -129,7 +140,13 @@ def main(pg):
     page.add(weather_text)
     page.update()
 
+    # 全地域の天気情報の先読みを始める（2つ目以降のセッションでは動いているものを使う）
+    if prefetcher is None:
+        office_codes = [code for codes in regions.values() for code in codes]
+        prefetcher = ForecastPrefetcher(get_weather_forecast, office_codes, rate=PREFETCH_RATE, interval=PREFETCH_INTERVAL)
+
     global loop
+    prefetcher.start(loop)
     if not loop.is_running():
         loop.run_forever()
 
@@ -1,163 +1,119 @@
 import asyncio
-import requests
+import atexit
+import httpx
 import flet as ft
-import sqlite3
-from flet import Dropdown, dropdown, ElevatedButton, Column, ListView, Image, Text, Container, Row, ScrollMode, MainAxisAlignment
-from datetime import datetime
+from flet import Dropdown, dropdown, Column, ListView, Text, Container, Row, ScrollMode, MainAxisAlignment
+
+import repo_path  # noqa: F401
+from fetcher import fetch_concurrently
+from forecast_core import format_date, forecast_areas, daily_weather
+from client import JmaClient, run_in_loop
+from cache import ForecastCache
+from prefetch import ForecastPrefetcher
+from area_index import load_area_index
+from weather_db import setup_database, WeatherReportWriter
+from history_view import HistoryView
+from views import AreaButtonList, ForecastPanel
+from icons import IconCache
+from forecast_archive import ForecastArchive
+from metrics import UI_UPDATE_SECONDS, sampled_logger, start_from_env
+
+log = sampled_logger("jma.main2")
 
 # グローバルイベントループの設定
 loop = asyncio.new_event_loop()
 asyncio.set_event_loop(loop)
 
-# データベースのパスと名前
-db_name = 'weather.db'
-db_path = './'
+# 地域ごとの天気情報を同時に取得する最大数
+FETCH_CONCURRENCY = 6
 
-# 天気コードからアイコンURLを取得する関数
+# 気象庁APIへの共有クライアント（接続をプールして使い回す。計測時はローカルサーバ向けに差し替える）
+client = JmaClient()
+# 気象庁の発表時刻に合わせて期限切れにする応答キャッシュ（ディスクにも保存して再起動後も使う）
+forecast_cache = ForecastCache(client)
+
+# 全地域の天気情報を先読みするレート（1秒あたりのリクエスト数）と周期（秒）
+PREFETCH_RATE = 1.0
+PREFETCH_INTERVAL = 10 * 60
+prefetcher = None
+
+# 天気データの書き込みはバックグラウンドのスレッドにまとめて任せる
+weather_writer = WeatherReportWriter()
+atexit.register(weather_writer.close)
+
+# 先読みで取得した天気予報は発表ごとにアーカイブしておく（予報の当たり具合の集計に使う）
+forecast_archive = ForecastArchive()
+
+def _archive_forecast(region_code, weather_data):
+    try:
+        if forecast_archive.add(region_code, weather_data):
+            forecast_archive.flush()
+    except OSError as e:
+        log.error("天気予報をアーカイブできませんでした (%s): %s", region_code, e)
+
+# 先読みのたびにイベントループ上で呼ばれるので、配列の圧縮と書き出しは別のスレッドで行う
+def archive_forecast(region_code, weather_data):
+    loop.run_in_executor(None, _archive_forecast, region_code, weather_data)
+
+# 天気アイコンはローカルに保存したものを使う（気象庁のアイコンは初回だけ取得する）
+icon_cache = IconCache(client, loop)
+
+# 天気コードからアイコンを取得する関数
 def get_weather_icon(weather_code):
-    weather_category = int(weather_code) // 100  # 百の位を取得
-    if weather_category == 1:
-        return "https://illalet.com/wp-content/uploads/2017/05/16_2_19.png"  # 晴れ
-    elif weather_category == 2:
-        return "https://illalet.com/wp-content/uploads/2017/05/16_2_21.png"  # 曇り
-    elif weather_category == 3:
-        return "https://illalet.com/wp-content/uploads/2017/05/16_2_23.png"  # 雨
-    elif weather_category == 4:
-        return "https://illalet.com/wp-content/uploads/illust/16_2_925.png"  # 雪
-    else:
-        return "unknown.png"  # 不明な場合
-
-# SQLiteデータベースのセットアップとテーブル作成
-def setup_database():
-    conn = sqlite3.connect(db_path + db_name)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS weather_reports (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        location TEXT NOT NULL,
-        datetime TEXT NOT NULL,
-        weather TEXT
-    )
-    ''')
-
-    conn.commit()
-    conn.close()
-
-# データベースからデータを読み込む関数
-def fetch_weather_reports():
-    conn = sqlite3.connect(db_path + db_name)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM weather_reports')
-    rows = cursor.fetchall()
-    
-    conn.close()
-    return rows
+    return icon_cache.get(weather_code)
 
 # 日本気象庁のAPIから地域リストを取得する関数
 def get_area_list():
-    url = "https://www.jma.go.jp/bosai/common/const/area.json"
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+    return run_in_loop(loop, forecast_cache.get_area_list())
 
 # 地域ごとの天気情報を取得する非同期関数
 async def get_weather_forecast(region_code):
-    url = f"https://www.jma.go.jp/bosai/forecast/data/forecast/{region_code}.json"
-    response = await asyncio.to_thread(requests.get, url)
-    response.raise_for_status()
-    return response.json()
-
-# 天気データを保存する関数
-def save_weather_to_db(location, datetime, weather):
-    try:
-        conn = sqlite3.connect(db_path + db_name)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT INTO weather_reports (location, datetime, weather)
-        VALUES (?, ?, ?)
-        ''', (location, datetime, weather))
-        
-        conn.commit()
-        conn.close()
-    except Exception as e:
-        print(f"Error saving to database: {e}")
-
-# 日付フォーマットを変換する関数
-def format_date(date_str):
-    try:
-        date = datetime.fromisoformat(date_str)
-        return date.strftime("%Y-%m-%d")
-    except Exception as e:
-        print(f"Error formatting date: {e}")
-        return date_str
+    return await forecast_cache.get_weather_forecast(region_code)
 
 # 特定のエリアの天気情報を表示
+@UI_UPDATE_SECONDS.timed(app="jma", event="show_weather")
 def show_area_weather(location, area_data):
     try:
-        if area_data:
-            weathers = area_data.get("weathers", [])
-            weatherCodes = area_data.get("weatherCodes", [])  # weatherCodesを取得
-            timeDefines = area_data.get("timeDefines", [])
-
-            if weathers and timeDefines and weatherCodes:
-                rows = []
-                for i, (date, weather, weather_code) in enumerate(zip(timeDefines[:3], weathers[:3], weatherCodes[:3])):
-                    formatted_date = format_date(date)
-                    weather = weather.replace('　', '')  # 全角スペースを削除する
-                    weather_icon = get_weather_icon(weather_code)  # 天気アイコンの取得
-                    weather_messages = f"{formatted_date} の天気: {weather}"
-                    # 天気データをデータベースに保存
-                    save_weather_to_db(location, formatted_date, weather)
-                    
-                    # 一日の天気情報を表示するコンテナ
-                    weather_container = Container(
-                        content=Column([
-                            Text(formatted_date, size=16),
-                            Image(src=weather_icon, width=48, height=48),
-                            Text(weather, size=14)
-                        ]),
-                        width=150,
-                        padding=10
-                    )
-                    
-                    rows.append(weather_container)
-                
-                weather_text.controls = rows
-            else:
-                weather_text.controls = [Text("天気情報が取得できませんでした。")]
+        days = []
+        reports = []
+        for date, weather, weather_code in daily_weather(area_data) if area_data else []:
+            formatted_date = format_date(date)
+            weather_icon = get_weather_icon(weather_code)  # 天気アイコンの取得
+            reports.append((location, formatted_date, weather))
+            days.append((formatted_date, weather_icon, weather))
+
+        if days:
+            # 天気データをデータベースに保存（書き込みを待たずに戻る）
+            weather_writer.save_many(reports)
+            asyncio.run_coroutine_threadsafe(show_history_async(location), loop)
+            # 一日ごとの天気カードの中身だけを書き換える
+            weather_text.show_days(days)
         else:
-            weather_text.controls = [Text("天気情報が取得できませんでした。")]
+            weather_text.show_message("天気情報が取得できませんでした。")
     except Exception as e:
-        weather_text.controls = [Text(f"Error displaying weather: {e}")]
-    page.update()
+        weather_text.show_message(f"Error displaying weather: {e}")
+
+# 保存が終わってから、選択した地域の過去の天気を表示する
+async def show_history_async(location):
+    await asyncio.to_thread(weather_writer.flush)
+    await history_view.show_async(location)
 
 # 地域選択後の処理（非同期関数）
+@UI_UPDATE_SECONDS.timed(app="jma", event="select_region")
 async def on_dropdown_change_async(selected_region_name):
     region_codes = regions[selected_region_name]
-    area_buttons.controls.clear()
+    # ボタンは使い回し、応答が届いた地域コードの分から順に埋めていく
+    area_buttons.set_region(region_codes)
 
-    for region_code in region_codes:
-        weather_data = await load_forecast(region_code)
+    async for region_code, weather_data in fetch_concurrently(region_codes, load_forecast, FETCH_CONCURRENCY):
         if weather_data:
-            for area in weather_data[0]['timeSeries'][0]['areas']:
-                if "weathers" in area:
-                    area_name = area['area']['name']
-                    # 都道府県名を追加
-                    area_full_name = f"{area_names.get(region_code, '未知の地域')} - {area_name}"
-                    location = area_full_name  # 位置情報を設定
-                    area_button = ElevatedButton(
-                        text=area_full_name, 
-                        on_click=lambda e, area=area, location=location: show_area_weather(location, area),
-                        width=400
-                    )
-                    area_buttons.controls.append(area_button)
-                # 時間定義を保存しておく
-                area["timeDefines"] = weather_data[0]['timeSeries'][0]['timeDefines']
-
-    page.update()
+            areas = []
+            for area_code, area_name, area in forecast_areas(weather_data):
+                # 都道府県名を追加
+                area_full_name = f"{area_names.get(region_code, '未知の地域')} - {area_name}"
+                location = area_full_name  # 位置情報を設定
+                areas.append((area_full_name, (location, area)))
+            area_buttons.set_areas(region_code, areas)
 
 # 地域選択後の同期ラッパー関数
 def on_dropdown_change(e):
@@ -166,46 +122,50 @@ def on_dropdown_change(e):
 
 # 地域ごとの天気情報をロードする非同期関数
 async def load_forecast(region_code):
+    # 先読み済みならメモリから返す
+    if prefetcher is not None:
+        weather_data = prefetcher.get(region_code)
+        if weather_data:
+            return weather_data
     try:
         weather_data = await get_weather_forecast(region_code)
         return weather_data
-    except requests.exceptions.HTTPError as ex:
-        print(f"HTTPエラーが発生しました: {ex}")
+    except httpx.HTTPStatusError as ex:
+        log.warning("HTTPエラーが発生しました: %s", ex)
+        return None
+    except (httpx.HTTPError, ValueError) as ex:
+        # 接続エラー・タイムアウト・壊れた応答などでも、その地域だけ諦めて他の地域の表示は続ける
+        log.warning("天気情報を取得できませんでした (%s): %s", region_code, ex)
         return None
 
 # メイン関数
 def main(pg):
-    global area_buttons, weather_text, regions, page, area_names
+    global prefetcher, area_buttons, weather_text, history_view, regions, page, area_names
     page = pg
+    start_from_env()
     page.title = "天気予報アプリケーション - 地域ごとの天気"
 
     # データベースのセットアップとテーブル作成（存在しない場合に実行）
     setup_database()
 
-    area_data = get_area_list()
+    # 地域の索引を読み込む（初回だけ area.json から作ってファイルに保存する）
+    area_index = load_area_index(get_area_list)
 
     # 都道府県名のマッピング
-    area_names = {code: info["name"] for code, info in area_data["offices"].items()}
-
-    regions = {
-        "北海道地方": ["011000", "012000", "013000", "014030", "014100", "015000", "016000", "017000"],
-        "東北地方": ["020000", "030000", "040000", "050000", "060000", "070000"],
-        "関東甲信地方": ["080000", "090000", "100000", "110000", "120000", "130000", "140000", "190000", "200000"],
-        "東海地方": ["210000", "220000", "230000", "240000"],
-        "北陸地方": ["150000", "160000", "170000", "180000"],
-        "近畿地方": ["250000", "260000", "270000", "280000", "290000", "300000"],
-        "中国地方（山口県を除く）": ["310000", "320000", "330000", "340000"],
-        "四国地方": ["360000", "370000", "380000", "390000"],
-        "九州北部地方（山口県を含む）": ["400000", "410000", "420000", "430000", "440000", "350000"],
-        "九州南部・奄美地方": ["450000", "460100", "460040"],
-        "沖縄地方": ["471000", "472000", "473000", "474000"]
-    }
+    area_names = area_index.office_names
+
+    # 地方名と府県予報区コードの対応
+    regions = area_index.regions
 
     dropdown_items = [dropdown.Option(region) for region in regions.keys()]
 
     dropdown_list = Dropdown(options=dropdown_items, on_change=on_dropdown_change, width=400)
-    area_buttons = Column(scroll=ScrollMode.ALWAYS)
-    weather_text = Column(scroll=ScrollMode.ALWAYS)
+    area_buttons = AreaButtonList(
+        on_select=lambda e, data: show_area_weather(*data),
+        button_width=400,
+        scroll=ScrollMode.ALWAYS
+    )
+    weather_text = ForecastPanel(scroll=ScrollMode.ALWAYS)
 
     # スクロール可能なListViewにラップ
     scrollable_area = ListView(
@@ -220,6 +180,9 @@ def main(pg):
         expand=True
     )
 
+    # 保存済みの天気（見えている範囲だけ読み込む）
+    history_view = HistoryView(height=400)
+
     # UIのレイアウト
     page.add(
         Column(
@@ -254,6 +217,15 @@ def main(pg):
                             width=400,
                             height=400
                         ),
+                        Container(width=20),
+                        Column(
+                            [
+                                Text("過去の天気:", size=20),
+                                history_view,
+                            ],
+                            width=300,
+                            height=400
+                        ),
                     ],
                     alignment=MainAxisAlignment.CENTER
                 ),
@@ -265,9 +237,18 @@ def main(pg):
 
     page.update()
 
+    # 全地域の天気情報の先読みを始める（2つ目以降のセッションでは動いているものを使う）
+    if prefetcher is None:
+        office_codes = [code for codes in regions.values() for code in codes]
+        prefetcher = ForecastPrefetcher(get_weather_forecast, office_codes, rate=PREFETCH_RATE, interval=PREFETCH_INTERVAL,
+                                        on_update=archive_forecast)
+
     global loop
+    prefetcher.start(loop)
+    # 天気アイコンもまとめて取得しておく（手元にあるものは飛ばす）
+    asyncio.run_coroutine_threadsafe(icon_cache.fetch_all(), loop)
     if not loop.is_running():
         loop.run_forever()
 
 # アプリケーションの起動
-ft.app(target=main)
\ No newline at end of file
+ft.app(target=main, assets_dir="assets")
\ No newline at end of file
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import random
+import time
+
+log = logging.getLogger(__name__)
+
+
+# 全地域の天気情報をバックグラウンドで定期的に取得しておき、メモリから即座に返せるようにする
+# 気象庁に負荷をかけないよう、リクエストの間隔は rate（1秒あたりの回数）を超えないようにし、
+# 間隔には揺らぎ（jitter）を加え、失敗が続いたら間隔を広げる（backoff）
+class ForecastPrefetcher:
+    def __init__(self, fetch, region_codes, rate=1.0, interval=10 * 60, jitter=0.2, max_backoff=32, on_update=None,
+                 max_age=None):
+        self.fetch = fetch  # 地域コードを受け取って天気情報を返すコルーチン関数
+        self.on_update = on_update  # 天気情報を取得するたびに on_update(地域コード, 天気情報) を呼ぶ
+        self.region_codes = list(dict.fromkeys(region_codes))
+        self.rate = rate
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        # これより古い天気情報は返さない（呼び出し側で取得し直してもらう）。省略すると default_max_age()
+        self.max_age = self.default_max_age() if max_age is None else max_age
+
+        self.forecasts = {}  # 地域コード -> 天気情報
+        self.fetched_at = {}  # 地域コード -> 取得したUNIX時刻
+        self.failures = 0  # 連続して失敗した回数
+        self._last_request = None
+        self._future = None
+
+    # 同じ地域を取り直すまでの最長の間隔に余裕を足したもの
+    # 1周（地域数 / rate に揺らぎを足した分）と、周と周の間の待ち（interval に揺らぎを足した分）がかかる。
+    # 1周の時間にはリクエストそのものの時間や少しの backoff も入るので、1周分をもう1回足しておく
+    def default_max_age(self):
+        cycle = len(self.region_codes) * (1 + self.jitter) / self.rate
+        return self.interval * (1 + self.jitter) + 2 * cycle
+
+    # 取得済みの天気情報を返す（まだない・max_age より古ければ None）
+    def get(self, region_code):
+        fetched_at = self.fetched_at.get(region_code)
+        if fetched_at is None or time.time() - fetched_at > self.max_age:
+            return None
+        return self.forecasts.get(region_code)
+
+    # イベントループ上で定期取得を始める（何度呼ばれても1回だけ動く）
+    def start(self, loop):
+        if self._future is None:
+            self._future = asyncio.run_coroutine_threadsafe(self.run(), loop)
+        return self._future
+
+    def stop(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    async def run(self):
+        while True:
+            await self.refresh_all()
+            await asyncio.sleep(self.interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    # すべての地域コードを1周取得する
+    async def refresh_all(self):
+        for region_code in self.region_codes:
+            await self._wait_for_slot()
+            try:
+                data = await self.fetch(region_code)
+            except Exception as e:
+                self.failures += 1
+                log.warning("先読みに失敗しました (%s): %s", region_code, e)
+                continue
+            finally:
+                # 間隔は前のリクエストが終わってから数える（接続に時間がかかっても、サーバに届く間隔が縮まない）
+                self._last_request = time.monotonic()
+            self.failures = 0
+            if data:
+                self.forecasts[region_code] = data
+                self.fetched_at[region_code] = time.time()
+                if self.on_update is not None:
+                    self.on_update(region_code, data)
+
+    # 前回のリクエストが終わってから、レート制限と backoff を守るだけの時間が経つまで待つ
+    # 揺らぎは間隔を広げる方向にだけ加えるので、rate を超えることはない
+    def next_delay(self):
+        backoff = min(2 ** self.failures, self.max_backoff)
+        return backoff / self.rate * (1 + random.uniform(0, self.jitter))
+
+    async def _wait_for_slot(self):
+        if self._last_request is not None:
+            wait = self._last_request + self.next_delay() - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
@@ -0,0 +1,59 @@
+import random
+import time
+
+import httpx
+
+# 気象庁APIへの通信が遅い・落ちているときでも待ち時間が青天井にならないようにする部品
+#   - 失敗したリクエストは揺らぎ付きの指数バックオフで数回だけやり直す
+#   - 同じホストで失敗が続いたら回路を開き、しばらくは通信せずにすぐ失敗させる（サーキットブレーカー）
+
+
+# 回路が開いているので通信しなかった（httpx.HTTPError として扱えるようにしておく）
+class CircuitOpenError(httpx.HTTPError):
+    pass
+
+
+# attempt 回目（0始まり）のやり直しまでの待ち時間
+# base * 2**attempt を上限に 0 からの一様乱数にする（full jitter）ので、一斉にやり直さない
+def backoff_delay(attempt, base=0.2, max_delay=2.0):
+    return random.uniform(0, min(base * 2 ** attempt, max_delay))
+
+
+# ホストごとのサーキットブレーカー
+#   closed:    普通に通信する。failure_threshold 回続けて失敗したら open にする
+#   open:      reset_timeout 秒のあいだは通信せずに CircuitOpenError にする
+#   half_open: reset_timeout 秒たったら1本だけ試し、成功すれば closed、失敗すれば open に戻す
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial = False  # half_open で試しているリクエストがあるか
+
+    # 通信してよいか
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._trial = False
+        if self.state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            self._trial = False
@@ -0,0 +1,96 @@
+from flet import Column, Container, ElevatedButton, Image, Text
+
+
+# 値が変わったときだけ属性を書き換える（変わっていない属性はクライアントに送られない）
+def patch(control, **attrs):
+    changed = False
+    for name, value in attrs.items():
+        if getattr(control, name) != value:
+            setattr(control, name, value)
+            changed = True
+    return changed
+
+
+# 地域ボタンの一覧
+# ボタンは作り直さずに使い回し、文字が変わったものだけ書き換える
+# 画面への反映はこの Column の中の差分だけを送る
+class AreaButtonList(Column):
+    def __init__(self, on_select, button_width=None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_select = on_select  # on_select(e, data) の形で呼ばれる
+        self.button_width = button_width
+        self._region_codes = []
+        self._areas = {}  # 地域コード -> [(ボタンの文字, data), ...]
+
+    # 表示する地域コードの並びを切り替える（中身は set_areas で届いた順に埋める）
+    def set_region(self, region_codes):
+        self._region_codes = list(region_codes)
+        self._areas = {}
+        self._render()
+
+    def set_areas(self, region_code, areas):
+        self._areas[region_code] = list(areas)
+        self._render()
+
+    def _render(self):
+        areas = [area for region_code in self._region_codes for area in self._areas.get(region_code, ())]
+        while len(self.controls) < len(areas):
+            self.controls.append(ElevatedButton(on_click=self._handle_click, width=self.button_width))
+        for button, (text, data) in zip(self.controls, areas):
+            button.data = data
+            patch(button, text=text)
+            if button.visible is False:
+                button.visible = True
+        # 余ったボタンは消さずに隠しておき、次の地域で使い回す
+        for button in self.controls[len(areas):]:
+            if button.visible is not False:
+                button.visible = False
+        if self.page:
+            self.update()
+
+    def _handle_click(self, e):
+        self.on_select(e, e.control.data)
+
+
+# 一日分の天気を表示するカード
+class ForecastCard(Container):
+    def __init__(self):
+        super().__init__(width=150, padding=10, visible=False)
+        self.date_text = Text(size=16)
+        self.icon = Image(width=48, height=48)
+        self.weather_text = Text(size=14)
+        self.content = Column([self.date_text, self.icon, self.weather_text])
+
+    def show(self, date, icon, weather):
+        patch(self.date_text, value=date)
+        patch(self.icon, src=icon)
+        patch(self.weather_text, value=weather)
+        patch(self, visible=True)
+
+
+# 数日分の天気カードとメッセージを並べた表示枠
+# カードは最初に作ったものを使い回し、変わった文字やアイコンだけ書き換える
+class ForecastPanel(Column):
+    def __init__(self, days=3, **kwargs):
+        super().__init__(**kwargs)
+        self.message = Text(visible=False)
+        self.cards = [ForecastCard() for _ in range(days)]
+        self.controls = [self.message, *self.cards]
+
+    # days は (日付, アイコン, 天気) のリスト
+    def show_days(self, days):
+        patch(self.message, visible=False)
+        for i, card in enumerate(self.cards):
+            if i < len(days):
+                card.show(*days[i])
+            else:
+                patch(card, visible=False)
+        if self.page:
+            self.update()
+
+    def show_message(self, message):
+        patch(self.message, value=message, visible=True)
+        for card in self.cards:
+            patch(card, visible=False)
+        if self.page:
+            self.update()
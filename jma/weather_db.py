@@ -0,0 +1,239 @@
+import logging
+import queue
+import sqlite3
+import threading
+
+from metrics import DB_WRITE_SECONDS
+
+log = logging.getLogger(__name__)
+
+# データベースのパスと名前
+db_name = 'weather.db'
+db_path = './'
+
+
+def get_database_file():
+    return db_path + db_name
+
+
+# 現在のスキーマのバージョン（PRAGMA user_version に記録する）
+SCHEMA_VERSION = 1
+
+
+# SQLiteデータベースのセットアップとテーブル作成
+def setup_database(database=None):
+    conn = sqlite3.connect(database or get_database_file())
+    cursor = conn.cursor()
+
+    # 書き込み中でも読み込みを止めないよう WAL モードにする（設定はファイルに残る）
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS weather_reports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        location TEXT NOT NULL,
+        datetime TEXT NOT NULL,
+        weather TEXT
+    )
+    ''')
+    conn.commit()
+
+    migrate_database(conn)
+    conn.close()
+
+
+# 古いスキーマのデータベースを現在のバージョンまで移行する
+def migrate_database(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    with conn:
+        if version < 1:
+            # 同じ地域・日付の重複行は最後に保存されたものだけ残す
+            conn.execute('''
+            DELETE FROM weather_reports
+            WHERE id NOT IN (
+                SELECT MAX(id) FROM weather_reports GROUP BY location, datetime
+            )
+            ''')
+            # (location, datetime) の一意キー。地域ごとの検索と、地域＋期間の検索にも使われる
+            conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_weather_reports_location_datetime
+            ON weather_reports (location, datetime)
+            ''')
+            # 地域を指定しない期間検索用
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_weather_reports_datetime
+            ON weather_reports (datetime)
+            ''')
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+# 検索条件から WHERE 句の条件とパラメータを組み立てる
+def _build_conditions(location, start, end):
+    conditions = []
+    params = []
+    if location is not None:
+        conditions.append('location = ?')
+        params.append(location)
+    if start is not None:
+        conditions.append('datetime >= ?')
+        params.append(start)
+    if end is not None:
+        conditions.append('datetime <= ?')
+        params.append(end)
+    return conditions, params
+
+
+# 天気データを1ページ分だけ読み込む関数
+# (datetime, id) をキーにしたキーセット方式のページ送りで、何ページ目でもインデックスを辿るだけで済む
+# 戻り値は (行のリスト, 次のページのカーソル)。最後のページならカーソルは None
+def fetch_weather_page(after=None, limit=100, location=None, start=None, end=None, descending=False, database=None, conn=None):
+    conditions, params = _build_conditions(location, start, end)
+    if after is not None:
+        conditions.append('(datetime, id) < (?, ?)' if descending else '(datetime, id) > (?, ?)')
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    order = 'DESC' if descending else 'ASC'
+
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(database or get_database_file())
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f'SELECT id, location, datetime, weather FROM weather_reports {where} '
+            f'ORDER BY datetime {order}, id {order} LIMIT ?',
+            params + [limit],
+        )
+        rows = cursor.fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    next_cursor = (rows[-1][2], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_cursor
+
+
+# データベースからデータを読み込む関数
+# 全件をリストにせず、page_size 行ずつ読み込みながら1行ずつ返すジェネレータ
+def fetch_weather_reports(location=None, start=None, end=None, page_size=500, database=None):
+    conn = sqlite3.connect(database or get_database_file())
+    try:
+        after = None
+        while True:
+            rows, after = fetch_weather_page(after, page_size, location, start, end, conn=conn)
+            yield from rows
+            if after is None:
+                break
+    finally:
+        conn.close()
+
+
+# 指定した地域・期間の天気データを日付順に読み込む関数
+# start / end は "YYYY-MM-DD" 形式（両端を含む）。どちらもインデックスの範囲検索で処理される
+def fetch_weather_history(location=None, start=None, end=None, database=None):
+    conditions, params = _build_conditions(location, start, end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = sqlite3.connect(database or get_database_file())
+    cursor = conn.cursor()
+
+    cursor.execute(f'SELECT location, datetime, weather FROM weather_reports {where} ORDER BY datetime, location', params)
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows
+
+
+# 天気データの書き込みをまとめて行うライター
+# 同じ地域・日付の行は上書きされる。save() はキューに積むだけですぐ戻り、バックグラウンドのスレッドが1本の接続で
+# 溜まった行を executemany でまとめてコミットする（UIスレッドが fsync を待たない）
+class WeatherReportWriter:
+    INSERT_SQL = '''
+    INSERT INTO weather_reports (location, datetime, weather)
+    VALUES (?, ?, ?)
+    ON CONFLICT (location, datetime) DO UPDATE SET weather = excluded.weather
+    '''
+
+    def __init__(self, database=None, batch_size=1000, flush_interval=0.05):
+        self.database = database or get_database_file()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.batches_written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="weather-db-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    # 天気データを1行保存する
+    def save(self, location, datetime, weather):
+        self.save_many([(location, datetime, weather)])
+
+    # 天気データを複数行まとめて保存する（過去データの一括投入用）
+    def save_many(self, rows):
+        if self._closed:
+            raise RuntimeError("writer is closed")
+        rows = list(rows)
+        if rows:
+            self.start()
+            self._queue.put(rows)
+
+    # キューに積んだ行がすべて書き込まれるまで待つ
+    def flush(self):
+        self._queue.join()
+
+    # 残りを書き込んでからスレッドを止める
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.database)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL モードではコミットごとの fsync を省いてもデータベースは壊れない
+        conn.execute('PRAGMA synchronous=NORMAL')
+        try:
+            while True:
+                chunks = [self._queue.get()]
+                pending = len(chunks[0]) if chunks[0] else 0
+                stop = chunks[0] is None
+                # 少しだけ待って、続けて届いた行を同じトランザクションにまとめる
+                while not stop and pending < self.batch_size:
+                    try:
+                        chunk = self._queue.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        break
+                    chunks.append(chunk)
+                    if chunk is None:
+                        stop = True
+                    else:
+                        pending += len(chunk)
+                self._write(conn, [row for chunk in chunks if chunk for row in chunk])
+                for _ in chunks:
+                    self._queue.task_done()
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn, rows):
+        if not rows:
+            return
+        try:
+            with DB_WRITE_SECONDS.time(app="jma", table="weather_reports"), conn:
+                conn.executemany(self.INSERT_SQL, rows)
+            self.rows_written += len(rows)
+            self.batches_written += 1
+        except sqlite3.Error as e:
+            log.error("Error saving to database: %s", e)
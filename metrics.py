@@ -0,0 +1,280 @@
+import atexit
+import bisect
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# jma・calculator・trip の各アプリで共通に使う計測とログの仕組み
+# かかった時間をヒストグラム（バケットごとの件数・合計・件数）に記録し、Prometheus のテキスト形式で
+# ファイルに書き出すか、HTTP の /metrics で公開する。記録は1回あたり1マイクロ秒程度
+#
+#   with FETCH_SECONDS.time(app="jma", host=host):
+#       response = await client.get(url)
+#
+#   @UI_UPDATE_SECONDS.timed(app="calculator", event="button")
+#   def button_clicked(self, e): ...
+#
+# 環境変数（アプリの起動時に start_from_env() で読む）
+#   METRICS_FILE=metrics.prom   終了時と METRICS_INTERVAL 秒（既定 60）ごとにファイルへ書き出す
+#   METRICS_PORT=9100           http://127.0.0.1:9100/metrics で公開する
+#   LOG_LEVEL=DEBUG             ログを出すレベル（既定は WARNING）
+#   LOG_SAMPLE=100              頻繁に通る場所の DEBUG・INFO のログは LOG_SAMPLE 回に1回だけ出す
+
+# 秒で測るときのバケットの上限（0.5ミリ秒〜10秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_INTERVAL = 60.0
+DEFAULT_SAMPLE = 100
+
+_metrics = {}  # 名前 -> Histogram / Counter
+_registry_lock = threading.Lock()
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = [*key, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# 時間を測って Histogram に記録する（with 文とデコレータの両方で使える）
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+# ラベル（app="jma" など）の組ごとに、値の分布をバケットごとの件数で持つ
+class Histogram:
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # ラベルの組 -> [バケットごとの件数..., +Inf の件数, 合計]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _labels_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    # 関数（async def も可）の実行時間を記録するデコレータ
+    def timed(self, **labels):
+        def decorator(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    with _Timer(self, labels):
+                        return await function(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with _Timer(self, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ラベルの組ごとの {"count": 件数, "sum": 合計, "buckets": {上限: 累積件数}}
+    def snapshot(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        result = {}
+        for key, values in series.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip((*self.buckets, float("inf")), values[:-1]):
+                cumulative += count
+                buckets[bound] = cumulative
+            result[key] = {"count": cumulative, "sum": values[-1], "buckets": buckets}
+        return result
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.snapshot().items()):
+            for bound, count in data["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', le),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(data['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {data['count']}")
+        return lines
+
+
+# ラベルの組ごとに回数を数える
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+def _register(cls, name, *args):
+    with _registry_lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = cls(name, *args)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"{name} は {type(metric).__name__} として登録されています")
+        return metric
+
+
+# 名前で Histogram を取り出す（なければ作る）
+def histogram(name, help="", buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help, buckets)
+
+
+# 名前で Counter を取り出す（なければ作る）
+def counter(name, help=""):
+    return _register(Counter, name, help)
+
+
+# 各アプリで共通に測るもの（ラベル app でアプリを区別する）
+FETCH_SECONDS = histogram("fetch_seconds", "HTTP で1回取得するのにかかった時間（秒）")
+PARSE_SECONDS = histogram("parse_seconds", "取得した応答・ページの解析にかかった時間（秒）")
+DB_WRITE_SECONDS = histogram("db_write_seconds", "データベースへの書き込みにかかった時間（秒）")
+UI_UPDATE_SECONDS = histogram("ui_update_seconds", "画面のイベントの処理と更新にかかった時間（秒）")
+
+
+# 登録されているすべての値を Prometheus のテキスト形式にする
+def render():
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ファイルに書き出す（書きかけのファイルを読まれないように、別名で書いてから置き換える）
+def write_metrics(path):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(temp_path, path)
+
+
+# http://host:port/metrics で公開するサーバを別スレッドで動かす
+def serve_metrics(port, host="127.0.0.1"):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# 頻繁に通る場所のログを every 回に1回だけ通すフィルタ（呼び出し位置ごとに数える。WARNING 以上は毎回通す）
+class SampleFilter(logging.Filter):
+    def __init__(self, every=DEFAULT_SAMPLE):
+        super().__init__()
+        self.every = every
+        self._counts = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+# DEBUG・INFO のログを間引くロガー
+# 出力しないレベルなら logger.debug(...) はメッセージを組み立てずにすぐ戻るので、print よりずっと軽い
+def sampled_logger(name, every=None):
+    logger = logging.getLogger(name)
+    if not any(isinstance(f, SampleFilter) for f in logger.filters):
+        logger.addFilter(SampleFilter(every or int(os.environ.get("LOG_SAMPLE", DEFAULT_SAMPLE))))
+    return logger
+
+
+_started = False
+
+
+# 環境変数に従ってログの設定と、計測値の書き出し・公開を始める（何度呼んでも1回だけ行う）
+def start_from_env():
+    global _started
+    if _started:
+        return
+    _started = True
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    path = os.environ.get("METRICS_FILE")
+    if path:
+        interval = float(os.environ.get("METRICS_INTERVAL", DEFAULT_INTERVAL))
+        atexit.register(write_metrics, path)
+
+        def write_periodically():
+            while True:
+                time.sleep(interval)
+                try:
+                    write_metrics(path)
+                except OSError as e:
+                    logging.getLogger(__name__).warning("計測値を書き出せませんでした (%s): %s", path, e)
+
+        threading.Thread(target=write_periodically, daemon=True).start()
+    port = os.environ.get("METRICS_PORT")
+    if port:
+        serve_metrics(int(port))
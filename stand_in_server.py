@@ -0,0 +1,87 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 動作確認・計測用のローカルのスタンドインサーバの共通部分
+# 受けたリクエストと接続を数え、別スレッドで動かす。GET の中身はサブクラスの handle_get で返す
+# （jma/jma_local_server.py の LocalJmaServer, trip/his_local_server.py の LocalHisServer）
+
+
+class StandInServer:
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.request_log = []  # (パス, 受信時刻) のリスト
+        self.connections_accepted = 0  # 受け付けたTCP接続の数（keep-alive の効き具合の確認用）
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections_accepted += 1
+
+            def do_GET(self):
+                with server._lock:
+                    server.request_log.append((self.path, time.monotonic()))
+                server.handle_get(self)
+
+            # 本文を付けて応答する（body が None なら本文なし）
+            def reply(self, status, body=None, content_type=None, headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                if content_type:
+                    self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body) if body else 0))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    # リクエストに応答する（handler は BaseHTTPRequestHandler）
+    def handle_get(self, handler):
+        raise NotImplementedError
+
+    # 任意の window 秒間に受けたリクエスト数の最大値（レート制限が守られているかの確認用）
+    def max_requests_in_window(self, window):
+        with self._lock:
+            times = sorted(t for _, t in self.request_log)
+        best = 0
+        first = 0
+        for last, t in enumerate(times):
+            while t - times[first] >= window:
+                first += 1
+            best = max(best, last - first + 1)
+        return best
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# 3つのアプリはどれもパッケージではなく、同じディレクトリのモジュールを直接 import しているので、
+# それぞれのディレクトリとリポジトリ直下（metrics.py, stand_in_server.py）をパスに入れる
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for directory in ("calculator", "trip", "jma", ""):
+    sys.path.insert(0, os.path.normpath(os.path.join(ROOT, directory)))
+
+
+
+# LocalJmaServer に渡す、府県予報区ごとの最小限の天気予報JSON
+# 使い方: LocalJmaServer(forecasts(["130000", "140000"]))
+@pytest.fixture
+def forecasts():
+    def make(office_codes):
+        return {code: [{"publishingOffice": code, "timeSeries": []}] for code in office_codes}
+    return make
@@ -0,0 +1,74 @@
+import importlib.util
+import os
+from types import SimpleNamespace
+
+import flet as ft
+import pytest
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "calculator", "main.py")
+
+
+# calculator/main.py は読み込むとアプリを起動するので、ft.app を止めてから読み込む
+# （jma にも main.py があるので名前を分ける）
+@pytest.fixture(scope="module")
+def calculator_main():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ft, "app", lambda *args, **kwargs: None)
+        spec = importlib.util.spec_from_file_location("calculator_main", MAIN)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return module
+
+
+def press(calculator_main, *buttons):
+    calc = calculator_main.CalculatorApp()
+    for data in buttons:
+        calc.button_clicked(SimpleNamespace(control=SimpleNamespace(data=data)))
+    return calc.result.value
+
+
+@pytest.mark.parametrize("buttons, expected", [
+    # 負の結果に続けて計算しても、符号ごと1つの項として扱う（表示は括弧なし）
+    (("5", "-", "8", "=", "x²", "="), "9"),
+    (("5", "-", "8", "=", "x³", "="), "-27"),
+    (("5", "-", "8", "=", "eˣ", "="), "0.049787068367863944"),
+    (("5", "-", "8", "=", "cos"), "cos((-3))"),
+    (("5", "-", "8", "=", "+/-", "="), "3"),
+    (("5", "-", "8", "=", "+", "1", "="), "-2"),
+    (("3", "-", "5", "="), "-2"),
+    (("3", "-", "5", "=", "+"), "(-2)+"),
+    # 演算子で終わったまま = を押したら、その演算子は無視する
+    (("1", "+", "="), "1"),
+    (("+", "="), "0"),
+    (("2", "*", "3", "xʸ", "="), "6"),
+    (("1", "+", "=", "+", "2", "="), "3"),
+    # +/- のあとも同じ数の続きを入力できる
+    (("1", "+/-", "2"), "(-12)"),
+    (("1", "+/-", "2", "="), "-12"),
+    (("1", "+", "2", "+/-", "5", "="), "-24"),
+    # x² や sin で閉じた項のあとの数字は、掛け算の新しい数になる
+    (("5", "x²", "2"), "5²*2"),
+    (("5", "x²", "2", "="), "50"),
+    (("2", "sin", "3", "="), "2.727892280477045"),
+    (("5", "%", "2", "="), "0.1"),
+    # 先頭の 0 は置き換える
+    (("0", "0", "5"), "5"),
+    (("1", "+", "0", "0", "7", "="), "8"),
+    (("0", ".", "5"), "0.5"),
+    # xʸ のすぐあとの +/- は負の指数を書き始める
+    (("2", "xʸ", "+/-"), "2^(-0)"),
+    (("2", "xʸ", "+/-", "3", "="), "0.125"),
+])
+def test_button_sequences(calculator_main, buttons, expected):
+    assert press(calculator_main, *buttons) == expected
+
+
+@pytest.mark.parametrize("operand, expected", [
+    ("3", "(-3)"),
+    ("(-3)", "3"),
+    ("(-3/4)", "(3/4)"),
+    ("(-(3/4))", "(3/4)"),
+    ("(-sin(2))", "sin(2)"),
+])
+def test_negate(calculator_main, operand, expected):
+    assert calculator_main.negate(operand) == expected
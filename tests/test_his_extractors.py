@@ -0,0 +1,68 @@
+import glob
+import os
+
+import pytest
+
+from extractors import EXTRACTORS
+from his_local_server import sample_pages, search_page
+
+# 取り出し方の違いが出やすいページ（複数クラス・実体参照・入れ子・料金なし・rel="next"・空のページ）と、
+# 元のやり方（soup）で取り出した結果
+EDGE_CASES = {
+    "multi_class_and_entity": (
+        '<div class="card item-wrap__main"><span class="item-wrap__title-ja"> ホテル <b>A</b> &amp; 別館 </span>'
+        '<span class="price--body">12,300</span></div>',
+        ([('ホテルA& 別館', '12,300')], None),
+    ),
+    "nested_and_no_price": (
+        '<div class="item-wrap__main"><span class="item-wrap__title-ja">価格なし</span></div>'
+        '<div class="item-wrap__main"><p><span class="item-wrap__title-ja">入れ子</span></p>'
+        '<span class="price--body"><em>8,000</em></span></div>',
+        ([('入れ子', '8,000')], None),
+    ),
+    "rel_next_before_pager": (
+        '<a rel="nofollow next" href="?page=2">次へ</a>'
+        '<div class="item-wrap__main"><span class="item-wrap__title-ja">B</span><span class="price--body">5,000</span></div>'
+        '<ul class="pager"><li class="pager__item--next"><a href="?page=9">次へ</a></li></ul>',
+        ([('B', '5,000')], '?page=2'),
+    ),
+    "pager_with_entity": (
+        search_page([("C", "7,000")], next_href="/search/0?page=2&amp;sort=price"),
+        ([('C', '7,000')], '/search/0?page=2&sort=price'),
+    ),
+    "empty": ('', ([], None)),
+}
+
+# bench/fixtures.py で記録した本物の検索結果ページ（記録していなければ空）
+RECORDED_PAGES = sorted(glob.glob(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench", "fixtures", "his", "*", "*.html")
+))
+
+# ホテル以外の部分（ヘッダ・絞り込み・スクリプト）が大きい、本物に近いページ
+def generated_pages():
+    pages, _ = sample_pages(['福岡', '佐賀'], pages_per_area=2, hotels_per_page=5, realistic=True)
+    return pages
+
+
+@pytest.mark.parametrize("name", list(EXTRACTORS))
+@pytest.mark.parametrize("case", list(EDGE_CASES))
+def test_extractors_agree_on_edge_cases(name, case):
+    html, expected = EDGE_CASES[case]
+    assert EXTRACTORS[name](html) == expected
+
+
+@pytest.mark.parametrize("name", [name for name in EXTRACTORS if name != 'soup'])
+def test_extractors_agree_on_generated_pages(name):
+    for path, html in generated_pages().items():
+        hotels, next_href = EXTRACTORS[name](html)
+        assert (hotels, next_href) == EXTRACTORS['soup'](html), path
+        assert len(hotels) == 5
+
+
+@pytest.mark.skipif(not RECORDED_PAGES, reason="bench/fixtures/his/ にページが記録されていない")
+@pytest.mark.parametrize("name", [name for name in EXTRACTORS if name != 'soup'])
+def test_extractors_agree_on_recorded_pages(name):
+    for path in RECORDED_PAGES:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        assert EXTRACTORS[name](html) == EXTRACTORS['soup'](html), path
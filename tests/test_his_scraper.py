@@ -0,0 +1,168 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+import pytest
+
+from his_local_server import LocalHisServer, sample_pages
+from his_scraper import (
+    ALL_DATES, SCHEMA_VERSION, UPSERT_HOTEL, HISHotelsScraper, ScrapeEngine, area_price_stats, refresh_area_prices,
+)
+
+AREAS = ['福岡', '佐賀', '長崎', '熊本', '大分', '宮崎', '鹿児島']
+RATE = 10.0
+
+
+def test_scrape_all_keeps_rate_at_the_server(tmp_path):
+    pages, start_pages = sample_pages(AREAS, pages_per_area=3)
+    scraper = HISHotelsScraper(str(tmp_path / "hotels.db"))
+    with LocalHisServer(pages, latency=0.1) as server:
+        hotels = scraper.scrape_all([(server.url + path, area) for path, area in start_pages], rate=RATE)
+
+    assert hotels == len(AREAS) * 3 * 20
+    assert len(server.request_log) == len(AREAS) * 3
+    # 新しい接続を張るリクエストがあっても、届いた時刻で数えてどの1秒間にも RATE 回を超えない
+    assert server.max_requests_in_window(1.0) <= RATE
+    assert server.connections_accepted <= 4
+
+
+
+def test_fetch_keeps_rate_without_trace_events():
+    # MockTransport は httpcore を通らないので trace のイベントが出ない。それでも間隔はあける
+    sent = []
+
+    def handler(request):
+        sent.append(time.monotonic())
+        return httpx.Response(200, text="<html></html>")
+
+    async def run():
+        engine = ScrapeEngine(rate=RATE)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await asyncio.gather(*(engine.fetch(client, "http://his.test/search?page=1") for _ in range(6)))
+
+    asyncio.run(run())
+    assert len(sent) == 6
+    assert sent[-1] - sent[0] >= 5 / RATE * 0.95
+
+
+def test_pages_saved_before_a_failure_are_kept(tmp_path, monkeypatch):
+    db = str(tmp_path / "hotels.db")
+    start = "http://his.test/search/0?checkInDate=20250201&page=1"
+
+    async def crawl(self, urls_and_areas):
+        yield (start, '福岡'), start, [('A', '12,300'), ('B', '8,000')]
+        yield (start, '福岡'), start.replace('page=1', 'page=2'), [('C', '10,000')]
+        raise RuntimeError('parser crashed')
+
+    monkeypatch.setattr(ScrapeEngine, 'crawl', crawl)
+    with pytest.raises(RuntimeError):
+        HISHotelsScraper(db).scrape_all([(start, '福岡')])
+
+    conn = sqlite3.connect(db)
+    try:
+        assert sorted(conn.execute('SELECT name, price, check_in_date FROM hotels')) == [
+            ('A', 12300, '2025-02-01'), ('B', 8000, '2025-02-01'), ('C', 10000, '2025-02-01'),
+        ]
+        # 保存できた分の集計も更新されている
+        assert conn.execute(
+            "SELECT hotel_count, price_min, price_max, dirty FROM area_prices WHERE area = '福岡' AND check_in_date = '*'"
+        ).fetchone() == (3, 8000, 12300, 0)
+    finally:
+        conn.close()
+
+
+def test_migrates_legacy_text_prices(tmp_path):
+    db = str(tmp_path / "hotels.db")
+    conn = sqlite3.connect(db)
+    conn.execute('CREATE TABLE hotels (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, price TEXT, area TEXT)')
+    conn.executemany('INSERT INTO hotels (name, price, area) VALUES (?, ?, ?)', [
+        ('A', '12,300', '福岡'),
+        ('B', '-', '福岡'),
+        ('C', None, '福岡'),
+        ('D', '¥8,000〜', '佐賀'),
+        ('A', '13,000', '福岡'),  # 同じホテルは後から保存された方を残す
+    ])
+    conn.commit()
+    conn.close()
+
+    HISHotelsScraper(db)
+
+    conn = sqlite3.connect(db)
+    try:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert sorted(conn.execute('SELECT name, price, area, check_in_date FROM hotels')) == [
+            ('A', 13000, '福岡', ''), ('B', None, '福岡', ''), ('C', None, '福岡', ''), ('D', 8000, '佐賀', ''),
+        ]
+        assert dict(conn.execute('SELECT name, typeof(price) FROM hotels')) == {
+            'A': 'integer', 'B': 'null', 'C': 'null', 'D': 'integer',
+        }
+        # 料金のないホテルは集計に入らない
+        assert sorted(conn.execute(
+            "SELECT area, hotel_count, price_sum FROM area_prices WHERE check_in_date = '*'"
+        )) == [('佐賀', 1, 8000), ('福岡', 1, 13000)]
+    finally:
+        conn.close()
+
+
+# hotels から直接 GROUP BY で数えた、集計表にあるべき (地域, チェックイン日, 件数, 合計, 最小, 最大)
+def grouped(conn):
+    return sorted(conn.execute(f"""
+        SELECT area, check_in_date, COUNT(*), SUM(price), MIN(price), MAX(price) FROM hotels WHERE price IS NOT NULL
+        GROUP BY area, check_in_date
+        UNION ALL
+        SELECT area, '{ALL_DATES}', COUNT(*), SUM(price), MIN(price), MAX(price) FROM hotels WHERE price IS NOT NULL
+        GROUP BY area
+    """))
+
+
+def test_area_prices_triggers_match_group_by(tmp_path):
+    db = str(tmp_path / "hotels.db")
+    HISHotelsScraper(db)
+    conn = sqlite3.connect(db)
+    steps = [
+        ('insert', UPSERT_HOTEL, [
+            ('A', 12000, '福岡', '2025-02-01'), ('B', 8000, '福岡', '2025-02-01'), ('C', None, '福岡', '2025-02-01'),
+            ('D', 15000, '佐賀', '2025-02-01'), ('A', 11000, '福岡', '2025-02-02'),
+        ]),
+        ('upsert', UPSERT_HOTEL, [('A', 9000, '福岡', '2025-02-01'), ('C', 7000, '福岡', '2025-02-01')]),
+        ('price to NULL', "UPDATE hotels SET price = NULL WHERE name = ? AND check_in_date = ?", [('B', '2025-02-01')]),
+        ('move area', "UPDATE hotels SET area = ? WHERE name = ?", [('佐賀', 'A')]),
+        ('move date', "UPDATE hotels SET check_in_date = ? WHERE name = ?", [('2025-02-03', 'D')]),
+        ('delete', "DELETE FROM hotels WHERE name = ?", [('C',), ('B',)]),
+        ('delete all of an area', "DELETE FROM hotels WHERE area = ?", [('福岡',)]),
+    ]
+    try:
+        for step, sql, rows in steps:
+            with conn:
+                conn.executemany(sql, rows)
+            # 件数と合計はトリガーだけで合っている
+            counted = sorted(conn.execute(
+                'SELECT area, check_in_date, hotel_count, price_sum FROM area_prices WHERE hotel_count > 0'
+            ))
+            assert counted == [row[:4] for row in grouped(conn)], step
+            # 最小・最大は refresh で合う（ホテルがなくなった行は消える）
+            with conn:
+                refresh_area_prices(conn)
+            assert sorted(conn.execute(
+                'SELECT area, check_in_date, hotel_count, price_sum, price_min, price_max FROM area_prices'
+            )) == grouped(conn), step
+    finally:
+        conn.close()
+
+
+def test_area_price_stats_does_not_write(tmp_path):
+    db = str(tmp_path / "hotels.db")
+    HISHotelsScraper(db)
+    conn = sqlite3.connect(db)
+    with conn:
+        conn.execute(UPSERT_HOTEL, ('A', 12000, '福岡', '2025-02-01'))
+    conn.close()
+
+    # 読むだけなので、dirty の行はそのまま（最小などは保存した側の refresh_area_prices で埋める）
+    assert [(row['area'], row['hotel_count'], row['average_price']) for row in area_price_stats(db)] == [('福岡', 1, 12000.0)]
+    conn = sqlite3.connect(db)
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM area_prices WHERE dirty = 1').fetchone()[0] == 2
+    finally:
+        conn.close()
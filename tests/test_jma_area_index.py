@@ -0,0 +1,27 @@
+import os
+
+from area_index import load_area_index
+
+AREA = {
+    "centers": {"010100": {"name": "北海道地方", "children": ["016000"]}},
+    "offices": {"016000": {"name": "石狩・空知・後志地方", "parent": "010100", "children": ["016010"]}},
+    "class10s": {"016010": {"name": "石狩地方", "parent": "016000", "children": []}},
+}
+
+
+def test_index_is_built_once_and_saved_in_the_cache_directory(tmp_path):
+    path = os.path.join(tmp_path, "jma_cache", "area_index.pickle")
+    calls = []
+
+    def fetch_area_list():
+        calls.append(1)
+        return AREA
+
+    index = load_area_index(fetch_area_list, path=path)
+    assert index.regions == {"北海道地方": ["016000"]}
+    assert index.class10_areas("016000") == [("016010", "石狩地方")]
+    assert os.path.exists(path)
+
+    # 2回目は保存した索引を読むので area.json を取得しない
+    assert load_area_index(fetch_area_list, path=path).office_names == {"016000": "石狩・空知・後志地方"}
+    assert len(calls) == 1
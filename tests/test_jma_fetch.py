@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from client import JmaClient
+from fetcher import fetch_all, fetch_concurrently
+from jma_local_server import LocalJmaServer
+
+OFFICES = [f"{n:02d}0000" for n in range(1, 21)]
+LATENCY = 0.1
+
+
+async def fetch_with(server, concurrency):
+    client = JmaClient(base_url=server.url, max_connections=concurrency)
+    try:
+        start = time.perf_counter()
+        results = await fetch_all(OFFICES, client.get_weather_forecast, concurrency)
+        return results, time.perf_counter() - start, client.stats()
+    finally:
+        await client.aclose()
+
+
+def test_fetch_all_keeps_order_and_runs_concurrently(forecasts):
+    with LocalJmaServer(forecasts(OFFICES), latency=LATENCY) as server:
+        results, elapsed, stats = asyncio.run(fetch_with(server, concurrency=5))
+
+    assert [code for code, _ in results] == OFFICES
+    assert [data[0]["publishingOffice"] for _, data in results] == OFFICES
+    # 20件を5並行なら 4回分の遅延で済む（1件ずつなら 2秒かかる）
+    assert elapsed < LATENCY * len(OFFICES) / 2
+    assert stats["requests"] == len(OFFICES)
+
+
+def test_connections_are_reused(forecasts):
+    with LocalJmaServer(forecasts(OFFICES), latency=LATENCY) as server:
+        asyncio.run(fetch_with(server, concurrency=4))
+        # 同時に使う数を超えて接続を張らない（1リクエストごとに新しい接続を作っていない）
+        assert server.connections_accepted <= 4
+
+
+def test_fetch_concurrently_yields_in_completion_order_and_limits_concurrency():
+    running = 0
+    peak = 0
+
+    async def fetch(code):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05 if code == OFFICES[0] else 0.01)
+        running -= 1
+        return code
+
+    async def collect():
+        return [code async for code, _ in fetch_concurrently(OFFICES[:6], fetch, concurrency=3)]
+
+    order = asyncio.run(collect())
+    assert sorted(order) == sorted(OFFICES[:6])
+    assert order[-1] == OFFICES[0]  # 遅いものは最後に届く
+    assert peak == 3
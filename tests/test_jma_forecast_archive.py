@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+import forecast_archive
+from forecast_archive import MISSING, ForecastArchive, publication_rows, to_day, to_timestamp
+
+AREA = "130010"
+STATION = "44132"
+
+
+# 1回の発表の天気予報JSON（short, weekly は [(日付, 天気コード[, 降水確率])], temps は [(日付, 最低, 最高)]）
+def publication(report, short, weekly=(), temps=()):
+    return [
+        {
+            "reportDatetime": report,
+            "timeSeries": [{
+                "timeDefines": [f"{date}T00:00:00+09:00" for date, _ in short],
+                "areas": [{"area": {"name": "東京地方", "code": AREA}, "weatherCodes": [code for _, code in short]}],
+            }],
+        },
+        {
+            "reportDatetime": report,
+            "timeSeries": [
+                {
+                    "timeDefines": [f"{date}T00:00:00+09:00" for date, _, _ in weekly],
+                    "areas": [{
+                        "area": {"name": "東京都", "code": AREA},
+                        "weatherCodes": [code for _, code, _ in weekly],
+                        "pops": [pop for _, _, pop in weekly],
+                    }],
+                },
+                {
+                    "timeDefines": [f"{date}T00:00:00+09:00" for date, _, _ in temps],
+                    "areas": [{
+                        "area": {"name": "東京", "code": STATION},
+                        "tempsMin": [temp_min for _, temp_min, _ in temps],
+                        "tempsMax": [temp_max for _, _, temp_max in temps],
+                    }],
+                },
+            ],
+        },
+    ]
+
+
+def day(date):
+    return to_day(to_timestamp(f"{date}T00:00:00+09:00"))
+
+
+def test_publication_rows_prefers_short_term_and_fills_with_weekly():
+    weather, temps = publication_rows(publication(
+        "2025-02-01T11:00:00+09:00",
+        short=[("2025-02-01", "100"), ("2025-02-02", "200")],
+        weekly=[("2025-02-02", "300", "70"), ("2025-02-03", "400", "")],
+        temps=[("2025-02-02", "", ""), ("2025-02-03", "-2", "5")],
+    ))
+
+    assert (weather["issued"] == to_timestamp("2025-02-01T11:00:00+09:00")).all()
+    assert weather["target"].tolist() == [day("2025-02-01"), day("2025-02-02"), day("2025-02-03")]
+    assert weather["area"].tolist() == [int(AREA)] * 3
+    # 短期予報にある日は短期予報の天気（降水確率なし）、4日目以降だけ週間予報から
+    assert weather["code"].tolist() == [100, 200, 400]
+    assert weather["pop"].tolist() == [MISSING, MISSING, MISSING]
+    # 最低・最高がどちらも空の日は入れない
+    assert temps["target"].tolist() == [day("2025-02-03")]
+    assert (temps["temp_min"].tolist(), temps["temp_max"].tolist()) == ([-2], [5])
+    assert {name: values.dtype for name, values in weather.items()} == forecast_archive.WEATHER_COLUMNS
+
+
+def test_same_publication_is_archived_once(tmp_path):
+    data = publication("2025-02-01T11:00:00+09:00", short=[("2025-02-01", "100")])
+    archive = ForecastArchive(str(tmp_path))
+    assert archive.add("130000", data)
+    assert not archive.add("130000", data)  # 書き出し待ちのもの
+    archive.flush()
+    assert not archive.add("130000", data)  # 保存済みのもの
+    # 別に開いても保存済みの発表は分かる
+    assert not ForecastArchive(str(tmp_path)).add("130000", data)
+    assert len(archive.weather("130000")["issued"]) == 1
+    assert not archive.add("130000", [{"reportDatetime": "broken"}])
+
+
+def test_compaction_keeps_rows_in_issued_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecast_archive, "MAX_CHUNKS", 3)
+    archive = ForecastArchive(str(tmp_path))
+    # 発表の古い順に届くとは限らない
+    for hour in (17, 5, 11, 23):
+        archive.add("130000", publication(f"2025-02-01T{hour:02d}:00:00+09:00", short=[("2025-02-01", str(100 + hour))]))
+        archive.flush()
+
+    assert len(archive._chunks("130000")) == 1
+    weather = archive.weather("130000")
+    assert weather["code"].tolist() == [105, 111, 117, 123]
+    assert np.all(np.diff(weather["issued"]) > 0)
+    # 期間の絞り込み
+    start, end = to_timestamp("2025-02-01T10:00:00+09:00"), to_timestamp("2025-02-01T18:00:00+09:00")
+    assert archive.weather("130000", start, end)["code"].tolist() == [111, 117]
+
+    archive.add("130000", publication("2025-02-02T05:00:00+09:00", short=[("2025-02-02", "300")]))
+    archive.flush()
+    archive.compact("130000")
+    assert len(archive._chunks("130000")) == 1
+    assert ForecastArchive(str(tmp_path)).weather("130000")["code"].tolist() == [105, 111, 117, 123, 300]
+
+
+def test_accuracy_by_lead_day(tmp_path):
+    archive = ForecastArchive(str(tmp_path))
+    # 2月5日の予報を2日前・前日・当日（正解）に発表する
+    for report, code, temp_min, temp_max in [
+        ("2025-02-03T11:00:00+09:00", "200", "1", "10"),
+        ("2025-02-04T11:00:00+09:00", "101", "2", "8"),
+        ("2025-02-05T05:00:00+09:00", "100", "3", "9"),
+    ]:
+        archive.add("130000", publication(
+            report, short=[("2025-02-05", code)], temps=[("2025-02-05", temp_min, temp_max)],
+        ))
+    # 対象の期間の外の日は数えない
+    archive.add("130000", publication("2025-02-01T11:00:00+09:00", short=[("2025-02-04", "300")]))
+    archive.add("130000", publication("2025-02-04T05:00:00+09:00", short=[("2025-02-04", "100")]))
+    archive.flush()
+
+    rows = archive.accuracy("130000", "2025-02-05T00:00:00+09:00", "2025-02-06T00:00:00+09:00")
+    assert rows == [
+        # 天気は百の位（晴れ・くもり・雨・雪）で比べるので、101 は 100 と一致
+        {"lead": 1, "count": 1, "weather_hit_rate": 1.0, "temp_min_mae": 1.0, "temp_max_mae": 1.0},
+        {"lead": 2, "count": 1, "weather_hit_rate": 0.0, "temp_min_mae": 2.0, "temp_max_mae": 1.0},
+    ]
+    assert archive.accuracy("130000", "2025-03-01T00:00:00+09:00", "2025-03-02T00:00:00+09:00") == []
+
+
+@pytest.mark.parametrize("temp_min, temp_max, expected", [
+    ("", "9", (None, 1.0)),
+    ("3", "", (1.0, None)),
+])
+def test_accuracy_skips_missing_temperatures(tmp_path, temp_min, temp_max, expected):
+    archive = ForecastArchive(str(tmp_path))
+    archive.add("130000", publication(
+        "2025-02-04T11:00:00+09:00", short=[("2025-02-05", "100")], temps=[("2025-02-05", temp_min, temp_max)],
+    ))
+    archive.add("130000", publication(
+        "2025-02-05T05:00:00+09:00", short=[("2025-02-05", "100")], temps=[("2025-02-05", "2", "8")],
+    ))
+    archive.flush()
+    row, = archive.accuracy("130000", "2025-02-05T00:00:00+09:00", "2025-02-06T00:00:00+09:00")
+    assert (row["temp_min_mae"], row["temp_max_mae"]) == expected
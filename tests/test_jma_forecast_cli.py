@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+import forecast_cli
+from forecast_core import collect_forecasts, weekly_temperatures
+from jma_local_server import LocalJmaServer
+
+WEEKLY = {
+    "timeSeries": [
+        {"timeDefines": [], "areas": []},
+        {
+            "timeDefines": ["2025-02-01T00:00:00+09:00", "2025-02-02T00:00:00+09:00"],
+            "areas": [
+                {"area": {"name": "札幌", "code": "14163"}, "tempsMin": ["", "-5"], "tempsMax": ["", "1"]},
+                {"area": {"name": "函館", "code": "23232"}, "tempsMin": ["", "-3"], "tempsMax": ["", "3"]},
+            ],
+        },
+    ]
+}
+FORECAST = [{"publishingOffice": "札幌管区気象台", "timeSeries": [{"timeDefines": [], "areas": []}]}, WEEKLY]
+# 地域と短期予報の気温の地点が同じ順に並ぶ（週間予報の地点は別の順）
+SHORT = {
+    "publishingOffice": "札幌管区気象台",
+    "timeSeries": [
+        {
+            "timeDefines": ["2025-02-01T05:00:00+09:00", "2025-02-02T00:00:00+09:00", "2025-02-03T00:00:00+09:00"],
+            "areas": [
+                {"area": {"name": "渡島地方", "code": "017010"}, "weathers": ["晴れ", "くもり", "雪"], "weatherCodes": ["100", "200", "400"]},
+                {"area": {"name": "石狩地方", "code": "016010"}, "weathers": ["雪", "雪", "晴れ"], "weatherCodes": ["400", "400", "100"]},
+            ],
+        },
+        {"timeDefines": [], "areas": []},
+        {
+            "timeDefines": ["2025-02-01T09:00:00+09:00"],
+            "areas": [
+                {"area": {"name": "函館", "code": "23232"}, "temps": ["2"]},
+                {"area": {"name": "札幌", "code": "14163"}, "temps": ["0"]},
+            ],
+        },
+    ],
+}
+AREA = {"centers": {"010100": {"name": "北海道地方", "children": ["016000"]}}, "offices": {"016000": {"name": "石狩"}}}
+
+
+def test_weekly_temperatures_match_station_to_area_by_date():
+    temps = weekly_temperatures([SHORT, WEEKLY])
+    assert temps == {
+        "017010": {"2025-02-01": ("", ""), "2025-02-02": ("3", "-3")},
+        "016010": {"2025-02-01": ("", ""), "2025-02-02": ("1", "-5")},
+    }
+    # 短期予報の日付（時刻付き）からそのまま引ける
+    assert temps["016010"][SHORT["timeSeries"][0]["timeDefines"][1][:10]] == ("1", "-5")
+    assert "2025-02-03" not in temps["016010"]
+
+
+def test_weekly_temperatures_without_station_match():
+    assert weekly_temperatures([SHORT]) == {}
+    assert weekly_temperatures(FORECAST) == {}
+    # 地域と地点の数が合わないときは、どの地点か分からないので使わない
+    short = {"timeSeries": [SHORT["timeSeries"][0], SHORT["timeSeries"][1], {"timeDefines": [], "areas": SHORT["timeSeries"][2]["areas"][:1]}]}
+    assert weekly_temperatures([short, WEEKLY]) == {}
+
+
+@pytest.mark.parametrize("result, error", [
+    (None, "no data"),
+    ([], "no data"),
+    (httpx.ConnectError("connection refused"), "connection refused"),
+    (httpx.ReadTimeout(""), "ReadTimeout('')"),
+])
+def test_collect_forecasts_error_text(result, error):
+    async def fetch(office_code):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def collect():
+        return [record async for record in collect_forecasts(fetch, ["016000"])]
+
+    assert asyncio.run(collect()) == [{"office_code": "016000", "error": error}]
+
+
+def test_cli_writes_one_line_per_office_and_closes_client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # 地域の索引・キャッシュは作業ディレクトリに作られる
+    closed = []
+    original = forecast_cli.JmaClient.aclose
+
+    async def aclose(self):
+        closed.append(self)
+        await original(self)
+
+    monkeypatch.setattr(forecast_cli.JmaClient, "aclose", aclose)
+    output = os.path.join(tmp_path, "forecasts.jsonl")
+    with LocalJmaServer({"016000": FORECAST}, area=AREA) as server:
+        forecast_cli.main([
+            "--base-url", server.url, "--no-cache", "--offices", "016000", "999999", "--output", output,
+        ])
+    with open(output, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["office_code"] for record in sorted(records, key=lambda r: r["office_code"])] == ["016000", "999999"]
+    assert "error" in next(record for record in records if record["office_code"] == "999999")
+    assert len(closed) == 1
+
+
+def test_dump_forecasts_awaits_async_write(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # --serve では送信をイベントループの外で行うコルーチン関数を write に渡す
+    lines = []
+
+    async def write(line):
+        await asyncio.sleep(0)
+        lines.append(json.loads(line))
+
+    async def run(server):
+        client = forecast_cli.JmaClient(base_url=server.url)
+        try:
+            return await forecast_cli.dump_forecasts(client, write, ["016000"])
+        finally:
+            await client.aclose()
+
+    with LocalJmaServer({"016000": FORECAST}, area=AREA) as server:
+        assert asyncio.run(run(server)) == 1
+    assert lines[0]["office_code"] == "016000"
+    assert lines[0]["office_name"] == "石狩"
+
+
+def test_cli_keeps_area_index_in_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache_dir = tmp_path / "other_cache"
+    with LocalJmaServer({"016000": FORECAST}, area=AREA) as server:
+        forecast_cli.main([
+            "--base-url", server.url, "--cache-dir", str(cache_dir), "--output", str(tmp_path / "out.jsonl"),
+        ])
+    assert (cache_dir / "area_index.pickle").exists()
+    assert not (tmp_path / "jma_cache").exists()
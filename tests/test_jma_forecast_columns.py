@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from forecast_columns import forecast_columns, rain_probability_map
+
+TIMES = [
+    "2025-02-01T12:00:00+09:00", "2025-02-01T18:00:00+09:00",
+    "2025-02-02T00:00:00+09:00", "2025-02-02T06:00:00+09:00",
+]
+FORECAST = [{
+    "timeSeries": [
+        {"timeDefines": [], "areas": []},
+        {"timeDefines": TIMES, "areas": [
+            {"area": {"name": "東京地方", "code": "130010"}, "pops": ["10", "20", "70", "30"]},
+            {"area": {"name": "伊豆諸島北部", "code": "130020"}, "pops": ["50", "0", "", "10"]},
+        ]},
+    ],
+}]
+
+
+@pytest.mark.parametrize("since, until", [
+    ("2025-02-01 18:00", "2025-02-02 00:00"),  # タイムゾーンなし（日本時間とみなす）
+    (datetime(2025, 2, 1, 18), datetime(2025, 2, 2)),
+    ("2025-02-01T18:00:00+09:00", "2025-02-02T00:00:00+09:00"),
+    ("2025-02-01T09:00:00Z", "2025-02-01T15:00:00Z"),
+    (datetime(2025, 2, 1, 18, tzinfo=timezone(timedelta(hours=9))), datetime(2025, 2, 1, 15, tzinfo=timezone.utc)),
+])
+def test_rain_probability_map_accepts_naive_and_aware_bounds(since, until):
+    pops = rain_probability_map(forecast_columns([("130000", FORECAST)]), since, until)
+    assert pops.to_dict() == {"130010": 20.0, "130020": 0.0}
+
+
+def test_rain_probability_map_without_bounds():
+    pops = rain_probability_map(forecast_columns([("130000", FORECAST)]))
+    assert pops.to_dict() == {"130010": 70.0, "130020": 50.0}
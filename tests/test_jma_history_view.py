@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import history_view
+from history_view import HistoryView
+
+
+def test_show_async_reads_off_the_loop_and_updates_on_it(monkeypatch):
+    threads = {}
+
+    def fetch_weather_page(after=None, limit=100, location=None, descending=False, **kwargs):
+        threads["fetch"] = threading.current_thread()
+        if after is None:
+            return [(2, location, "2025-02-02", "晴れ"), (1, location, "2025-02-01", "雨")], ("2025-02-01", 1)
+        return [(0, location, "2025-01-31", "雪")], None
+
+    monkeypatch.setattr(history_view, "fetch_weather_page", fetch_weather_page)
+    monkeypatch.setattr(HistoryView, "update", lambda self: threads.setdefault("update", threading.current_thread()))
+    view = HistoryView(page_size=2)
+
+    async def show():
+        threads["loop"] = threading.current_thread()
+        await view.show_async("東京")
+
+    asyncio.run(show())
+    assert threads["fetch"] is not threads["loop"]
+    assert threads["update"] is threads["loop"]
+    assert [text.value for text in view.controls] == ["2025-02-02 の天気: 晴れ", "2025-02-01 の天気: 雨"]
+
+    view.load_more()
+    view.load_more()  # 最後まで読んだ後は何もしない
+    assert len(view.controls) == 3 and view.exhausted
+
+    # 地域を切り替えると1ページ目から表示し直す
+    asyncio.run(view.show_async("大阪"))
+    assert [text.value for text in view.controls] == ["2025-02-02 の天気: 晴れ", "2025-02-01 の天気: 雨"]
+    assert view.location == "大阪" and not view.exhausted
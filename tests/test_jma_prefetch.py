@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from client import JmaClient
+from jma_local_server import LocalJmaServer
+from prefetch import ForecastPrefetcher
+
+OFFICES = [f"{n:02d}0000" for n in range(1, 26)]
+RATE = 10.0
+
+
+async def refresh(server, region_codes, client_options=None, **options):
+    client = JmaClient(base_url=server.url, **(client_options or {}))
+    try:
+        prefetcher = ForecastPrefetcher(client.get_weather_forecast, region_codes, **options)
+        await prefetcher.refresh_all()
+        return prefetcher
+    finally:
+        await client.aclose()
+
+
+def test_prefetch_respects_rate_limit(forecasts):
+    with LocalJmaServer(forecasts(OFFICES)) as server:
+        prefetcher = asyncio.run(refresh(server, OFFICES, rate=RATE))
+        assert len(server.request_log) == len(OFFICES)
+        assert server.max_requests_in_window(1.0) <= RATE
+        assert server.max_requests_in_window(0.5) <= RATE / 2
+    assert all(prefetcher.get(code) for code in OFFICES)
+
+
+def test_prefetch_backs_off_after_failures(forecasts):
+    # 半分のリクエストが 503 になるときは、失敗のたびに間隔が広がる
+    offices = OFFICES[:10]
+    with LocalJmaServer(forecasts(OFFICES), error_rate=0.5, seed=3) as server:
+        start = time.monotonic()
+        prefetcher = asyncio.run(refresh(server, offices, {"retries": 0}, rate=RATE, max_backoff=4))
+        elapsed = time.monotonic() - start
+        failures = server.faults["error"]
+        assert failures > 0
+        assert server.max_requests_in_window(1.0) <= RATE
+    # 失敗がなければ 9 回の間隔（0.9秒）で終わる。最後のリクエスト以外の失敗はそれぞれ間隔を 1/RATE 以上広げる
+    assert elapsed >= (len(offices) - 1 + failures - 1) / RATE
+    assert len(prefetcher.forecasts) == len(offices) - failures
+
+
+def test_prefetched_forecast_stays_fresh_across_a_full_cycle():
+    # 1周に 5地域 / 20回毎秒 + α、周の間に 0.2秒前後待つので、同じ地域は 0.5秒ほどおきに取り直される
+    async def fetch(region_code):
+        await asyncio.sleep(0.01)
+        return [{"publishingOffice": region_code}]
+
+    async def run():
+        prefetcher = ForecastPrefetcher(fetch, OFFICES[:5], rate=20.0, interval=0.2)
+        task = asyncio.ensure_future(prefetcher.run())
+        try:
+            await asyncio.sleep(0.5)  # 1周目が終わるまで
+            missing = 0
+            for _ in range(150):  # 3周分くらい
+                missing += sum(prefetcher.get(code) is None for code in OFFICES[:5])
+                await asyncio.sleep(0.01)
+            return prefetcher, missing
+        finally:
+            task.cancel()
+
+    prefetcher, missing = asyncio.run(run())
+    assert missing == 0
+    assert prefetcher.max_age > prefetcher.interval
+
+
+def test_get_returns_none_for_stale_data():
+    prefetcher = ForecastPrefetcher(None, ["010000"], interval=60, max_age=60)
+    prefetcher.forecasts["010000"] = [{"timeSeries": []}]
+    prefetcher.fetched_at["010000"] = time.time() - 30
+    assert prefetcher.get("010000") is not None
+    prefetcher.fetched_at["010000"] = time.time() - 61
+    assert prefetcher.get("010000") is None
+    assert prefetcher.get("020000") is None
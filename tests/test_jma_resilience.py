@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from cache import ForecastCache
+from client import JmaClient
+from jma_local_server import LocalJmaServer
+from resilience import CircuitOpenError
+
+OFFICES = [f"{n:02d}0000" for n in range(1, 11)]
+TIMEOUT = 0.2
+BACKOFF = 0.05
+MAX_BACKOFF = 0.1
+
+
+def make_client(server, **options):
+    options = {"timeout": TIMEOUT, "backoff": BACKOFF, "max_backoff": MAX_BACKOFF, **options}
+    return JmaClient(base_url=server.url, **options)
+
+
+def test_retry_then_success(forecasts):
+    retries = 5
+
+    async def fetch_each(server):
+        client = make_client(server, retries=retries, failure_threshold=100)
+        try:
+            results, elapsed = [], []
+            for code in OFFICES:
+                start = time.perf_counter()
+                results.append(await client.get_weather_forecast(code))
+                elapsed.append(time.perf_counter() - start)
+            return results, elapsed, client.retry_count
+        finally:
+            await client.aclose()
+
+    with LocalJmaServer(forecasts(OFFICES), error_rate=0.2, reset_rate=0.1, hang_rate=0.1, hang_time=1.0, seed=17) as server:
+        results, elapsed, retry_count = asyncio.run(fetch_each(server))
+
+    assert [data[0]["publishingOffice"] for data in results] == OFFICES
+    # 503・切断・無応答のどれも起きていて、やり直しで全部取れている
+    assert all(server.faults.values())
+    assert retry_count == sum(server.faults.values())
+    # 1件あたり、毎回タイムアウトしても「タイムアウト + バックオフ」を retries 回重ねたより長くはかからない
+    assert max(elapsed) < (retries + 1) * TIMEOUT + retries * MAX_BACKOFF + 0.5
+
+
+def test_circuit_breaker_opens_and_recovers_through_half_open_probe(forecasts):
+    threshold = 3
+    reset_timeout = 0.3
+
+    async def run(server):
+        client = make_client(server, retries=0, failure_threshold=threshold, reset_timeout=reset_timeout)
+        try:
+            for _ in range(threshold):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.get_weather_forecast(OFFICES[0])
+            breaker = client.breakers["127.0.0.1"]
+            assert breaker.state == "open"
+
+            # 回路が開いている間はサーバに届かず、すぐに失敗する
+            sent = len(server.request_log)
+            start = time.perf_counter()
+            with pytest.raises(CircuitOpenError):
+                await client.get_weather_forecast(OFFICES[0])
+            assert time.perf_counter() - start < 0.05
+            assert len(server.request_log) == sent
+
+            # サーバが直ってから reset_timeout 秒たつと、1本だけ試して閉じる
+            server.error_rate = 0.0
+            await asyncio.sleep(reset_timeout)
+            start = time.perf_counter()
+            data = await client.get_weather_forecast(OFFICES[0])
+            assert time.perf_counter() - start < TIMEOUT
+            assert len(server.request_log) == sent + 1
+            assert breaker.state == "closed"
+            assert breaker.times_opened == 1
+            return data
+        finally:
+            await client.aclose()
+
+    with LocalJmaServer(forecasts(OFFICES), error_rate=1.0) as server:
+        data = asyncio.run(run(server))
+
+    assert data[0]["publishingOffice"] == OFFICES[0]
+    assert server.faults["error"] == threshold
+
+
+@pytest.mark.parametrize("fault", ["error_rate", "reset_rate", "hang_rate"])
+def test_cache_serves_stale_copy_when_revalidation_fails(tmp_path, fault, forecasts):
+    deadline = 0.5
+
+    async def run(server):
+        client = make_client(server, retries=1, deadline=deadline)
+        cache = ForecastCache(client, cache_dir=str(tmp_path))
+        try:
+            fresh = await cache.get_weather_forecast(OFFICES[0])
+            # 有効期限を切らしてから、サーバを壊す
+            cache._entries[f"forecast_{OFFICES[0]}"]["expires_at"] = 0
+            setattr(server, fault, 1.0)
+            start = time.perf_counter()
+            stale = await cache.get_weather_forecast(OFFICES[0])
+            return fresh, stale, time.perf_counter() - start, cache.stats()
+        finally:
+            await client.aclose()
+
+    with LocalJmaServer(forecasts(OFFICES), hang_time=2.0) as server:
+        fresh, stale, elapsed, stats = asyncio.run(run(server))
+
+    assert stale == fresh
+    assert stats["stale_served"] == 1
+    assert sum(server.faults.values()) >= 1
+    # サーバが応答しなくても deadline 秒で打ち切って古い内容を返す
+    assert elapsed < deadline + 0.2
+
+
+@pytest.mark.parametrize("cancel", ["deadline", "task"])
+def test_cancelled_half_open_trial_does_not_keep_circuit_open(cancel, forecasts):
+    reset_timeout = 0.2
+    deadline = 0.3
+
+    async def run(server):
+        client = make_client(server, retries=0, failure_threshold=1, reset_timeout=reset_timeout, deadline=deadline,
+                             timeout=5.0)
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.get_weather_forecast(OFFICES[0])
+            breaker = client.breakers["127.0.0.1"]
+            assert breaker.state == "open"
+
+            # half_open の試しのリクエストが応答しないうちに取り消される
+            server.error_rate, server.hang_rate = 0.0, 1.0
+            await asyncio.sleep(reset_timeout)
+            if cancel == "deadline":
+                with pytest.raises(httpx.TimeoutException):
+                    await client.get_weather_forecast(OFFICES[0])
+            else:
+                task = asyncio.ensure_future(client.get_weather_forecast(OFFICES[0]))
+                await asyncio.sleep(0.1)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+            assert breaker.state == "open"
+
+            # サーバが直れば、次の試しで閉じる
+            server.hang_rate = 0.0
+            await asyncio.sleep(reset_timeout)
+            start = time.perf_counter()
+            data = await client.get_weather_forecast(OFFICES[0])
+            assert time.perf_counter() - start < TIMEOUT
+            assert breaker.state == "closed"
+            return data
+        finally:
+            await client.aclose()
+
+    with LocalJmaServer(forecasts(OFFICES), error_rate=1.0, hang_time=1.0) as server:
+        data = asyncio.run(run(server))
+
+    assert data[0]["publishingOffice"] == OFFICES[0]
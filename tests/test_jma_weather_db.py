@@ -0,0 +1,134 @@
+import sqlite3
+
+import pytest
+
+from weather_db import (
+    SCHEMA_VERSION, WeatherReportWriter, fetch_weather_history, fetch_weather_page, fetch_weather_reports, setup_database,
+)
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "weather.db")
+    setup_database(path)
+    return path
+
+
+def test_writer_batches_queued_rows(database):
+    # 続けて積んだ行は batch_size に達するまで1つのトランザクションにまとめる
+    writer = WeatherReportWriter(database=database, batch_size=10, flush_interval=0.5)
+    for n in range(5):
+        writer.save_many([(f"地域{n}", f"2025-02-0{day}", "晴れ") for day in range(1, 5)])
+    writer.flush()
+    assert (writer.rows_written, writer.batches_written) == (20, 2)
+    assert len(fetch_weather_history(database=database)) == 20
+    writer.close()
+
+
+def test_flush_and_close(database):
+    writer = WeatherReportWriter(database=database, flush_interval=0.01)
+    writer.save("東京", "2025-02-01", "晴れ")
+    writer.flush()
+    assert fetch_weather_history(database=database) == [("東京", "2025-02-01", "晴れ")]
+
+    # close は積んだ行を書き込んでから止まる
+    writer.save("東京", "2025-02-02", "くもり")
+    writer.close()
+    writer.close()
+    assert len(fetch_weather_history(database=database)) == 2
+    with pytest.raises(RuntimeError):
+        writer.save("東京", "2025-02-03", "雨")
+
+    # 何も保存しなければスレッドは作らない
+    idle = WeatherReportWriter(database=database)
+    idle.flush()
+    idle.close()
+    assert idle._thread is None
+
+
+def test_same_location_and_date_is_updated(database):
+    writer = WeatherReportWriter(database=database, flush_interval=0.01)
+    writer.save_many([("東京", "2025-02-01", "晴れ"), ("大阪", "2025-02-01", "雨")])
+    writer.save("東京", "2025-02-01", "雪")
+    writer.close()
+    assert fetch_weather_history(database=database) == [("大阪", "2025-02-01", "雨"), ("東京", "2025-02-01", "雪")]
+    assert writer.rows_written == 3
+
+
+def test_migration_removes_duplicates_and_adds_unique_key(tmp_path):
+    path = str(tmp_path / "weather.db")
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE weather_reports (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, location TEXT NOT NULL, datetime TEXT NOT NULL, weather TEXT
+    )
+    ''')
+    conn.executemany('INSERT INTO weather_reports (location, datetime, weather) VALUES (?, ?, ?)', [
+        ("東京", "2025-02-01", "晴れ"),
+        ("東京", "2025-02-01", "くもり"),
+        ("大阪", "2025-02-01", "雨"),
+        ("東京", "2025-02-01", "雪"),  # 最後に保存されたものが残る
+        ("東京", "2025-02-02", "晴れ"),
+    ])
+    conn.commit()
+    conn.close()
+
+    setup_database(path)
+    setup_database(path)  # 2回目は何もしない
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute('SELECT id, location, datetime, weather FROM weather_reports ORDER BY id').fetchall() == [
+            (3, "大阪", "2025-02-01", "雨"), (4, "東京", "2025-02-01", "雪"), (5, "東京", "2025-02-02", "晴れ"),
+        ]
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO weather_reports (location, datetime, weather) VALUES ('東京', '2025-02-01', '雨')")
+    finally:
+        conn.close()
+
+
+# 同じ日付の行が地域をまたいで並ぶ（ページの境目に同じ日付がくる）データ
+ROWS = [
+    ("東京", "2025-02-01", "晴れ"), ("大阪", "2025-02-01", "雨"), ("札幌", "2025-02-01", "雪"),
+    ("東京", "2025-02-02", "くもり"), ("大阪", "2025-02-02", "晴れ"),
+    ("東京", "2025-02-03", "雨"), ("札幌", "2025-02-03", "雪"),
+]
+
+
+@pytest.fixture
+def reports(database):
+    conn = sqlite3.connect(database)
+    with conn:
+        conn.executemany('INSERT INTO weather_reports (location, datetime, weather) VALUES (?, ?, ?)', ROWS)
+    expected = conn.execute('SELECT id, location, datetime, weather FROM weather_reports ORDER BY datetime, id').fetchall()
+    conn.close()
+    return database, expected
+
+
+def walk(database, limit, **conditions):
+    pages, after = [], None
+    while True:
+        rows, after = fetch_weather_page(after, limit, database=database, **conditions)
+        pages.append(rows)
+        if after is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 10])
+@pytest.mark.parametrize("descending", [False, True])
+def test_keyset_pages_cover_every_row_once(reports, limit, descending):
+    database, expected = reports
+    pages = walk(database, limit, descending=descending)
+    assert [row for page in pages for row in page] == (expected[::-1] if descending else expected)
+    # 最後のページ以外は limit 行ちょうど。行数が limit で割り切れるときは、最後に空のページを読んで終わる
+    assert all(len(page) == limit for page in pages[:-1])
+    assert len(pages[-1]) == len(expected) % limit
+
+
+def test_keyset_pages_with_conditions(reports):
+    database, expected = reports
+    pages = walk(database, 2, location="東京", start="2025-02-02", descending=True)
+    assert [row[1:] for page in pages for row in page] == [("東京", "2025-02-03", "雨"), ("東京", "2025-02-02", "くもり")]
+    assert fetch_weather_page(limit=5, location="名古屋", database=database) == ([], None)
+    assert list(fetch_weather_reports(page_size=2, database=database)) == expected
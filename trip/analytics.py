@@ -0,0 +1,218 @@
+import argparse
+import io
+import os
+import re
+import sqlite3
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import repo_path  # noqa: F401
+from his_scraper import ALL_DATES
+
+# ホテルの平均料金と観光来訪者数の関係を調べる
+# ホテルの料金は hotels.db の地域ごとの集計表（area_prices）から読み、観光来訪者数の CSV は
+# 都道府県の行の候補だけを先に選び、必要な列だけを型を指定して読む。CSV が複数あるときは
+# プロセスプールで並行して読む。県名は「福岡」「福岡県」のどちらでも同じキーになるようにそろえて結合する
+#
+#   python analytics.py hotels.db pref202312.csv pref202412.csv             # チェックイン日ごとの相関・回帰
+#   python analytics.py hotels.db pref*.csv --by period --workers 4
+#
+#   prices = hotel_prices("hotels.db")
+#   tourism = load_tourism(["pref202312.csv", "pref202412.csv"])
+#   stats = regressions(join_prices_and_visitors(prices, tourism))
+
+# 観光来訪者数の CSV のうち使う列と型
+TOURISM_DTYPES = {"地域区分": "category", "データ区分": "category", "地域名称": "string", "人数": "float64"}
+REGION_KIND = "都道府県"
+DATA_KIND = "観光来訪者数"
+# CSV を一度に読む行数（行を先に選べないときにチャンクごとに読む）
+CHUNK_SIZE = 100_000
+# 行を選ぶときに一度に読む文字数
+BLOCK_SIZE = 1 << 20
+
+# ファイル名の年月（pref202412.csv -> 2024-12）
+PERIOD_RE = re.compile(r"(\d{4})(\d{2})(?!\d)")
+# 県名の末尾の「都・府・県」（北海道と、すでに短い「京都」はそのまま）
+PREFECTURE_SUFFIX_RE = re.compile(r"(?<=..)[都府県]$")
+
+
+# 県名を結合用のキーにする（全角・半角と空白をそろえ、末尾の都・府・県を取る）
+def normalize_prefecture(name):
+    name = re.sub(r"\s+", "", unicodedata.normalize("NFKC", str(name)))
+    return PREFECTURE_SUFFIX_RE.sub("", name)
+
+
+# CSV のファイル名から対象の年月（YYYY-MM）を取る。分からなければ None
+def tourism_period(path):
+    match = PERIOD_RE.search(os.path.basename(path))
+    return f"{match.group(1)}-{match.group(2)}" if match else None
+
+
+# 地域・チェックイン日ごとのホテルの件数と平均料金
+# all_dates=True なら日程をまとめた集計（check_in_date は '*'）を返す
+def hotel_prices(database_name="hotels.db", all_dates=False):
+    # 読むだけなので読み取り専用で開く（ファイルがなければ空のデータベースを作らずにエラーにする）
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(database_name))}?mode=ro", uri=True)
+    try:
+        prices = pd.read_sql_query(
+            f"""
+            SELECT area, check_in_date, hotel_count, CAST(price_sum AS REAL) / hotel_count AS average_price
+            FROM area_prices
+            WHERE hotel_count > 0 AND check_in_date {"=" if all_dates else "!="} ?
+            ORDER BY area, check_in_date
+            """,
+            conn,
+            params=(ALL_DATES,),
+        )
+    finally:
+        conn.close()
+    prices.insert(0, "prefecture", prices["area"].map(normalize_prefecture))
+    prices["period"] = prices["check_in_date"].str.slice(0, 7).where(prices["check_in_date"].str.len() >= 7)
+    return prices
+
+
+def empty_tourism():
+    return pd.DataFrame({
+        "prefecture": pd.Series(dtype="string"),
+        "period": pd.Series(dtype="string"),
+        "visitors": pd.Series(dtype="float64"),
+    })
+
+
+# 地域区分の文字（"都道府県"）を含む行だけを先に選んでから pandas に読ませる
+# ほとんどが市区町村の行なので、パースする行が大きく減る。ファイルは block_size 文字ずつ読む
+# 改行を含む項目がありそうなとき（" の数が奇数の行がある）は None を返す
+def _read_candidate_rows(path, encoding, keyword, block_size=BLOCK_SIZE):
+    with open(path, encoding=encoding, newline="") as f:
+        kept = [f.readline()]
+        while True:
+            lines = f.readlines(block_size)
+            if not lines:
+                break
+            for line in lines:
+                if keyword in line:
+                    kept.append(line)
+                elif '"' in line and line.count('"') % 2:
+                    return None
+    if any(line.count('"') % 2 for line in kept):
+        return None
+    return pd.read_csv(io.StringIO("".join(kept)), usecols=list(TOURISM_DTYPES), dtype=TOURISM_DTYPES, thousands=",")
+
+
+# 観光来訪者数の CSV を1つ読み、都道府県ごとの人数を返す（同じ県の行は合計する）
+def read_tourism_file(path, chunksize=CHUNK_SIZE, encoding="utf-8-sig", data_kind=DATA_KIND, region_kind=REGION_KIND):
+    rows = _read_candidate_rows(path, encoding, region_kind)
+    if rows is None:
+        chunks = pd.read_csv(
+            path, usecols=list(TOURISM_DTYPES), dtype=TOURISM_DTYPES, chunksize=chunksize, encoding=encoding,
+            thousands=",",
+        )
+    else:
+        chunks = [rows]
+    frames = []
+    for chunk in chunks:
+        rows = chunk[(chunk["地域区分"] == region_kind) & (chunk["データ区分"] == data_kind)]
+        if len(rows):
+            frames.append(rows[["地域名称", "人数"]])
+    if not frames:
+        return empty_tourism()
+    rows = pd.concat(frames, ignore_index=True)
+    names = rows["地域名称"].unique()
+    rows["prefecture"] = rows["地域名称"].map(dict(zip(names, map(normalize_prefecture, names))))
+    visitors = rows.groupby("prefecture", as_index=False, sort=True)["人数"].sum().rename(columns={"人数": "visitors"})
+    visitors.insert(1, "period", tourism_period(path))
+    return visitors
+
+
+# 複数の CSV を読んでまとめる。workers を指定しない・2以上で、ファイルが複数あるときはプロセスプールで並行して読む
+def load_tourism(paths, workers=None, **options):
+    paths = list(paths)
+    if len(paths) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_read_tourism_file, paths, [options] * len(paths)))
+    else:
+        frames = [read_tourism_file(path, **options) for path in paths]
+    return pd.concat(frames, ignore_index=True) if frames else empty_tourism()
+
+
+def _read_tourism_file(path, options):
+    return read_tourism_file(path, **options)
+
+
+# 料金と来訪者数を県で結合する
+# by_period=True ならチェックイン日と同じ年月の来訪者数と組み合わせ、False なら年月に関係なくすべての組み合わせを作る
+# （例えば 2025年2月の料金と 2024年12月の来訪者数を比べるとき）
+def join_prices_and_visitors(prices, tourism, by_period=True):
+    keys = ["prefecture", "period"] if by_period else ["prefecture"]
+    tourism = tourism if by_period else tourism.rename(columns={"period": "tourism_period"})
+    return prices.merge(tourism, on=keys, how="inner", sort=True)
+
+
+# グループごとに平均料金（x）と来訪者数（y）の相関係数と回帰直線 y = slope * x + intercept を求める
+# by はグループにする列（"check_in_date", "period", ["check_in_date", "tourism_period"] など）。None なら全体で1つ
+def regressions(joined, by="check_in_date", x="average_price", y="visitors"):
+    data = joined[[x, y]].astype("float64")
+    if by is None:
+        keys = pd.Series(0, index=joined.index)
+    else:
+        keys = [joined[column] for column in ([by] if isinstance(by, str) else by)]
+    groups = data.groupby(keys, sort=True)
+    # 平均を引いてから積和を取る（大きな値どうしの引き算で桁落ちしないように）
+    centered = data - groups.transform("mean")
+    sums = pd.DataFrame({
+        "sxx": centered[x] ** 2,
+        "syy": centered[y] ** 2,
+        "sxy": centered[x] * centered[y],
+    }).groupby(keys, sort=True).sum()
+    means = groups.mean()
+    stats = pd.DataFrame({"n": groups.size()})
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats["correlation"] = sums["sxy"] / np.sqrt(sums["sxx"] * sums["syy"])
+        stats["slope"] = sums["sxy"] / sums["sxx"]
+    stats["intercept"] = means[y] - stats["slope"] * means[x]
+    stats["r2"] = stats["correlation"] ** 2
+    # 2点以下では相関も回帰も意味がない
+    stats.loc[stats["n"] < 3, ["correlation", "slope", "intercept", "r2"]] = np.nan
+    if by is None:
+        return stats.reset_index(drop=True)
+    return stats.rename_axis([by] if isinstance(by, str) else by).reset_index()
+
+
+# hotels.db と観光来訪者数の CSV から、結合した表とグループごとの相関・回帰を作る
+def analyze(database_name, csv_paths, by="check_in_date", by_period=True, all_dates=False, workers=None):
+    prices = hotel_prices(database_name, all_dates=all_dates)
+    tourism = load_tourism(csv_paths, workers=workers)
+    joined = join_prices_and_visitors(prices, tourism, by_period=by_period)
+    return joined, regressions(joined, by=by)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ホテルの平均料金と観光来訪者数の相関・回帰")
+    parser.add_argument("database", help="hotels.db")
+    parser.add_argument("csv", nargs="+", help="観光来訪者数の CSV（ファイル名に YYYYMM を含む）")
+    parser.add_argument("--by", default="check_in_date", help="グループにする列（check_in_date / period / prefecture / all）")
+    parser.add_argument("--any-period", action="store_true", help="年月が違う料金と来訪者数も組み合わせる")
+    parser.add_argument("--all-dates", action="store_true", help="日程をまとめた料金の集計を使う")
+    parser.add_argument("--workers", type=int, default=None, help="CSV を読むプロセス数")
+    args = parser.parse_args()
+
+    by = None if args.by == "all" else args.by
+    if args.any_period and by in ("check_in_date", "period"):
+        by = [by, "tourism_period"]
+    joined, stats = analyze(
+        args.database, args.csv, by=by, by_period=not args.any_period, all_dates=args.all_dates, workers=args.workers,
+    )
+    if joined.empty:
+        print("料金と来訪者数を結合できる行がありません（--any-period を試してください）", file=sys.stderr)
+        sys.exit(1)
+    print(f"結合した行: {len(joined)}  県: {joined['prefecture'].nunique()}")
+    print(stats.to_string(index=False, float_format=lambda value: f"{value:.4g}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml がなければ BeautifulSoup だけで動かす
+    etree = None
+
+# HIS の検索結果ページからホテル名・料金と次のページへのリンクを取り出す部品
+# どれも extract(html) -> ([(ホテル名, 料金), ...], 次のページの href または None) の形で、
+# 同じページなら同じ結果を返す（tests/test_his_extractors.py で一致を確かめている）
+#
+#   soup:     BeautifulSoup(html.parser) でページ全体を木にする（元のやり方）
+#   strainer: SoupStrainer でホテルの枠とページャだけを木にする
+#   lxml:     lxml でパースし、あらかじめコンパイルした XPath で探す（いちばん速い）
+
+ITEM_CLASS = 'item-wrap__main'
+NAME_CLASS = 'item-wrap__title-ja'
+PRICE_CLASS = 'price--body'
+# 次のページへのリンクは rel="next" を優先し、なければページャの「次へ」を使う
+NEXT_CLASSES = ('pager__item--next', 'pagination__next')
+PAGER_SELECTOR = ', '.join(f'.{name} a' for name in NEXT_CLASSES)
+
+
+def _soup_hotels(soup):
+    hotels = []
+    # ホテル情報を含む要素を探す
+    for item in soup.find_all('div', class_=ITEM_CLASS):
+        name_tag = item.find('span', class_=NAME_CLASS)
+        price_tag = item.find('span', class_=PRICE_CLASS)
+        if name_tag and price_tag:
+            hotels.append((name_tag.get_text(strip=True), price_tag.get_text(strip=True)))
+    return hotels
+
+
+def _href(link):
+    return link.get('href') or None if link is not None else None
+
+
+def extract_soup(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    link = soup.select_one('a[rel~="next"]') or soup.select_one(PAGER_SELECTOR)
+    return _soup_hotels(soup), _href(link)
+
+
+# class 属性の値の1つとして name を含むか（"a item-wrap__main" のような複数指定にも合う）
+def _class_pattern(*names):
+    return re.compile(r'(?:^|\s)(?:' + '|'.join(map(re.escape, names)) + r')(?:\s|$)')
+
+
+STRAINER = SoupStrainer(class_=_class_pattern(ITEM_CLASS, *NEXT_CLASSES))
+# rel="next" のリンクはクラスで絞れないので、HTML の文字列から直接探す
+REL_NEXT = re.compile(r'<a\s[^>]*\brel\s*=\s*["\'][^"\']*\bnext\b[^>]*>', re.IGNORECASE)
+HREF = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\')', re.IGNORECASE)
+
+
+def extract_strainer(html):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=STRAINER)
+    rel_next = REL_NEXT.search(html)
+    if rel_next is not None:
+        href = HREF.search(rel_next.group(0))
+        return _soup_hotels(soup), (href.group(1) or href.group(2) or None) if href else None
+    return _soup_hotels(soup), _href(soup.select_one(PAGER_SELECTOR))
+
+
+if etree is not None:
+    def _has_class(name, attr='class'):
+        return f"contains(concat(' ', normalize-space(@{attr}), ' '), ' {name} ')"
+
+    ITEMS_XPATH = etree.XPath(f'//div[{_has_class(ITEM_CLASS)}]')
+    NAME_XPATH = etree.XPath(f'.//span[{_has_class(NAME_CLASS)}]')
+    PRICE_XPATH = etree.XPath(f'.//span[{_has_class(PRICE_CLASS)}]')
+    REL_NEXT_XPATH = etree.XPath(f"//a[{_has_class('next', 'rel')}]")
+    PAGER_XPATH = etree.XPath(' | '.join(f'//*[{_has_class(name)}]//a' for name in NEXT_CLASSES))
+
+    def _text(element):
+        return ''.join(text.strip() for text in element.itertext())
+
+    def extract_lxml(html):
+        try:
+            root = lxml.html.fromstring(html)
+        except etree.ParserError:  # 空のページ
+            return [], None
+        hotels = []
+        for item in ITEMS_XPATH(root):
+            name_tags = NAME_XPATH(item)
+            price_tags = PRICE_XPATH(item)
+            if name_tags and price_tags:
+                hotels.append((_text(name_tags[0]), _text(price_tags[0])))
+        links = REL_NEXT_XPATH(root) or PAGER_XPATH(root)
+        return hotels, links[0].get('href') or None if links else None
+
+
+EXTRACTORS = {'soup': extract_soup, 'strainer': extract_strainer}
+if etree is not None:
+    EXTRACTORS['lxml'] = extract_lxml
+
+
+# 名前から extract 関数を返す（None なら使える中でいちばん速いもの）
+def get_extractor(name=None):
+    if name is None:
+        name = 'lxml' if 'lxml' in EXTRACTORS else 'strainer'
+    try:
+        return EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f'unknown extractor: {name} (choose from {", ".join(EXTRACTORS)})') from None
@@ -0,0 +1,112 @@
+import json
+import os
+import time
+
+from stand_in_server import StandInServer
+
+# HIS のホテル検索ページの代わりに使うローカルのスタンドインサーバ
+# 保存しておいた検索結果のHTMLを、指定した遅延を入れて返す（動作確認・計測用）
+#
+#   pages = load_pages("saved_pages")            # または sample_pages(...)
+#   with LocalHisServer(pages, latency=0.3) as server:
+#       scraper.scrape_all([(server.url + path, area) for path, area in start_pages])
+
+
+class LocalHisServer(StandInServer):
+    def __init__(self, pages, latency=0.0, host="127.0.0.1", port=0):
+        super().__init__(latency, host, port)
+        self.pages = pages  # "パス?クエリ" -> HTML
+
+    def handle_get(self, handler):
+        html = self.pages.get(handler.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if html is None:
+            handler.reply(404)
+            return
+        handler.reply(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+
+# 保存したHTMLを読み込む（directory/area/1.html -> "/search/area?page=1"）
+def load_pages(directory):
+    pages = {}
+    for area in sorted(os.listdir(directory)):
+        area_dir = os.path.join(directory, area)
+        if not os.path.isdir(area_dir):
+            continue
+        for name in os.listdir(area_dir):
+            page, ext = os.path.splitext(name)
+            if ext == ".html":
+                with open(os.path.join(area_dir, name), encoding="utf-8") as f:
+                    pages[f"/search/{area}?page={page}"] = f.read()
+    return pages
+
+
+# HIS の検索結果と同じ形の HTML を作る（次のページがあればページャのリンクを付ける）
+# realistic=True なら、本物のページと同じくホテルの枠に写真・住所・口コミ・特徴を入れ、
+# ホテル以外の部分（ヘッダのナビ・絞り込み・フッタ・状態を埋め込んだスクリプト）も付ける
+# （本物は1ページ100KBを超え、その大半がホテル以外の部分）
+def search_page(hotels, next_href=None, realistic=False):
+    if not realistic:
+        items = "\n".join(
+            f'<div class="item-wrap__main"><h2><span class="item-wrap__title-ja">{name}</span></h2>'
+            f'<div class="price"><span class="price--body">{price}</span><span class="price--unit">円</span></div></div>'
+            for name, price in hotels
+        )
+        pager = f'<ul class="pager"><li class="pager__item--next"><a href="{next_href}">次へ</a></li></ul>' if next_href else ""
+        return f"<html><head><title>検索結果</title></head><body><div class=\"search-result\">{items}</div>{pager}</body></html>"
+
+    items = "\n".join(_hotel_card(i, name, price) for i, (name, price) in enumerate(hotels))
+    pager = "".join(f'<li class="pager__item"><a href="?page={n}">{n}</a></li>' for n in range(1, 6))
+    if next_href:
+        pager += f'<li class="pager__item--next"><a href="{next_href}">次へ</a></li>'
+    state = json.dumps({
+        "hotels": [
+            {"id": i, "name": name, "price": price, "lat": 33.59 + i / 1000, "lng": 130.40 + i / 1000,
+             "plans": [{"code": f"P{i}{n:02d}", "meal": n % 3} for n in range(12)]}
+            for i, (name, price) in enumerate(hotels)
+        ],
+        "filters": [{"id": n, "count": n * 7 % 50} for n in range(2000)],
+    }, ensure_ascii=False)
+    return (
+        '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8"><title>検索結果 | HIS ホテル</title>'
+        + "".join(f'<link rel="stylesheet" href="/assets/css/{n}.css">' for n in range(8))
+        + "".join(f'<script src="/assets/js/chunk.{n}.js" defer></script>' for n in range(12))
+        + '</head><body><header class="header"><nav class="global-nav">'
+        + "".join(f'<a href="/area/{n}" class="nav__link">エリア{n}</a>' for n in range(300))
+        + '</nav></header><main class="search"><aside class="filter"><form action="/search/" method="get">'
+        + "".join(f'<label class="filter__item"><input type="checkbox" name="f{n}" value="{n}"> 条件{n}</label>' for n in range(200))
+        + f'</form></aside><div class="search-result">{items}</div><ul class="pager">{pager}</ul></main>'
+        + '<footer class="footer">' + "".join(f'<a href="/info/{n}">ご案内{n}</a>' for n in range(80)) + '</footer>'
+        + f'<script>window.__STATE__ = {state};</script></body></html>'
+    )
+
+
+def _hotel_card(i, name, price):
+    tags = "".join(f'<li class="tag-list__item">{tag}</li>' for tag in ("朝食付き", "駅近", "大浴場", "禁煙ルーム")[:1 + i % 4])
+    return (
+        f'<div class="item-wrap"><div class="item-wrap__img"><img src="/img/hotel/{i}.jpg" alt="{name}" loading="lazy"></div>'
+        f'<div class="item-wrap__main"><h2><span class="item-wrap__title-ja">{name}</span></h2>'
+        f'<p class="item-wrap__title-en">Hotel {i}</p><p class="item-wrap__address">福岡市博多区{i}丁目 / 駅から徒歩{i % 15 + 1}分</p>'
+        f'<div class="review"><span class="review__score">{3 + i % 20 / 10:.1f}</span><span class="review__count">（{i * 13 % 500}件）</span></div>'
+        f'<ul class="tag-list">{tags}</ul>'
+        f'<div class="price"><span class="price--label">1泊1室</span><span class="price--body">{price}</span>'
+        f'<span class="price--unit">円</span><span class="price--tax">（税込）</span></div></div></div>'
+    )
+
+
+# 計測用の検索結果ページ一式と、各地域の最初のページの一覧 [(パス, 地域), ...] を作る
+# HIS と同じくチェックイン日（checkInDate=YYYYMMDD）をクエリに含める
+def sample_pages(areas, pages_per_area=3, hotels_per_page=20, check_in="20250201", realistic=False):
+    pages = {}
+    start_pages = []
+    for a, area in enumerate(areas):
+        for page in range(1, pages_per_area + 1):
+            hotels = [
+                (f"{area}ホテル{page}-{i}", f"{(a * 7919 + page * 104729 + i * 15485863) % 40000 + 5000:,}")
+                for i in range(hotels_per_page)
+            ]
+            next_href = f"/search/{a}?checkInDate={check_in}&page={page + 1}" if page < pages_per_area else None
+            pages[f"/search/{a}?checkInDate={check_in}&page={page}"] = search_page(hotels, next_href, realistic)
+        start_pages.append((f"/search/{a}?checkInDate={check_in}&page=1", area))
+    return pages, start_pages
@@ -0,0 +1,399 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+import httpx
+
+from extractors import get_extractor
+from metrics import DB_WRITE_SECONDS, FETCH_SECONDS, PARSE_SECONDS
+
+log = logging.getLogger(__name__)
+
+# HIS のホテル検索ページからホテル名と料金を集めて SQLite に保存する
+# ページの取得は非同期でまとめて行い、ホストごとのトークンバケットで間隔を守りつつ、
+# 許された回数ぎりぎりまで並行して取得する（待ち時間の間に他の地域のページを取りに行く）
+#
+#   scraper = HISHotelsScraper()
+#   scraper.scrape_all([(url, '福岡'), (url, '佐賀'), ...], rate=0.5)
+
+# 1ホストあたりのリクエスト数（1秒あたり）。元の time.sleep(2) と同じ 2秒に1回
+DEFAULT_RATE = 0.5
+# 同時に取得中にしておくページ数の上限
+DEFAULT_CONCURRENCY = 4
+# 1つの検索結果でたどるページ数の上限
+MAX_PAGES = 20
+# サーバに届く時刻はスレッドの切り替えなどで数ミリ秒ずれるので、rate より少しだけ間隔をあけて、
+# サーバ側で数えても1秒あたり rate 回を超えないようにする
+RATE_HEADROOM = 0.98
+# 現在のスキーマのバージョン（PRAGMA user_version に記録する）
+SCHEMA_VERSION = 2
+
+
+# トークンバケットによるレート制限
+# rate 個/秒でトークンが貯まり（最大 burst 個）、1リクエストごとに1個使う
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    # トークンを取ったリクエストが実際に送り出された（新しい接続を張るのに時間がかかった）ときに呼ぶ
+    # それまでの時間はトークンが貯まらなかったことにして、次のリクエストとの間隔を送り出した時刻から数える
+    def sent(self):
+        now = time.monotonic()
+        if now > self.updated:
+            self.updated = now
+
+
+# ページの取得をまとめて行うエンジン
+# 接続は1つの httpx.AsyncClient でプールし、ホストごとに TokenBucket で間隔をあける
+# ページからの取り出しは extractor（extractors.py の名前。None なら使える中でいちばん速いもの）で行う
+class ScrapeEngine:
+    def __init__(self, rate=DEFAULT_RATE, burst=1, concurrency=DEFAULT_CONCURRENCY, max_pages=MAX_PAGES, timeout=30.0,
+                 extractor=None):
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.extract = get_extractor(extractor)
+        self.buckets = {}  # ホスト -> TokenBucket
+        self.pages_fetched = 0
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(self.rate * RATE_HEADROOM, self.burst)
+        return bucket
+
+    async def fetch(self, client, url):
+        bucket = self._bucket(url)
+        await bucket.acquire()
+
+        # 新しい接続を張るのに時間がかかると、後のリクエストと詰まって届き、サーバ側では
+        # 1秒あたり rate 回を超えて見えることがあるので、送り出した時刻をバケットに知らせる
+        # （trace を出さないトランスポートでも、上で取ったトークンの分の間隔は守られる）
+        async def trace(event, info):
+            if event.endswith(".send_request_headers.started"):
+                bucket.sent()
+
+        # トークンを待つ時間は含めず、通信にかかった時間だけを測る
+        start = time.perf_counter()
+        try:
+            response = await client.get(url, extensions={"trace": trace})
+        finally:
+            FETCH_SECONDS.observe(time.perf_counter() - start, app="trip", host=urlsplit(url).netloc)
+        response.raise_for_status()  # ステータスコードが200以外の場合例外を発生させる
+        self.pages_fetched += 1
+        return response.text
+
+    # 検索結果を次のページまでたどり、ページごとに ((最初のURL, 地域), ページのURL, [(ホテル名, 料金), ...]) を返す
+    # 取得に失敗したときは [(ホテル名, 料金), ...] の代わりに例外を返す
+    # 地域ごとのページは順番にたどり、地域どうしは並行して取得する
+    async def crawl(self, urls_and_areas):
+        queue = asyncio.Queue()
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True) as client:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def walk(job):
+                url = job[0]
+                try:
+                    for _ in range(self.max_pages):
+                        async with semaphore:
+                            html = await self.fetch(client, url)
+                        with PARSE_SECONDS.time(app="trip", kind="html"):
+                            hotels, next_href = self.extract(html)
+                        await queue.put((job, url, hotels))
+                        if next_href is None:
+                            break
+                        url = urljoin(url, next_href)
+                except httpx.HTTPError as e:
+                    await queue.put((job, url, e))
+
+            tasks = [asyncio.create_task(walk(job)) for job in urls_and_areas]
+            done = asyncio.gather(*tasks)
+            done.add_done_callback(lambda _: queue.put_nowait(None))
+            try:
+                while (item := await queue.get()) is not None:
+                    yield item
+                await done  # 取得以外のエラーがあればここで送出する
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(done, return_exceptions=True)
+
+
+# "12,300" や "¥12,300〜" のような料金の文字列を円の整数にする（数字がなければ None）
+def parse_price(text):
+    match = re.search(r'\d[\d,]*', text or '')
+    return int(match.group(0).replace(',', '')) if match else None
+
+
+# 検索URLのチェックイン日（checkInDate=20250201）を "2025-02-01" にする（なければ ""）
+def check_in_date(url):
+    value = parse_qs(urlsplit(url).query).get('checkInDate', [''])[0]
+    if re.fullmatch(r'\d{8}', value):
+        return f'{value[:4]}-{value[4:6]}-{value[6:]}'
+    return ''
+
+
+# 同期コードからコルーチンを実行する（Jupyter のようにループが動いていれば別スレッドで回す）
+def run_sync(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+# 料金は円の整数。同じホテル・地域・チェックイン日は1行にまとめる
+CREATE_HOTELS = '''
+    CREATE TABLE IF NOT EXISTS hotels (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        price INTEGER,
+        area TEXT NOT NULL,
+        check_in_date TEXT NOT NULL DEFAULT '',
+        UNIQUE (name, area, check_in_date)
+    )
+'''
+UPSERT_HOTEL = '''
+    INSERT INTO hotels (name, price, area, check_in_date) VALUES (?, ?, ?, ?)
+    ON CONFLICT (name, area, check_in_date) DO UPDATE SET price = excluded.price
+    WHERE price IS NOT excluded.price
+'''
+
+# 地域ごとの料金の集計表の、全日程をまとめた行のチェックイン日
+ALL_DATES = '*'
+# 集計表に持たせる四分位の位置（0 = 最安, 1 = 最高）
+PERCENTILES = {'price_min': 0.0, 'price_p25': 0.25, 'price_p50': 0.5, 'price_p75': 0.75, 'price_max': 1.0}
+
+# 地域・チェックイン日ごとの料金の集計表（料金のあるホテルだけを数える）
+# 件数と合計は hotels への書き込みのたびにトリガーで更新し、変わった行に dirty を立てる
+# 最小・四分位・最大は refresh_area_prices で dirty の行だけ計算し直す
+CREATE_AREA_PRICES = ['''
+    CREATE TABLE IF NOT EXISTS area_prices (
+        area TEXT NOT NULL,
+        check_in_date TEXT NOT NULL,
+        hotel_count INTEGER NOT NULL DEFAULT 0,
+        price_sum INTEGER NOT NULL DEFAULT 0,
+        price_min INTEGER,
+        price_p25 INTEGER,
+        price_p50 INTEGER,
+        price_p75 INTEGER,
+        price_max INTEGER,
+        dirty INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (area, check_in_date)
+    ) WITHOUT ROWID
+''', '''
+    CREATE INDEX IF NOT EXISTS idx_hotels_area_date ON hotels (area, check_in_date, price)
+''', f'''
+    CREATE TRIGGER IF NOT EXISTS hotels_area_prices_insert AFTER INSERT ON hotels
+    BEGIN
+        INSERT INTO area_prices (area, check_in_date, hotel_count, price_sum)
+        SELECT NEW.area, day, 1, NEW.price FROM (SELECT NEW.check_in_date AS day UNION ALL SELECT '{ALL_DATES}')
+        WHERE NEW.price IS NOT NULL
+        ON CONFLICT (area, check_in_date) DO UPDATE SET
+            hotel_count = hotel_count + 1, price_sum = price_sum + excluded.price_sum, dirty = 1;
+    END
+''', f'''
+    CREATE TRIGGER IF NOT EXISTS hotels_area_prices_delete AFTER DELETE ON hotels
+    BEGIN
+        UPDATE area_prices SET hotel_count = hotel_count - 1, price_sum = price_sum - OLD.price, dirty = 1
+        WHERE OLD.price IS NOT NULL AND area = OLD.area AND check_in_date IN (OLD.check_in_date, '{ALL_DATES}');
+    END
+''', f'''
+    CREATE TRIGGER IF NOT EXISTS hotels_area_prices_update AFTER UPDATE OF price, area, check_in_date ON hotels
+    BEGIN
+        UPDATE area_prices SET hotel_count = hotel_count - 1, price_sum = price_sum - OLD.price, dirty = 1
+        WHERE OLD.price IS NOT NULL AND area = OLD.area AND check_in_date IN (OLD.check_in_date, '{ALL_DATES}');
+        INSERT INTO area_prices (area, check_in_date, hotel_count, price_sum)
+        SELECT NEW.area, day, 1, NEW.price FROM (SELECT NEW.check_in_date AS day UNION ALL SELECT '{ALL_DATES}')
+        WHERE NEW.price IS NOT NULL
+        ON CONFLICT (area, check_in_date) DO UPDATE SET
+            hotel_count = hotel_count + 1, price_sum = price_sum + excluded.price_sum, dirty = 1;
+    END
+''']
+
+
+# 集計表の dirty の行について、最小・四分位・最大を計算し直す（ホテルがなくなった行は消す）
+# 料金順の索引を OFFSET でたどるので、変わった地域のホテルを全部読み込むことはない
+@DB_WRITE_SECONDS.timed(app="trip", table="area_prices")
+def refresh_area_prices(conn):
+    dirty = conn.execute('SELECT area, check_in_date, hotel_count FROM area_prices WHERE dirty = 1').fetchall()
+    for area, day, count in dirty:
+        if count <= 0:
+            conn.execute('DELETE FROM area_prices WHERE area = ? AND check_in_date = ?', (area, day))
+            continue
+        where, params = ('area = ?', (area,)) if day == ALL_DATES else ('area = ? AND check_in_date = ?', (area, day))
+        values = {}
+        for column, q in PERCENTILES.items():
+            rank = int(q * (count - 1))  # 小さい方から数えた順位（0始まり）
+            # 後ろ半分は高い方から数える方が索引をたどる距離が短い
+            order, offset = ('ASC', rank) if rank <= (count - 1) // 2 else ('DESC', count - 1 - rank)
+            values[column] = conn.execute(
+                f'SELECT price FROM hotels WHERE {where} AND price IS NOT NULL ORDER BY price {order} LIMIT 1 OFFSET ?',
+                (*params, offset),
+            ).fetchone()[0]
+        conn.execute(
+            'UPDATE area_prices SET price_min = :price_min, price_p25 = :price_p25, price_p50 = :price_p50, '
+            'price_p75 = :price_p75, price_max = :price_max, dirty = 0 WHERE area = :area AND check_in_date = :day',
+            dict(values, area=area, day=day),
+        )
+    return len(dirty)
+
+
+# 地域ごとの料金の集計（件数・平均・最小・四分位・最大）を地域名順に返す
+# check_in_date を指定するとその日程の集計、省略すると全日程の集計
+# 読むだけで書き込まない（最小・四分位・最大は、ホテルを保存した側が refresh_area_prices で更新しておく）
+def area_price_stats(database_name='hotels.db', check_in_date=ALL_DATES):
+    conn = sqlite3.connect(database_name)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute('''
+            SELECT area, hotel_count, CAST(price_sum AS REAL) / hotel_count AS average_price,
+                   price_min, price_p25, price_p50, price_p75, price_max
+            FROM area_prices
+            WHERE check_in_date = ? AND hotel_count > 0
+            ORDER BY area
+        ''', (check_in_date,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+# 平均料金が予算以下の地域を、安い順に返す
+def recommended_areas(budget, database_name='hotels.db', check_in_date=ALL_DATES):
+    rows = sorted(area_price_stats(database_name, check_in_date), key=lambda row: row['average_price'])
+    return [row['area'] for row in rows if row['average_price'] <= budget]
+
+
+class HISHotelsScraper:
+    def __init__(self, database_name='hotels.db'):
+        self.db_name = database_name
+        self.create_table()
+
+    def create_table(self):
+        """データベースにテーブルを作成する"""
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        c.execute(CREATE_HOTELS)
+        conn.commit()
+        self.migrate_database(conn)
+        conn.close()
+
+    def migrate_database(self, conn):
+        """古いスキーマ（料金が TEXT）のデータベースを現在のバージョンまで移行する"""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        with conn:
+            if version < 1:
+                columns = [row[1] for row in conn.execute('PRAGMA table_info(hotels)')]
+                if 'check_in_date' not in columns:
+                    # 料金の文字列を一度だけ整数にして、新しいテーブルに移す（重複は後から保存された方を残す）
+                    conn.execute('ALTER TABLE hotels RENAME TO hotels_old')
+                    conn.execute(CREATE_HOTELS)
+                    old_rows = conn.execute(
+                        'SELECT name, price, area FROM hotels_old WHERE name IS NOT NULL AND area IS NOT NULL ORDER BY id'
+                    )
+                    conn.executemany(
+                        UPSERT_HOTEL, ((name, parse_price(price), area, '') for name, price, area in old_rows)
+                    )
+                    conn.execute('DROP TABLE hotels_old')
+                # 地域ごとの集計用（料金まで含めて、表を読まずに索引だけで平均を出せる）
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_hotels_area ON hotels (area, price)')
+            if version < 2:
+                # 地域ごとの料金の集計表を作り、今あるホテルから埋める
+                for statement in CREATE_AREA_PRICES:
+                    conn.execute(statement)
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO area_prices (area, check_in_date, hotel_count, price_sum)
+                    SELECT area, check_in_date, COUNT(*), SUM(price) FROM hotels WHERE price IS NOT NULL
+                    GROUP BY area, check_in_date
+                    UNION ALL
+                    SELECT area, '{ALL_DATES}', COUNT(*), SUM(price) FROM hotels WHERE price IS NOT NULL
+                    GROUP BY area
+                ''')
+                refresh_area_prices(conn)
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def save_hotels(self, conn, hotels, area, check_in=''):
+        """ホテル名と価格をまとめてデータベースに保存する（同じホテル・地域・チェックイン日なら料金を更新する）"""
+        with DB_WRITE_SECONDS.time(app="trip", table="hotels"):
+            conn.executemany(
+                UPSERT_HOTEL, [(hotel_name, parse_price(hotel_price), area, check_in) for hotel_name, hotel_price in hotels]
+            )
+
+    def scrape_hotels(self, url, area):
+        """指定されたURLからホテル名と価格をスクレイピングし、データベースに保存する"""
+        return self.scrape_all([(url, area)])
+
+    async def scrape_all_async(self, urls_and_areas, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY, max_pages=MAX_PAGES,
+                               extractor=None):
+        """複数の検索URLを並行してスクレイピングし、保存したホテルの件数を返す"""
+        engine = ScrapeEngine(rate=rate, concurrency=concurrency, max_pages=max_pages, extractor=extractor)
+        conn = sqlite3.connect(self.db_name)
+        count = 0
+        try:
+            # 1ページ分（executemany 1回）ずつコミットする（書き込みのロックを長く持たず、途中で失敗しても取れた分は残る）
+            try:
+                async for (start_url, area), url, hotels in engine.crawl(urls_and_areas):
+                    if isinstance(hotels, Exception):
+                        log.warning('Error scraping %s (%s): %s', area, url, hotels)
+                        continue
+                    with conn:
+                        self.save_hotels(conn, hotels, area, check_in_date(start_url))
+                    count += len(hotels)
+            finally:
+                # 途中で失敗しても、保存できた分の集計は更新しておく
+                with conn:
+                    refresh_area_prices(conn)
+        finally:
+            conn.close()
+        log.info('Saved %d hotels from %d pages', count, engine.pages_fetched)
+        return count
+
+    def scrape_all(self, urls_and_areas, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY, max_pages=MAX_PAGES,
+                   extractor=None):
+        """scrape_all_async の同期版"""
+        return run_sync(self.scrape_all_async(urls_and_areas, rate, concurrency, max_pages, extractor))
+
+    def get_hotels(self):
+        """データベースからホテル名と価格を取得する"""
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        c.execute('SELECT name, price, area FROM hotels')
+        hotels = c.fetchall()  # 取得したデータをすべてfetchする
+        conn.close()
+        return hotels
+
+    def clear_hotels(self):
+        """テーブル内の既存のデータをクリア"""
+        conn = sqlite3.connect(self.db_name)
+        c = conn.cursor()
+        c.execute('DELETE FROM hotels')
+        refresh_area_prices(conn)
+        conn.commit()
+        conn.close()